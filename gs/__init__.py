@@ -1,3 +1,11 @@
 from .core import *
 from .util import SdkError
-from .monitor import *
\ No newline at end of file
+from .monitor import *
+
+def __getattr__(name):
+    # asyncio support is loaded on first use, keeps "import gs" light
+    if name in ('aio', 'events'):
+        import importlib
+        aio = importlib.import_module('.aio', __name__)
+        return aio if name == 'aio' else aio.events
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -6,9 +6,9 @@ To change license status, apply actions
 
 from enum import IntEnum
 
-from .util import pchar2str, once, HObject, SdkError
+from .util import pchar2str, cached_property, HObject, SdkError
 from . import intf as _intf
-from .var import Variable
+from .var import Params
 from datetime import datetime
 
 class ActionId(IntEnum):
@@ -81,17 +81,15 @@ class Action(HObject):
             raise SdkError("action id not specified, please use decorator 'act_id()'")
         return self._id
     
-    @property
-    @once
+    @cached_property
     def name(self):
         """ action name """
         return pchar2str(_intf.gsGetActionName(self._handle))
 
-    @property
-    @once
-    def params(self):
-        """ action parameters """
-        return { x.name: x for x in [ Variable(_intf.gsGetActionParamByIndex(self._handle, i)) for i in range(_intf.gsGetActionParamCount(self._handle)) ] }
+    @cached_property
+    def params(self)->Params:
+        """ action parameters by name, each Variable is opened on access """
+        return Params(self._handle, _intf.gsGetActionParamCount, _intf.gsGetActionParamByIndex)
 
 
 #----------- Generic Actions ----------------------
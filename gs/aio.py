@@ -0,0 +1,454 @@
+"""
+asyncio facade
+
+Awaitable versions of Core / Entity / License operations. Calls that may block on network or storage run on
+a dedicated bounded executor, each call can be given a timeout (seconds) and is cancelled with the awaiting
+task; network-bound calls (serial validation / activation / revocation, server probing) are capped by a
+concurrency limit. Metadata (product / entity / license ids, names...) is cached once read and served on the
+loop thread; it is read on the executor by init() / entities() / getEntityBy*(), a metadata property read
+before (e.g. entities of a core initialized synchronously) is a blocking sdk call on the loop thread.
+
+gs.events() streams monitor events to the loop as an async iterator.
+
+    async with gs.aio.AsyncCore(max_workers=4, max_network=2, timeout=30) as core:
+        await core.init(productId, pathToLic, password)
+        if await core.applySN(serial, timeout=10):
+            ...
+"""
+
+from . import monitor as _monitor
+from .core import Core
+from .entity import Entity, EntityStatus
+from .lic import License, LicenseStatus
+from .monitor import Event, EventType, getEventType
+from .util import SdkError
+
+import asyncio
+import collections
+import functools
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+
+_DEFAULT = object() # use default timeout of AsyncCore
+
+def _sdkTimeout(timeout)->int:
+    """ sdk network timeout (ms) matching call timeout (seconds) """
+    return -1 if timeout is None else max(0, int(timeout * 1000))
+
+
+class AsyncCore:
+    """
+    Awaitable facade of gs.Core
+
+    max_workers: threads running blocking calls
+    max_network: network-bound calls in flight at most
+    timeout: default timeout (seconds) of a call, None to wait forever
+    """
+    def __init__(self, max_workers: int = 4, max_network: int = 2, timeout: float = None):
+        self._core = Core()
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="gs-aio")
+        self.max_network = max_network
+        self.timeout = timeout
+        self._network = weakref.WeakKeyDictionary() # event loop => semaphore capping network calls on that loop
+        self._entities = {} # entity id => AsyncEntity
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    def close(self):
+        """ shut down the executor, blocks until calls in flight are completed """
+        self._executor.shutdown(wait=True)
+
+    async def aclose(self):
+        """ shut down the executor, calls in flight are awaited off the loop thread """
+        await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown)
+
+    @property
+    def core(self)->Core:
+        """ the synchronous core """
+        return self._core
+
+    async def _call(self, fn, *args, timeout = _DEFAULT, network: bool = False, **kwargs):
+        """ run fn(*args, **kwargs) on the executor """
+        loop = asyncio.get_running_loop()
+        if timeout is _DEFAULT:
+            timeout = self.timeout
+        call = functools.partial(fn, *args, **kwargs) if kwargs else functools.partial(fn, *args)
+
+        if network:
+            sem = self._network.get(loop)
+            if sem is None:
+                sem = self._network[loop] = asyncio.Semaphore(self.max_network)
+
+            async def run():
+                await sem.acquire()
+                try:
+                    fut = loop.run_in_executor(self._executor, call)
+                except BaseException:
+                    sem.release()
+                    raise
+                # released once the call has returned, not when the awaiting coroutine is cancelled by timeout
+                fut.add_done_callback(lambda _: sem.release())
+                return await asyncio.shield(fut)
+        else:
+            def run():
+                return loop.run_in_executor(self._executor, call)
+
+        return await asyncio.wait_for(run(), timeout)
+
+    # ---- metadata, served on loop thread once cached ----
+    @property
+    def productId(self)->str:
+        return self._core.productId
+
+    @property
+    def productName(self)->str:
+        return self._core.productName
+
+    @property
+    def buildId(self)->int:
+        return self._core.buildId
+
+    @staticmethod
+    def getVersion()->str:
+        return Core.getVersion()
+
+    # ---- initialization ----
+    async def init(self, productId: str, pathToLic: str, password: str, timeout = _DEFAULT)->bool:
+        def init():
+            ok = self._core.init(productId, pathToLic, password)
+            if ok:
+                # cached off the loop thread
+                self._core.productId, self._core.productName, self._core.buildId
+            return ok
+        ok = await self._call(init, timeout=timeout)
+        self._entities = {}
+        return ok
+
+    async def cleanUp(self, timeout = _DEFAULT):
+        await self._call(self._core.cleanUp, timeout=timeout)
+        self._entities = {}
+
+    async def flush(self, timeout = _DEFAULT):
+        await self._call(self._core.flush, timeout=timeout)
+
+    # ---- entities ----
+    def _wrap(self, e: Entity)->'AsyncEntity':
+        if e is None:
+            return None
+        ae = self._entities.get(e.id)
+        if ae is None or ae.entity is not e:
+            ae = self._entities[e.id] = AsyncEntity(self, e)
+        return ae
+
+    async def entities(self, timeout = _DEFAULT)->list:
+        entities = await self._call(lambda: [ _loaded(e) for e in self._core.entities ], timeout=timeout)
+        return [ self._wrap(e) for e in entities ]
+
+    async def getEntityById(self, entityId: str, timeout = _DEFAULT)->'AsyncEntity':
+        return self._wrap(await self._call(lambda: _loaded(self._core.getEntityById(entityId)), timeout=timeout))
+
+    async def getEntityByName(self, name: str, timeout = _DEFAULT)->'AsyncEntity':
+        return self._wrap(await self._call(lambda: _loaded(self._core.getEntityByName(name)), timeout=timeout))
+
+    async def statusAll(self, timeout = _DEFAULT)->dict:
+        return await self._call(self._core.statusAll, timeout=timeout)
+
+    async def lockAllEntities(self, timeout = _DEFAULT):
+        await self._call(self._core.lockAllEntities, timeout=timeout)
+
+    async def isAllEntitiesLocked(self, timeout = _DEFAULT)->bool:
+        return await self._call(self._core.isAllEntitiesLocked, timeout=timeout)
+
+    async def isAllEntitiesUnlocked(self, timeout = _DEFAULT)->bool:
+        return await self._call(self._core.isAllEntitiesUnlocked, timeout=timeout)
+
+    async def snapshot(self, timeout = _DEFAULT):
+        return await self._call(self._core.snapshot, timeout=timeout)
+
+    # ---- variables ----
+    async def getVariable(self, name: str, timeout = _DEFAULT):
+        return await self._call(self._core.vars.__getitem__, name, timeout=timeout)
+
+    async def getValues(self, names, timeout = _DEFAULT)->dict:
+        """ values of variables (names), name => value """
+        return await self._call(self._core.vars.get_many, names, timeout=timeout)
+
+    async def setValues(self, values: dict, timeout = _DEFAULT):
+        """ set values of variables, name => value """
+        await self._call(self._core.vars.set_many, values, timeout=timeout)
+
+    # ---- online activation ----
+    async def isServerAlive(self, timeout = _DEFAULT)->bool:
+        t = self.timeout if timeout is _DEFAULT else timeout
+        return await self._call(self._core.isServerAlive, _sdkTimeout(t), timeout=t, network=True)
+
+    async def isValidSN(self, serial: str, timeout = _DEFAULT)->bool:
+        t = self.timeout if timeout is _DEFAULT else timeout
+        return await self._call(self._core.isValidSN, serial, _sdkTimeout(t), timeout=t, network=True)
+
+    async def applySN(self, serial: str, timeout = _DEFAULT)->bool:
+        t = self.timeout if timeout is _DEFAULT else timeout
+        return await self._call(self._core.applySN, serial, _sdkTimeout(t), timeout=t, network=True)
+
+    async def revokeApp(self, timeout = _DEFAULT)->bool:
+        t = self.timeout if timeout is _DEFAULT else timeout
+        return await self._call(self._core.revokeApp, _sdkTimeout(t), timeout=t, network=True)
+
+    async def revokeSN(self, serial: str, timeout = _DEFAULT)->bool:
+        t = self.timeout if timeout is _DEFAULT else timeout
+        return await self._call(self._core.revokeSN, serial, _sdkTimeout(t), timeout=t, network=True)
+
+    # ---- offline activation ----
+    async def applyLicenseCode(self, code: str, serial: str, timeout = _DEFAULT)->bool:
+        return await self._call(self._core.applyLicenseCode, code, serial, timeout=timeout)
+
+    async def unlockRequestCode(self, timeout = _DEFAULT)->str:
+        return await self._call(lambda: self._core.unlockRequestCode, timeout=timeout)
+
+    async def cleanRequestCode(self, timeout = _DEFAULT)->str:
+        return await self._call(lambda: self._core.cleanRequestCode, timeout=timeout)
+
+    async def fixRequestCode(self, timeout = _DEFAULT)->str:
+        return await self._call(lambda: self._core.fixRequestCode, timeout=timeout)
+
+
+def _loaded(e: Entity)->Entity:
+    """ (e) with its metadata and its license's cached, called on the executor """
+    if e is not None:
+        e.id, e.name, e.description
+        lic = e.license
+        lic.id, lic.name, lic.description
+    return e
+
+
+class AsyncEntity:
+    """ awaitable facade of gs.Entity """
+    def __init__(self, core: AsyncCore, entity: Entity):
+        self._core = core
+        self.entity = entity
+        self._lic = AsyncLicense(core, entity.license)
+
+    def __repr__(self):
+        return f"AsyncEntity({self.entity.id})"
+
+    # metadata
+    @property
+    def id(self)->str:
+        return self.entity.id
+
+    @property
+    def name(self)->str:
+        return self.entity.name
+
+    @property
+    def description(self)->str:
+        return self.entity.description
+
+    @property
+    def license(self)->'AsyncLicense':
+        return self._lic
+
+    # operations
+    async def beginAccess(self, timeout = _DEFAULT)->bool:
+        return await self._core._call(self.entity.beginAccess, timeout=timeout)
+
+    async def endAccess(self, timeout = _DEFAULT)->bool:
+        return await self._core._call(self.entity.endAccess, timeout=timeout)
+
+    async def lock(self, timeout = _DEFAULT):
+        await self._core._call(self.entity.lock, timeout=timeout)
+
+    async def status(self, timeout = _DEFAULT)->EntityStatus:
+        return await self._core._call(self.entity.status, timeout=timeout)
+
+
+class AsyncLicense:
+    """ awaitable facade of gs.License """
+    def __init__(self, core: AsyncCore, lic: License):
+        self._core = core
+        self.license = lic
+
+    def __repr__(self):
+        return f"AsyncLicense({self.license.id})"
+
+    # metadata
+    @property
+    def id(self):
+        return self.license.id
+
+    @property
+    def name(self)->str:
+        return self.license.name
+
+    @property
+    def description(self)->str:
+        return self.license.description
+
+    def acceptAction(self, actId)->bool:
+        return self.license.acceptAction(actId)
+
+    # operations
+    async def valid(self, timeout = _DEFAULT)->bool:
+        return await self._core._call(lambda: self.license.valid, timeout=timeout)
+
+    async def status(self, timeout = _DEFAULT)->LicenseStatus:
+        return await self._core._call(lambda: self.license.status, timeout=timeout)
+
+    async def lock(self, timeout = _DEFAULT):
+        await self._core._call(self.license.lock, timeout=timeout)
+
+    async def params(self, timeout = _DEFAULT)->dict:
+        """ license parameters, name => value (None if not holding a valid value) """
+        def read():
+            return { name: (v.value if v.valid else None) for name, v in self.license.params.items() }
+        return await self._core._call(read, timeout=timeout)
+
+    async def inspect(self, *names, timeout = _DEFAULT)->dict:
+        """ values of inspector properties (names), name => value """
+        def read():
+            isp = self.license.inspector
+            return { name: getattr(isp, name) for name in names }
+        return await self._core._call(read, timeout=timeout)
+
+    async def unlockRequestCode(self, timeout = _DEFAULT)->str:
+        return await self._core._call(lambda: self.license.unlockRequestCode, timeout=timeout)
+
+
+#------------------ event stream -------------------------
+class EventStream:
+    """
+    Async iterator of monitor events, yields (event, entity), entity is None for app / license events.
+
+    Events are filtered by (kinds) and (entity) on the native callback thread and buffered, the loop is woken
+    up by call_soon_threadsafe() with at most one wakeup in flight, the callback never waits for the loop.
+    At most (maxsize) events are buffered, on overflow the oldest (DROP_OLDEST) buffered event or the incoming
+    one (DROP_NEWEST) is dropped.
+
+    The monitor holds the stream weakly: a stream left without close() (breaking out of async for) stops
+    receiving events once garbage collected, or once its loop is closed.
+
+        async with gs.events(kinds=[gs.Event.EVENT_ENTITY_ACCESS_INVALID]) as stream:
+            async for event, entity in stream:
+                ...
+    """
+    DROP_OLDEST = 'drop-oldest'
+    DROP_NEWEST = 'drop-newest'
+
+    def __init__(self, loop = None, kinds = None, entity = None, maxsize: int = 256, overflow: str = DROP_OLDEST):
+        if overflow not in (EventStream.DROP_OLDEST, EventStream.DROP_NEWEST):
+            raise SdkError(f"unknown overflow policy ({overflow})")
+        self._loop = loop if loop is not None else asyncio.get_running_loop()
+        self._entityId = entity.id if isinstance(entity, Entity) else entity
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.dropped = 0
+
+        self._buffer = collections.deque()
+        self._waiter = None
+        self._closed = False
+        self._lock = threading.Lock()
+        self._wakeupPending = False # a wakeup is scheduled to the loop
+
+        # Event is an IntFlag, iterating it skips values that are not a single bit
+        kinds = Event.__members__.values() if kinds is None else kinds
+        self._hook = _weakHook(weakref.ref(self))
+        _monitor.addHook(self._hook, { int(k) for k in kinds if Event.EVENT_ID_MIN < k < Event.EVENT_ID_MAX })
+
+    def __del__(self):
+        if not self._closed:
+            self._closed = True
+            _monitor.removeHook(self._hook)
+
+    def close(self):
+        """ stop receiving events, iteration ends once events already received are consumed """
+        if not self._closed:
+            self._closed = True
+            _monitor.removeHook(self._hook)
+            self._loop.call_soon_threadsafe(self._wakeup)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while True:
+            with self._lock:
+                if self._buffer:
+                    return self._buffer.popleft()
+            if self._closed:
+                raise StopAsyncIteration
+            self._waiter = self._loop.create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    # native callback thread
+    def _onEvent(self, eventId: int, hEvent):
+        event = Event(eventId)
+        entity = None
+        if getEventType(eventId) == EventType.EVENT_TYPE_ENTITY:
+            entity = _monitor._resolveEntity(hEvent, event)
+            if self._entityId is not None and entity.id != self._entityId:
+                return
+        elif self._entityId is not None:
+            return
+
+        with self._lock:
+            b = self._buffer
+            if len(b) >= self.maxsize:
+                self.dropped += 1
+                if self.overflow == EventStream.DROP_NEWEST:
+                    return
+                b.popleft()
+            b.append((event, entity))
+
+            if self._wakeupPending:
+                return
+            self._wakeupPending = True
+        try:
+            self._loop.call_soon_threadsafe(self._wakeup)
+        except RuntimeError:
+            # loop closed, nobody is left to consume events
+            self._closed = True
+            _monitor.removeHook(self._hook)
+
+    # loop thread
+    def _wakeup(self):
+        with self._lock:
+            self._wakeupPending = False
+        w = self._waiter
+        if w is not None and not w.done():
+            w.set_result(None)
+
+
+def _weakHook(ref):
+    """ monitor hook forwarding to EventStream (ref), removes itself once the stream is gone """
+    def hook(eventId: int, hEvent):
+        stream = ref()
+        if stream is None:
+            _monitor.removeHook(hook)
+        else:
+            stream._onEvent(eventId, hEvent)
+    return hook
+
+def events(loop = None, kinds = None, entity = None, maxsize: int = 256, overflow: str = EventStream.DROP_OLDEST)->EventStream:
+    """
+    subscribe to monitor events as an async iterator
+
+    loop: event loop to deliver events to, the running loop by default
+    kinds: ids of events to receive, all events by default
+    entity: only receive events of this entity (id or Entity)
+    """
+    return EventStream(loop, kinds, entity, maxsize, overflow)
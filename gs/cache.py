@@ -0,0 +1,62 @@
+"""
+License / entity state cache
+
+When enabled (gs.Core().enableStateCache()), reads of entity attributes, license status / validity and
+variable values are cached in the owning object until the global generation changes. The generation is
+bumped by the sdk events changing license state and by local calls mutating it (lock, applySN, ...).
+
+An optional max-staleness (in seconds) bounds how long a cached value is trusted, for license models
+whose state changes with time (TRIAL_PERIOD, TRIAL_SESSION...) without any event.
+"""
+
+import time
+
+class _State:
+    __slots__ = ('enabled', 'generation', 'maxStaleness', 'epoch')
+
+    def __init__(self):
+        self.enabled = False
+        self.generation = 0
+        self.maxStaleness = None
+        self.epoch = 0 # bumped when license structure may change (action applied, re-init)
+
+state = _State()
+
+
+def enable(maxStaleness: float = None):
+    """ enable state cache, cached values expire after (maxStaleness) seconds if specified """
+    state.maxStaleness = maxStaleness
+    state.generation += 1
+    state.enabled = True
+
+def disable():
+    """ disable state cache """
+    state.enabled = False
+    state.generation += 1
+
+def invalidate():
+    """ all cached state becomes stale """
+    state.generation += 1
+
+def reset():
+    """ license actions applied or core re-initialized, everything resolved from sdk core becomes stale """
+    state.epoch += 1
+    state.generation += 1
+
+def get(owner, slot: str, load):
+    """
+    value cached in owner's attribute (slot), (load) is called to read it from sdk core when stale
+
+    the caller checks state.enabled first, so that the uncached path costs nothing.
+    """
+    c = owner.__dict__.get(slot)
+    if c is not None and c[0] == state.generation:
+        if state.maxStaleness is None or time.monotonic() - c[1] < state.maxStaleness:
+            return c[2]
+
+    # generation taken before loading, so an invalidation racing with the load is not lost
+    gen = state.generation
+    t = time.monotonic()
+    v = load()
+    owner.__dict__[slot] = (gen, t, v)
+    return v
@@ -1,15 +1,23 @@
 """SoftwareShield core api"""
 
 from . import intf as _intf
-from .util import SdkError, once, one_call, mustbe, pchar2str, str2pchar
-from .entity import Entity
-from .var import Variable
+from . import cache as _cache
+from . import storage as _storage
+from . import trace as _trace
+from . import handles as _handles
+from .util import SdkError, cached_property, uncache, one_call, mustbe, pchar2str, str2pchar
+from .entity import Entity, EntityStatus
+from .var import Variable, VariableRegistry
 from .req import Request
 from .act import ActionId
 
 import os
+import re
+import time
 import logging
 import ctypes
+import threading
+from collections import OrderedDict
 
 def core_must_inited(f):
     """ decorator to enforce the gs.Core must be initialized before api can be called. """
@@ -39,6 +47,13 @@ class Core(object):
         self._rc = -1 # not initialized
         self._inited = False # not initialized yet
         self._entities = None # entity list
+        self._entityById = {} # entity indexes, built together with entity list
+        self._entityByName = {}
+        self._entityByHandle = {}
+        self._vars = VariableRegistry() # cached variables
+        self._snCache = OrderedDict() # serial => (time validated, valid), LRU, see validateSerials()
+        self._snLock = threading.Lock()
+        self._health = None # HealthMonitor guarding online calls
 
         from .monitor import initMonitor
         initMonitor() # setup sdk monitor
@@ -49,6 +64,7 @@ class Core(object):
         '''get SDK version'''
         return pchar2str(_intf.gsGetVersion())
 
+    @_trace.traced("Core.init", lambda self, productId, *args: { 'product': productId })
     def init(self, productId, pathToLic, password):
         """
         Loads from local storage first, if not found, loads from external license file.
@@ -59,12 +75,16 @@ class Core(object):
 
         # already initialized successfully?
         if self._rc != 0:
+            from .monitor import initMonitor
+            initMonitor() # monitor is gone after cleanUp()
+
             if pathToLic != '':
                 pathToLic = os.path.abspath(pathToLic)
                 logging.info(f"license path ({pathToLic})")
 
             self._rc = _intf.gsInit(str2pchar(productId), str2pchar(pathToLic), str2pchar(password),None)
             self._inited = True
+            _cache.reset()
             logging.debug(f"rc: {self._rc}")
         else:
             logging.debug("init: already initialized, bypass")
@@ -75,7 +95,75 @@ class Core(object):
         """
         Cleanup sdk resources on app exit.
         """
+        _storage.disableWriteBehind()
+        self.disableHealthMonitor()
+        from . import scheduler, monitor
+        monitor.disableDispatcher() # entity handles are gone after clean up
+        scheduler.shutdown()
+
+        _handles.closeAll() # released at once, not by gc of each object after the sdk is gone
         _intf.gsCleanUp()
+        _cache.reset()
+        monitor.closeMonitor()
+
+        self._rc = -1
+        self._inited = False
+        self._entities = None
+        self._entityById = {}
+        self._entityByName = {}
+        self._entityByHandle = {}
+        self._vars.clear()
+        uncache(self, 'productId', 'productName', 'buildId')
+
+    # storage
+    @core_must_inited
+    def flush(self):
+        """ flush license storage """
+        _storage.flush()
+
+    def batch(self):
+        """
+        group writes to persistent variables, license storage is flushed once when the outermost block exits
+
+        only flushes of the calling thread are deferred, without a batch / write-behind policy writes are
+        persisted by the sdk core.
+
+        with core.batch():
+            core.vars['counter'].value += 1
+            ...
+        """
+        return _storage.batch()
+
+    def enableWriteBehind(self, interval: float = 1.0, maxDirty: int = 100):
+        """ flush writes to persistent variables in background, every (interval) seconds or once (maxDirty) writes are pending """
+        _storage.enableWriteBehind(interval, maxDirty)
+
+    def disableWriteBehind(self):
+        """ stop flushing in background, pending writes are flushed """
+        _storage.disableWriteBehind()
+
+    @property
+    def dirtyVariables(self)->frozenset:
+        """ names of persistent variables written but not flushed yet (in a batch or with write-behind) """
+        return frozenset(_storage.state.dirty)
+
+    # state cache
+    def enableStateCache(self, maxStaleness: float = None):
+        """
+        Cache entity / license state and variable values until they are changed by sdk events or local calls.
+
+        maxStaleness: seconds a cached value is trusted at most, useful for time based license models
+        (TRIAL_PERIOD, TRIAL_SESSION, ...) whose state changes without any event.
+        """
+        _cache.enable(maxStaleness)
+
+    def disableStateCache(self):
+        """ read entity / license state from sdk core on each access """
+        _cache.disable()
+
+    def invalidateState(self):
+        """ drop all cached state """
+        _cache.invalidate()
 
     @property
     @core_must_inited
@@ -90,22 +178,19 @@ class Core(object):
         return pchar2str(_intf.gsGetLastErrorMessage())
 
 
-    @property
-    @once
+    @cached_property
     @core_must_inited
     def productId(self):
         ''' Product Id '''
         return pchar2str(_intf.gsGetProductId())
     
-    @property
-    @once
+    @cached_property
     @core_must_inited
     def productName(self):
         ''' Product Name '''
         return pchar2str(_intf.gsGetProductName())
     
-    @property
-    @once
+    @cached_property
     @core_must_inited
     def buildId(self):
         ''' License Build Id '''
@@ -116,20 +201,73 @@ class Core(object):
     def entities(self):
         ''' all defined entities '''
         if not self._entities:
-            self._entities = [ Entity(_intf.gsOpenEntityByIndex(i)) for i in range(_intf.gsGetEntityCount()) ]
+            with _trace.span("Core.entities") as s:
+                self._entities = [ Entity(_intf.gsOpenEntityByIndex(i)) for i in range(_intf.gsGetEntityCount()) ]
+                s.set(count=len(self._entities))
+            self._entityById = { e.id: e for e in self._entities }
+            self._entityByName = { e.name: e for e in self._entities }
+            self._entityByHandle = { e.handle: e for e in self._entities }
         return self._entities
     
     @core_must_inited
     def getEntityById(self, entityId):
         ''' get entity by its id'''
-        for e in self.entities:
-            if e.id == entityId:
-                return e
+        if not self._entities:
+            self.entities
+        try:
+            return self._entityById[entityId]
+        except KeyError:
+            pass
 
         msg = f"entity not found, id=({entityId})"
         logging.warning(msg)
         raise SdkError(msg)
 
+    @core_must_inited
+    def getEntityByName(self, name):
+        ''' get entity by its name'''
+        if not self._entities:
+            self.entities
+        try:
+            return self._entityByName[name]
+        except KeyError:
+            pass
+
+        msg = f"entity not found, name=({name})"
+        logging.warning(msg)
+        raise SdkError(msg)
+
+    def _findEntityByHandle(self, hEntity):
+        ''' entity of handle (hEntity), None if not found or core not initialized yet '''
+        if not self._inited:
+            return None
+        if not self._entities:
+            self.entities
+        return self._entityByHandle.get(hEntity)
+
+    def on(self, event, fn, entity: Entity = None, weak: bool = True):
+        """
+        listen to event (event), returns a gs.monitor.Subscription
+
+        entity events: fn(entity, event) is called for events of (entity), any entity if None
+        app / license events: fn(event)
+
+        fn is held by weak reference unless (weak) is False, keep a reference to it as long as it should listen,
+        lambdas must be subscribed with weak=False.
+        """
+        from .monitor import subscribe
+        return subscribe(event, fn, None if entity is None else entity.handle, weak)
+
+    @core_must_inited
+    def snapshot(self):
+        """
+        Snapshot of product info, all entities, their licenses, parameters and inspector values in one sweep.
+
+        returns an immutable gs.snapshot.ProductSnapshot, handles used are closed before return.
+        """
+        from . import snapshot
+        return snapshot.take()
+
     @core_must_inited
     def getVariable(self, name):
         h = _intf.gsGetVariable(str2pchar(name))
@@ -138,32 +276,170 @@ class Core(object):
 
         return Variable(h)
 
+    @property
+    @core_must_inited
+    def vars(self)->VariableRegistry:
+        """
+        cached variables by name, each name is resolved once.
+
+        core.vars['age'].value
+        core.vars.get_many(['age', 'name'])
+        core.vars.set_many({'age': 10, 'name': 'randy'})
+        """
+        return self._vars
+
     #----- Online Activation ----
+    def enableHealthMonitor(self, ttl: float = 10.0, interval: float = None, timeout: int = -1,
+                            failureThreshold: int = 3, resetTimeout: float = 30.0):
+        """
+        cache license server status and guard online calls with a circuit breaker
+
+        isServerAlive() returns the status probed in background every (interval) seconds, online calls raise
+        gs.health.ServerUnavailable without contacting the server while the circuit is open.
+        """
+        from .health import HealthMonitor
+        self.disableHealthMonitor()
+        self._health = HealthMonitor(ttl, interval, timeout, failureThreshold, resetTimeout)
+        self._health.start()
+
+    def disableHealthMonitor(self):
+        h, self._health = self._health, None
+        if h is not None:
+            h.stop()
+
+    @property
+    def health(self):
+        """ HealthMonitor in use, None if not enabled """
+        return self._health
+
+    def _online(self, fn, *args):
+        h = self._health
+        return fn(*args) if h is None else h.call(fn, *args)
+
     def isServerAlive(self, timeout:int = -1)->bool:
         """ test if license server is alive """
+        if self._health is not None:
+            return self._health.alive
         return _intf.gsIsServerAlive(timeout)
 
     def isValidSN(self, serial:str, timeout:int = -1)->bool:
         """ test if the serial number is a valid one """
-        return _intf.gsIsSNValid(str2pchar(serial), timeout)
+        return self._online(_intf.gsIsSNValid, str2pchar(serial), timeout)
+
+    # serial numbers validated by validateSerials() kept in cache at most
+    SN_CACHE_SIZE = 4096
+
+    def validateSerials(self, serials, workers: int = 8, timeout: int = -1, format: str = None, ttl: float = 300):
+        """
+        validate serial numbers in parallel, yields (serial, valid) as results are available
 
+        serials are normalized (stripped, upper-cased) and de-duplicated, each unique serial is yielded once.
+        valid is None if it cannot be told (call failure, license server not available).
+
+        format: regular expression serials must match, others are rejected without server round-trip
+        ttl: seconds results are cached, only definitive answers are cached
+
+        for sn, ok in core.validateSerials(lines, workers=16):
+            ...
+        """
+        pattern = None if format is None else re.compile(format)
+        now = time.monotonic()
+        todo = []
+        seen = set()
+        for sn in serials:
+            sn = sn.strip().upper()
+            if sn in seen:
+                continue
+            seen.add(sn)
+
+            if pattern is not None and not pattern.fullmatch(sn):
+                yield sn, False
+                continue
+
+            c = self._cachedSerial(sn, now, ttl)
+            if c is not None:
+                yield sn, c
+            else:
+                todo.append(sn)
+
+        if not todo:
+            return
+
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+        pool = ThreadPoolExecutor(min(workers, len(todo)), thread_name_prefix="gs-sn")
+        alive = None # server status, probed once on first negative answer
+        try:
+            futures = { pool.submit(self.isValidSN, sn, timeout): sn for sn in todo }
+            for f in as_completed(futures):
+                sn = futures[f]
+                try:
+                    ok = f.result()
+                except Exception as e:
+                    logging.debug(f"validateSerials: ({sn}) failure: {e!r}")
+                    yield sn, None
+                    continue
+
+                if not ok:
+                    # a negative answer only tells the serial is invalid if the server could be reached
+                    if alive is None:
+                        try:
+                            alive = self.isServerAlive(timeout)
+                        except Exception:
+                            alive = False
+                    if not alive:
+                        yield sn, None
+                        continue
+
+                self._cacheSerial(sn, ok)
+                yield sn, ok
+        finally:
+            # consumer might stop early
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _cachedSerial(self, sn: str, now: float, ttl: float)->bool:
+        with self._snLock:
+            c = self._snCache.get(sn)
+            if c is None:
+                return None
+            if now - c[0] >= ttl:
+                del self._snCache[sn]
+                return None
+            self._snCache.move_to_end(sn)
+            return c[1]
+
+    def _cacheSerial(self, sn: str, ok: bool):
+        with self._snLock:
+            self._snCache[sn] = (time.monotonic(), ok)
+            self._snCache.move_to_end(sn)
+            while len(self._snCache) > self.SN_CACHE_SIZE:
+                self._snCache.popitem(last=False)
+
+    def clearSerialCache(self):
+        """ forget cached results of validateSerials() """
+        with self._snLock:
+            self._snCache.clear()
+
+    @_trace.traced("Core.applySN")
     def applySN(self, serial:str, timeout:int = -1)->bool:
         """ apply serial """
         rc = ctypes.c_int(0)
-        ok = _intf.gsApplySN(str2pchar(serial), ctypes.byref(rc), None, timeout)
-        
-        print(f"applySN: rc: ({rc}) ok: {ok}")
-        logging.debug(f"applySN: rc: ({rc}) ok: {ok}")
+        ok = self._online(_intf.gsApplySN, str2pchar(serial), ctypes.byref(rc), None, timeout)
+        _cache.reset()
+        logging.debug(f"applySN: rc: ({rc.value}) ok: {ok}")
 
         return ok
 
     def revokeApp(self, timeout:int = -1)->bool:
         """ revoke all of the app serial numbers """
-        return _intf.gsRevokeApp(timeout, None)
+        ok = self._online(_intf.gsRevokeApp, timeout, None)
+        _cache.reset()
+        return ok
 
     def revokeSN(self, serial: str, timeout:int = -1)->bool:
         """ revoke a serial number """
-        return _intf.gsRevokeSN(timeout, str2pchar(serial))
+        ok = self._online(_intf.gsRevokeSN, timeout, str2pchar(serial))
+        _cache.reset()
+        return ok
 
     # ----- Offline Activation ------
     @core_must_inited
@@ -173,30 +449,42 @@ class Core(object):
         """
         return Request(_intf.gsCreateRequest())
 
+    def request(self):
+        """
+        Create a request object, closed on exit of with block
+
+            with core.request() as req:
+                req.addAction(ActionId.ACT_UNLOCK)
+                code = req.code
+        """
+        return self.createRequest()
+
     def applyLicenseCode(self, code:str, serial:str)->bool:
         """ apply a license code from vendor """
-        return _intf.gsApplyLicenseCodeEx(str2pchar(code), str2pchar(serial), None)
+        ok = _intf.gsApplyLicenseCodeEx(str2pchar(code), str2pchar(serial), None)
+        _cache.reset()
+        return ok
 
     @property 
     def unlockRequestCode(self)->str:
         """ request code to unlock all entities (the whole app) """
-        req = self.createRequest()
-        req.addAction(ActionId.ACT_UNLOCK)
-        return req.code
+        with self.request() as req:
+            req.addAction(ActionId.ACT_UNLOCK).close()
+            return req.code
 
     @property 
     def cleanRequestCode(self)->str:
         """ request code to clean up local license storage """
-        req = self.createRequest()
-        req.addAction(ActionId.ACT_CLEAN)
-        return req.code
+        with self.request() as req:
+            req.addAction(ActionId.ACT_CLEAN).close()
+            return req.code
 
     @property 
     def fixRequestCode(self)->str:
         """ request code to fix license error """
-        req = self.createRequest()
-        req.addAction(ActionId.ACT_FIX)
-        return req.code
+        with self.request() as req:
+            req.addAction(ActionId.ACT_FIX).close()
+            return req.code
 
     # license management
 
@@ -205,13 +493,17 @@ class Core(object):
         for e in self.entities:
             e.lock()
 
+    def statusAll(self)->dict:
+        """ status of all entities (entity id => EntityStatus), see Entity.status() """
+        return { e.id: e.status() for e in self.entities }
+
     def isAllEntitiesLocked(self)->bool:
         """ Are all entities already locked down? """
-        return all((e.locked for e in self.entities))
+        return all((s.locked for s in self.statusAll().values()))
 
     def isAllEntitiesUnlocked(self)->bool:
         """ Are all entities already unlocked (full purchased)? """
-        return all((e.unlocked for e in self.entities))
+        return all((s.unlocked for s in self.statusAll().values()))
 
 
 
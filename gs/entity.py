@@ -3,8 +3,10 @@ Entity
 """
 
 from . import intf as _intf
-from .util import once, pchar2str, HObject
-from .lic import License
+from . import cache as _cache
+from . import trace as _trace
+from .util import cached_property, pchar2str, HObject
+from .lic import License, LicenseStatus
 from enum import IntFlag
 
 
@@ -16,27 +18,93 @@ class EntityAttribute(IntFlag):
     LOCKED = 8     # Entity is locked (via entity.lock())
     AUTOSTART = 16 # Entity is auto-start (entity.beginAccess() is called automatically on app start)
 
+# attribute bits as plain int for fast bit tests
+_ACCESSIBLE = 1
+_UNLOCKED = 2
+_ACCESSING = 4
+_LOCKED = 8
+_AUTOSTART = 16
+
+
+class EntityStatus:
+    """
+    Immutable status record of an entity, taken from the entity attributes.
+
+    The license status is LOCKED / UNLOCKED if told by the attributes, otherwise (licenseStatus), ACTIVE by
+    default: the attributes cannot tell an invalid (unknown) status, License.status reads it.
+    """
+    __slots__ = ('attributes', 'licenseStatus', 'valid')
+
+    def __init__(self, attributes: int, licenseStatus: LicenseStatus = LicenseStatus.ACTIVE):
+        object.__setattr__(self, 'attributes', attributes)
+        if attributes & _LOCKED:
+            status = LicenseStatus.LOCKED
+        elif attributes & _UNLOCKED:
+            status = LicenseStatus.UNLOCKED
+        else:
+            status = licenseStatus
+        object.__setattr__(self, 'licenseStatus', status)
+        object.__setattr__(self, 'valid', attributes & _ACCESSIBLE != 0)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("EntityStatus is read-only")
+
+    def __eq__(self, other):
+        return isinstance(other, EntityStatus) and other.attributes == self.attributes and \
+            other.licenseStatus == self.licenseStatus
+
+    def __hash__(self):
+        return hash((self.attributes, self.licenseStatus))
+
+    def __repr__(self):
+        return f"EntityStatus({EntityAttribute(self.attributes)!r})"
+
+    @property
+    def accessible(self)->bool:
+        return self.attributes & _ACCESSIBLE != 0
+
+    @property
+    def unlocked(self)->bool:
+        return self.attributes & _UNLOCKED != 0
+
+    @property
+    def accessing(self)->bool:
+        return self.attributes & _ACCESSING != 0
+
+    @property
+    def locked(self)->bool:
+        return self.attributes & _LOCKED != 0
+
+    @property
+    def autoStart(self)->bool:
+        return self.attributes & _AUTOSTART != 0
+
 class Entity(HObject):
     def __init__(self, handle):
         super().__init__(handle)
         # bundled license
         self._lic = License(self)
 
-    @property
-    @once
+    def close(self):
+        """ close handles of entity and its license """
+        lic = getattr(self, '_lic', None)
+        if lic is not None:
+            lic.close()
+        super().close()
+
+    @cached_property
     def name(self):
         return pchar2str(_intf.gsGetEntityName(self._handle))
         
-    @property
-    @once
+    @cached_property
     def id(self):
         return pchar2str(_intf.gsGetEntityId(self._handle))
     
-    @property
-    @once
+    @cached_property
     def description(self):
         return pchar2str(_intf.gsGetEntityDescription(self._handle))
 
+    @_trace.traced("Entity.beginAccess", lambda self: { 'entity': self.id })
     def beginAccess(self):
         """
          Try start accessing an entity.
@@ -45,14 +113,26 @@ class Entity(HObject):
 
         This api can be called recursively, and each call must be paired with an endAccess().
         """
+        _cache.invalidate()
         return _intf.gsBeginAccessEntity(self._handle)
         
     def endAccess(self):
         """
         Try end accessing an entity
         """
+        _cache.invalidate()
         return _intf.gsEndAccessEntity(self._handle)
 
+    def on(self, event, fn, weak: bool = True):
+        """
+        call fn(entity, event) on entity event (event) of this entity, returns a gs.monitor.Subscription
+
+        fn is held by weak reference unless (weak) is False, keep a reference to it as long as it should listen,
+        lambdas must be subscribed with weak=False.
+        """
+        from .monitor import subscribe
+        return subscribe(event, fn, self._handle, weak)
+
     # License
     @property
     def license(self):
@@ -64,36 +144,53 @@ class Entity(HObject):
         self.license.lock()
 
     # attribute and helpers
+    def _readAttributes(self)->int:
+        return _intf.gsGetEntityAttributes(self._handle)
+
+    def _attributes(self)->int:
+        if _cache.state.enabled:
+            return _cache.get(self, '_cachedAttr', self._readAttributes)
+        return _intf.gsGetEntityAttributes(self._handle)
+
     @property
     def attribute(self):
         """ entity attributes / status """
-        return EntityAttribute(_intf.gsGetEntityAttributes(self._handle))
+        return EntityAttribute(self._attributes())
+
+    def status(self)->EntityStatus:
+        """
+        entity status (attributes, license status and validity) in one sdk call
+        """
+        if _cache.state.enabled:
+            return _cache.get(self, '_cachedStatus', self._readStatus)
+        return self._readStatus()
+
+    def _readStatus(self)->EntityStatus:
+        return EntityStatus(_intf.gsGetEntityAttributes(self._handle))
 
     @property
     def accessible(self):
         """ entity can be accessed """
-        return self.attribute & EntityAttribute.ACCESSIBLE != 0
+        return self._attributes() & _ACCESSIBLE != 0
 
     @property
     def locked(self):
         """ entity is already locked
           entity can be locked after its license is expired or manually locked (via Entity.lock())
         """
-        return self.attribute & EntityAttribute.LOCKED != 0
+        return self._attributes() & _LOCKED != 0
     
     @property
     def unlocked(self):
         """ entity is already unlocked """
-        return self.attribute & EntityAttribute.UNLOCKED != 0
+        return self._attributes() & _UNLOCKED != 0
 
     @property
     def accessing(self):
         """ entity is being accessed """
-        return self.attribute & EntityAttribute.ACCESSING != 0
+        return self._attributes() & _ACCESSING != 0
     
     @property
     def autoStart(self):
         """ entity is auto-started """
-        return self.attribute & EntityAttribute.AUTOSTART != 0
-
-        
+        return self._attributes() & _AUTOSTART != 0
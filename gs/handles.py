@@ -0,0 +1,207 @@
+"""
+Live handle accounting
+
+Every sdk object (Entity, License, Variable, Request, Action) holding a native handle is accounted here from
+creation until its handle is closed, per kind:
+
+    print(gs.handles.report())
+
+The creation site (call stack) of one in every (sampling) handles is captured, so that long living handles
+can be traced back to the code opening them.
+
+In debug mode (setDebug(True)) a warning is logged for each handle reclaimed by the cyclic garbage collector
+rather than released promptly by reference counting, the object was part of a reference cycle.
+
+Handles are released by a weakref.finalize registered by track(), or earlier by HObject.close(). Finalizers
+do not run at interpreter exit, closeAll() releases all live handles at once before the sdk is cleaned up.
+"""
+
+from . import intf as _intf
+
+import gc
+import itertools
+import logging
+import threading
+import time
+import traceback
+import weakref
+
+
+_lock = threading.Lock()
+_live = {}      # key => _Record
+_counts = {}    # kind => live handles
+_peaks = {}     # kind => max live handles
+_created = {}   # kind => handles created
+_peak = 0       # max live handles of all kinds
+_seq = itertools.count(1) # keys _live (id(obj) is reused once obj is gone) and drives sampling
+
+_sampling = 100 # capture creation site of 1 in every (_sampling) handles, 0 to disable
+_DEPTH = 8      # frames of a captured creation site
+
+_kinds = {}     # type => kind
+
+
+class _Record:
+    __slots__ = ('kind', 'handle', 'created', 'site', 'finalizer')
+
+    def __init__(self, kind, handle, site):
+        self.kind = kind
+        self.handle = handle
+        self.created = time.monotonic()
+        self.site = site
+        self.finalizer = None
+
+
+def _kindOf(cls)->str:
+    """ name of the direct HObject subclass (cls) derives from, Action subclasses are all Action """
+    kind = _kinds.get(cls)
+    if kind is None:
+        mro = cls.__mro__
+        for i, c in enumerate(mro):
+            if c.__name__ == 'HObject' and i > 0:
+                kind = mro[i - 1].__name__
+                break
+        else:
+            kind = cls.__name__
+        _kinds[cls] = kind
+    return kind
+
+def track(obj)->weakref.finalize:
+    """ handle of (obj) opened, returns the finalizer closing it once (obj) is gone """
+    global _peak
+    kind = _kindOf(type(obj))
+    site = None
+    key = next(_seq)
+    if _sampling and key % _sampling == 0:
+        site = traceback.extract_stack(limit=_DEPTH + 2)[:-2] # skip track() and HObject.__init__
+
+    rec = _Record(kind, obj._handle, site)
+    rec.finalizer = fin = weakref.finalize(obj, _release, key, rec.handle)
+    fin.atexit = False
+    with _lock:
+        _live[key] = rec
+        n = _counts[kind] = _counts.get(kind, 0) + 1
+        if n > _peaks.get(kind, 0):
+            _peaks[kind] = n
+        _created[kind] = _created.get(kind, 0) + 1
+        if len(_live) > _peak:
+            _peak = len(_live)
+    return fin
+
+def _release(key: int, handle):
+    """ finalizer: close (handle) of the object tracked as (key) """
+    _untrack(key)
+    _intf.gsCloseHandle(handle)
+
+def _untrack(key: int):
+    with _lock:
+        rec = _live.pop(key, None)
+        if rec is None:
+            return
+        _counts[rec.kind] -= 1
+
+    if _collecting == threading.get_ident():
+        site = "" if rec.site is None else "\n" + "".join(traceback.format_list(rec.site))
+        logging.warning(f"{rec.kind} handle ({rec.handle}) reclaimed by cyclic gc, "
+                        f"{time.monotonic() - rec.created:.3f}s after creation{site}")
+
+
+def report(oldest: int = 10)->dict:
+    """
+    live: kind => live handles
+    peak: kind => max live handles
+    created: kind => handles created
+    total / totalPeak: live handles of all kinds, now and at most
+    oldest: (oldest) longest living handles, { kind, handle, age (seconds), site (captured creation site or None) }
+    """
+    now = time.monotonic()
+    with _lock:
+        live = { k: n for k, n in _counts.items() if n }
+        peak = dict(_peaks)
+        created = dict(_created)
+        total = len(_live)
+        totalPeak = _peak
+        # records are inserted in creation order
+        recs = []
+        for rec in _live.values():
+            if len(recs) >= oldest:
+                break
+            recs.append(rec)
+
+    return {
+        'live': live,
+        'peak': peak,
+        'created': created,
+        'total': total,
+        'totalPeak': totalPeak,
+        'oldest': [ {
+            'kind': rec.kind,
+            'handle': rec.handle,
+            'age': now - rec.created,
+            'site': None if rec.site is None else traceback.format_list(rec.site),
+        } for rec in recs ],
+    }
+
+def closeAll()->int:
+    """
+    close all live handles, returns the number of handles closed
+
+    Objects are detached from their handles (finalizers cancelled), called before the sdk is cleaned up.
+    """
+    with _lock:
+        recs = list(_live.values())
+        _live.clear()
+        for kind in _counts:
+            _counts[kind] = 0
+
+    close = _intf.gsCloseHandle
+    n = 0
+    for rec in recs:
+        info = rec.finalizer.detach()
+        if info is None:
+            continue # closed meanwhile
+        info[0]._handle = None
+        close(rec.handle)
+        n += 1
+    return n
+
+def live(kind: str = None)->int:
+    """ live handles of (kind), or of all kinds """
+    if kind is None:
+        return len(_live)
+    return _counts.get(kind, 0)
+
+def setSampling(every: int):
+    """ capture creation site of 1 in every (every) handles, 1 for all, 0 to disable """
+    global _sampling
+    if every < 0:
+        raise ValueError("(every) must not be negative!")
+    _sampling = every
+
+def reset():
+    """ reset peaks and creation counters to current live handles """
+    global _peak
+    with _lock:
+        _peaks.clear()
+        _peaks.update(_counts)
+        _created.clear()
+        _peak = len(_live)
+
+
+#------------------ Debug -------------------------
+_collecting = None # ident of thread running the cyclic gc
+
+def _onGc(phase, info):
+    global _collecting
+    _collecting = threading.get_ident() if phase == 'start' else None
+
+def setDebug(enabled: bool):
+    """ log a warning for every handle reclaimed by the cyclic gc """
+    global _collecting
+    if enabled:
+        if _onGc not in gc.callbacks:
+            gc.callbacks.append(_onGc)
+    else:
+        if _onGc in gc.callbacks:
+            gc.callbacks.remove(_onGc)
+        _collecting = None
@@ -0,0 +1,235 @@
+"""
+License server health
+
+HealthMonitor caches the result of gsIsServerAlive() for (ttl) seconds and refreshes it in background, and
+guards online activation calls (isValidSN / applySN / revokeSN / revokeApp) with a circuit breaker:
+
+    closed:    calls go through; consecutive failures (errors, or negative answers while a probe finds the
+               server down) open the circuit
+    open:      calls fail fast with ServerUnavailable until (resetTimeout) seconds elapsed
+    half-open: a single trial call (or probe) decides whether to close or re-open the circuit
+
+Enabled with gs.Core().enableHealthMonitor(), breaker state is available from Core.health.stats.
+"""
+
+from . import intf as _intf
+from .util import SdkError
+
+import logging
+import threading
+import time
+
+
+class ServerUnavailable(SdkError):
+    """ online call rejected, license server is considered down """
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failureThreshold: int = 3, resetTimeout: float = 30.0):
+        self.failureThreshold = failureThreshold
+        self.resetTimeout = resetTimeout
+        self._lock = threading.Lock()
+        self._state = CircuitBreaker.CLOSED
+        self._failures = 0      # consecutive failures
+        self._openedAt = 0
+        self._trial = False     # trial call in flight (half-open)
+        self._opens = 0
+        self._rejected = 0
+
+    def _current(self)->str:
+        # called with lock held
+        if self._state == CircuitBreaker.OPEN and time.monotonic() - self._openedAt >= self.resetTimeout:
+            self._state = CircuitBreaker.HALF_OPEN
+            self._trial = False
+        return self._state
+
+    @property
+    def state(self)->str:
+        with self._lock:
+            return self._current()
+
+    def acquire(self):
+        """ a call is about to be made, raises ServerUnavailable if the circuit does not let it through """
+        with self._lock:
+            state = self._current()
+            if state == CircuitBreaker.CLOSED:
+                return
+            if state == CircuitBreaker.HALF_OPEN and not self._trial:
+                self._trial = True
+                return
+            self._rejected += 1
+        raise ServerUnavailable("license server unavailable (circuit open)")
+
+    def success(self):
+        with self._lock:
+            self._failures = 0
+            self._trial = False
+            self._state = CircuitBreaker.CLOSED
+
+    def failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial = False
+            state = self._current()
+            if state == CircuitBreaker.HALF_OPEN or (state == CircuitBreaker.CLOSED and self._failures >= self.failureThreshold):
+                self._state = CircuitBreaker.OPEN
+                self._openedAt = time.monotonic()
+                self._opens += 1
+
+    @property
+    def stats(self)->dict:
+        with self._lock:
+            return {
+                'state': self._current(),
+                'failures': self._failures,
+                'opens': self._opens,
+                'rejected': self._rejected,
+            }
+
+
+class HealthMonitor:
+    """
+    ttl: seconds the probed server status is trusted
+    interval: seconds between background probes, defaults to (ttl)
+    timeout: sdk timeout of probes
+    """
+    def __init__(self, ttl: float = 10.0, interval: float = None, timeout: int = -1,
+                 failureThreshold: int = 3, resetTimeout: float = 30.0):
+        self.ttl = ttl
+        self.interval = ttl if interval is None else interval
+        self.timeout = timeout
+        self.breaker = CircuitBreaker(failureThreshold, resetTimeout)
+
+        self._lock = threading.Lock()
+        self._alive = None   # last probed status
+        self._probedAt = 0
+        self._probes = 0
+        self._probing = False
+        self._confirming = threading.Lock() # serializes probes confirming negative answers
+        self._stop = False
+        self._wakeup = threading.Event() # probe now
+        self._thread = None
+
+    def start(self):
+        """ probe in background every (interval) seconds """
+        if self._thread is None:
+            self._stop = False
+            self._wakeup.clear()
+            self._thread = threading.Thread(target=self._run, name="gs-health", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop = True
+            self._wakeup.set()
+            if thread is not threading.current_thread():
+                thread.join()
+
+    def _run(self):
+        while True:
+            self.probe()
+            self._wakeup.wait(self.interval)
+            if self._stop:
+                return
+            self._wakeup.clear()
+
+    def probe(self)->bool:
+        """ probe server now """
+        alive = self._probe()
+        if alive:
+            self.breaker.success()
+        else:
+            self.breaker.failure()
+        return alive
+
+    def _probe(self)->bool:
+        with self._lock:
+            self._probing = True
+        try:
+            alive = _intf.gsIsServerAlive(self.timeout)
+        except Exception:
+            logging.exception("license server probe failure")
+            alive = False
+
+        with self._lock:
+            self._alive = alive
+            self._probedAt = time.monotonic()
+            self._probes += 1
+            self._probing = False
+        return alive
+
+    def _aliveSince(self, t: float)->bool:
+        """ server status probed after (t), concurrent callers share a single probe """
+        with self._confirming:
+            with self._lock:
+                if self._alive is not None and self._probedAt >= t:
+                    return self._alive
+            return self._probe()
+
+    def refresh(self):
+        """ re-probe in background unless a probe is already running """
+        if self._thread is not None:
+            self._wakeup.set() # probed by the monitor thread
+            return
+
+        with self._lock:
+            if self._probing:
+                return
+            self._probing = True
+        threading.Thread(target=self.probe, name="gs-health-probe", daemon=True).start()
+
+    @property
+    def alive(self)->bool:
+        """ cached server status, probed synchronously only if never known """
+        with self._lock:
+            alive = self._alive
+            stale = time.monotonic() - self._probedAt >= self.ttl
+        if alive is None:
+            return self.probe()
+        if stale:
+            self.refresh()
+        return alive
+
+    def call(self, fn, *args):
+        """
+        call online api fn(*args) through the circuit breaker
+
+        errors count as failures. a negative answer is legit (invalid serial) unless the server cannot be
+        reached, it is a failure only if a probe made after the call started finds the server down.
+        """
+        b = self.breaker
+        b.acquire()
+        t = time.monotonic()
+        try:
+            ok = fn(*args)
+        except Exception:
+            self._failed()
+            raise
+
+        if ok or self._aliveSince(t):
+            b.success()
+        else:
+            b.failure()
+        return ok
+
+    def _failed(self):
+        b = self.breaker
+        b.failure()
+        if b.state != CircuitBreaker.CLOSED:
+            self.refresh()
+
+    @property
+    def stats(self)->dict:
+        with self._lock:
+            stats = {
+                'alive': self._alive,
+                'age': time.monotonic() - self._probedAt if self._alive is not None else None,
+                'probes': self._probes,
+            }
+        stats.update(self.breaker.stats)
+        return stats
@@ -2,11 +2,11 @@ __all__ = [
     "gsGetVersion", "gsInit", "gsInitEx", "gsFlush", "gsCleanUp", "gsCloseHandle", "gsGetLastErrorCode", "gsGetLastErrorMessage",
 
     "gsGetProductId", "gsGetProductName", "gsGetBuildId",
-    
+
     "gsGetEntityCount","gsOpenEntityByIndex","gsOpenEntityById","gsGetEntityAttributes","gsGetEntityId","gsGetEntityName","gsGetEntityDescription","gsBeginAccessEntity","gsEndAccessEntity",
 
     "gsOpenLicense","gsGetLicenseId","gsGetLicenseName","gsGetLicenseDescription","gsGetLicenseStatus","gsIsLicenseValid","gsLockLicense","gsGetLicenseParamCount","gsGetLicenseParamByIndex",
-    
+
     "gsGetVariable","gsGetVariableName","gsGetVariableType", "gsVariableTypeToString", "gsGetVariableAttr","gsIsVariableValid",
     "gsGetVariableValueAsString","gsSetVariableValueFromString","gsGetVariableValueAsInt","gsSetVariableValueFromInt",
     "gsGetVariableValueAsInt64","gsSetVariableValueFromInt64","gsGetVariableValueAsFloat","gsSetVariableValueFromFloat",
@@ -19,7 +19,68 @@ __all__ = [
 
     "gsIsServerAlive", "gsApplySN", "gsIsSNValid","gsApplyLicenseCodeEx","gsRevokeApp","gsRevokeSN",
 
-    "gs5_monitor_callback", "gsCreateMonitorEx", "gsGetEventSource"
+    "gs5_monitor_callback", "gsCreateMonitorEx", "gsGetEventSource",
+
+    "setCorePath", "isCoreLoaded",
+
+    "Backend", "NativeBackend", "use", "backend"
 ]
 
-from .v5 import *
\ No newline at end of file
+import os
+
+from . import v5 as _v5
+from .v5 import gs5_monitor_callback, setCorePath, isCoreLoaded
+from .backend import Backend, NativeBackend
+from . import instrument as _instrument
+
+# environment variable to select the default backend ('native' or 'sim')
+ENV_BACKEND = "GS_BACKEND"
+
+_backend = None # backend in use
+
+def _clearResolved():
+    ''' forget all apis resolved from current backend '''
+    g = globals()
+    for name in _v5._PROTOTYPES:
+        g.pop(name, None)
+
+def use(b: Backend):
+    '''
+    switch sdk backend
+
+    Must be called before gs.Core is initialized (or after gs.Core().cleanUp()), objects created from
+    the previous backend are not valid any more.
+    '''
+    global _backend
+    if not isinstance(b, Backend):
+        raise TypeError("(b) must be of type (gs.intf.Backend)!")
+
+    if _backend is not None:
+        _backend._invalidate = None
+    _clearResolved()
+    _backend = b
+    b._invalidate = _clearResolved
+
+def backend()->Backend:
+    ''' current backend '''
+    if _backend is None:
+        if os.environ.get(ENV_BACKEND, 'native') == 'sim':
+            from .sim import SimCore
+            use(SimCore())
+        else:
+            use(NativeBackend())
+    return _backend
+
+def __getattr__(name):
+    ''' apis are resolved from current backend on first use '''
+    if name not in _v5._PROTOTYPES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    b = backend()
+    f = b.resolve(name)
+    if _instrument.enabled:
+        f = _instrument.wrap(name, f, b.resolve('gsGetLastErrorCode'))
+    from .. import trace as _trace
+    if _trace.enabled:
+        f = _trace.wrap(name, f)
+    globals()[name] = f
+    return f
@@ -0,0 +1,30 @@
+""" Backend interface to sdk core
+
+A backend resolves each sdk api (named after the native prototypes, "gsInit", "gsGetEntityCount", ...)
+to a callable with the same calling convention as the ctypes prototype in gs.intf.v5.
+"""
+
+class Backend:
+    """ sdk core implementation """
+    name = None
+
+    # set by gs.intf when the backend is in use, called when resolved apis become stale
+    _invalidate = None
+
+    def resolve(self, name: str):
+        """ callable implementing the sdk api (name) """
+        raise NotImplementedError
+
+    def invalidate(self):
+        """ drop apis already resolved from this backend so that they are resolved again on next use """
+        if self._invalidate is not None:
+            self._invalidate()
+
+
+class NativeBackend(Backend):
+    """ native gscore library """
+    name = 'native'
+
+    def resolve(self, name: str):
+        from . import v5
+        return getattr(v5, name)
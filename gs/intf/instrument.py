@@ -0,0 +1,196 @@
+""" FFI call instrumentation
+
+When enabled (gs.intf.instrument.enable(), or environment variable GS_INSTRUMENT=1 before the first api call),
+every sdk api resolved from the backend is wrapped to record call counts, error counts and a log-bucketed
+latency histogram per api. Apis reporting failure (False / empty handle, except gsIs* predicates) are counted
+as errors by gsGetLastErrorCode().
+
+When disabled the raw apis are used, without any wrapper.
+
+Statistics are read by stats(), or rendered as OpenMetrics text by openmetrics() and served on a local port
+by serve():
+
+    gs.intf.instrument.enable()
+    gs.intf.instrument.serve(9464)   # curl http://127.0.0.1:9464/metrics
+"""
+
+from . import v5 as _v5
+from ..metrics import Histogram
+
+import os
+import threading
+import time
+from ctypes import c_bool
+
+
+# environment variable to enable instrumentation
+ENV_INSTRUMENT = "GS_INSTRUMENT"
+
+enabled = os.environ.get(ENV_INSTRUMENT, '') not in ('', '0')
+
+
+class _FnStats:
+    __slots__ = ('latency', 'errors', 'errorCodes', 'lock')
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.errors = 0
+        self.errorCodes = {} # error code => count
+        self.lock = threading.Lock()
+
+    def error(self, code):
+        with self.lock:
+            self.errors += 1
+            self.errorCodes[code] = self.errorCodes.get(code, 0) + 1
+
+_stats = {} # api name => _FnStats
+_lock = threading.Lock()
+
+def _statsOf(name: str)->_FnStats:
+    st = _stats.get(name)
+    if st is None:
+        with _lock:
+            st = _stats.setdefault(name, _FnStats())
+    return st
+
+def _failed(name: str):
+    """ test of result of api (name) reporting failure, None if results cannot tell """
+    restype = _v5._PROTOTYPES[name][1]
+    if name.startswith("gsIs"):
+        return None # predicate, False is a legit answer
+    if restype is c_bool:
+        return lambda r: not r
+    if restype is _v5.HANDLE:
+        return lambda r: r is None
+    return None
+
+def wrap(name: str, f, lastErrorCode):
+    """ wrap api (name) implemented by (f), (lastErrorCode) reads the last error code of the backend """
+    st = _statsOf(name)
+    failed = _failed(name)
+    latency = st.latency
+    perf_counter = time.perf_counter
+
+    def call(*args):
+        t = perf_counter()
+        try:
+            r = f(*args)
+        except Exception:
+            latency.observe(perf_counter() - t)
+            st.error(None)
+            raise
+        latency.observe(perf_counter() - t)
+        if failed is not None and failed(r):
+            st.error(lastErrorCode())
+        return r
+
+    call.__name__ = name
+    call.__wrapped__ = f
+    return call
+
+
+def enable():
+    """ instrument sdk apis, apis already resolved are wrapped on next use """
+    global enabled
+    from . import _clearResolved
+    enabled = True
+    _clearResolved()
+
+def disable():
+    """ go back to raw sdk apis, statistics are kept """
+    global enabled
+    from . import _clearResolved
+    enabled = False
+    _clearResolved()
+
+def reset():
+    """ clear statistics """
+    with _lock:
+        _stats.clear()
+
+def stats()->dict:
+    """ api name => { calls, errors, errorCodes, latency (histogram summary in seconds) }, most time spent first """
+    out = {}
+    for name, st in sorted(list(_stats.items()), key=lambda x: -x[1].latency.sum):
+        with st.lock:
+            errors, codes = st.errors, dict(st.errorCodes)
+        out[name] = {
+            'calls': st.latency.count,
+            'errors': errors,
+            'errorCodes': codes,
+            'latency': st.latency.to_dict(),
+        }
+    return out
+
+
+#------------------ OpenMetrics -------------------------
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+def _bound(v: float)->str:
+    return "+Inf" if v == float('inf') else repr(v)
+
+def openmetrics()->str:
+    """ statistics in OpenMetrics text format """
+    items = sorted(list(_stats.items()))
+    lines = [
+        "# TYPE gs_ffi_calls counter",
+        "# HELP gs_ffi_calls sdk api calls",
+    ]
+    for name, st in items:
+        lines.append(f'gs_ffi_calls_total{{function="{name}"}} {st.latency.count}')
+
+    lines += [
+        "# TYPE gs_ffi_errors counter",
+        "# HELP gs_ffi_errors sdk api calls reporting failure, by last error code",
+    ]
+    for name, st in items:
+        with st.lock:
+            codes = sorted(st.errorCodes.items(), key=lambda x: str(x[0]))
+        for code, n in codes:
+            lines.append(f'gs_ffi_errors_total{{function="{name}",code="{"exception" if code is None else code}"}} {n}')
+
+    lines += [
+        "# TYPE gs_ffi_call_seconds histogram",
+        "# UNIT gs_ffi_call_seconds seconds",
+        "# HELP gs_ffi_call_seconds sdk api latency",
+    ]
+    for name, st in items:
+        h = st.latency
+        for bound, n in h.buckets():
+            lines.append(f'gs_ffi_call_seconds_bucket{{function="{name}",le="{_bound(bound)}"}} {n}')
+        lines.append(f'gs_ffi_call_seconds_count{{function="{name}"}} {h.count}')
+        lines.append(f'gs_ffi_call_seconds_sum{{function="{name}"}} {h.sum!r}')
+
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+def _handler():
+    """ request handler class, http.server is only imported when serving """
+    from http.server import BaseHTTPRequestHandler
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = openmetrics().encode('utf-8')
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+def serve(port: int = 9464, host: str = '127.0.0.1'):
+    """
+    serve OpenMetrics text at http://host:port/metrics in background, returns the http.server.ThreadingHTTPServer,
+    call shutdown() on it to stop
+    """
+    from http.server import ThreadingHTTPServer
+    server = ThreadingHTTPServer((host, port), _handler())
+    threading.Thread(target=server.serve_forever, name="gs-metrics", daemon=True).start()
+    return server
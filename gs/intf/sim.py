@@ -0,0 +1,821 @@
+""" Simulated sdk core
+
+A pure-python backend modelling entities, the trial license models, variables, request codes and
+monitor events, so the python layer can be tested and benchmarked without the native gscore library.
+
+    from gs.intf.sim import SimCore, SimEntity, SimLicense
+    gs.intf.use(SimCore(latency=20e-6))
+
+Per-call latency (in seconds) can be set for all apis or per api name to replay realistic native costs.
+"""
+
+import ctypes
+import hashlib
+import itertools
+import threading
+import time
+from datetime import datetime
+
+from .backend import Backend
+
+# variable types (gs.var._VarType)
+UINT = 3
+INT = 7
+INT64 = 8
+FLOAT = 9
+DOUBLE = 10
+BOOL = 11
+STRING = 20
+TIME = 30
+
+_TYPE_NAMES = { UINT: "uint", INT: "int", INT64: "int64", FLOAT: "float", DOUBLE: "double", BOOL: "bool", STRING: "string", TIME: "time" }
+
+# variable attributes (gs.var._VarAttr)
+READ = 1
+WRITE = 2
+PERSISTENT = 4
+
+# license status (gs.lic.LicenseStatus)
+LOCKED = 0
+UNLOCKED = 1
+ACTIVE = 2
+
+# entity attributes (gs.entity.EntityAttribute)
+ACCESSIBLE = 1
+ENTITY_UNLOCKED = 2
+ACCESSING = 4
+ENTITY_LOCKED = 8
+AUTOSTART = 16
+
+# events (gs.monitor.Event)
+EVENT_LICENSE_READY = 102
+EVENT_LICENSE_FAIL = 103
+EVENT_LICENSE_LOADING = 105
+EVENT_ENTITY_ACCESS_STARTING = 201
+EVENT_ENTITY_ACCESS_STARTED = 202
+EVENT_ENTITY_ACCESS_ENDING = 203
+EVENT_ENTITY_ACCESS_ENDED = 204
+EVENT_ENTITY_ACCESS_INVALID = 205
+EVENT_ENTITY_ACCESS_HEARTBEAT = 206
+EVENT_ENTITY_ACTION_APPLIED = 208
+
+# actions (gs.act.ActionId)
+ACT_UNLOCK = 1
+ACT_LOCK = 2
+ACT_RESET_ALLEXPIRATION = 10
+ACT_CLEAN = 11
+
+# action id => (name, ((param, type), ...))
+_ACTIONS = {
+    1: ("Unlock", ()),
+    2: ("Lock", ()),
+    10: ("Reset All Expiration", ()),
+    11: ("Clean", (("endDate", TIME),)),
+    12: ("Dummy", ()),
+    19: ("Fix", ()),
+    100: ("Add Access Time", (("addedAccessTime", INT),)),
+    101: ("Set Access Time", (("newAccessTime", INT),)),
+    102: ("Set Start Date", (("startDate", TIME),)),
+    103: ("Set End Date", (("endDate", TIME),)),
+    104: ("Set Session Time", (("newSessionTime", INT),)),
+    105: ("Set Expire Period", (("newPeriodInSeconds", INT),)),
+    106: ("Add Expire Period", (("addedPeriodInSeconds", INT),)),
+    107: ("Set Expire Duration", (("duration", INT),)),
+    108: ("Add Expire Duration", (("addedDuration", INT),)),
+}
+
+# actions acceptable by all license models
+_GENERIC_ACTIONS = (ACT_UNLOCK, ACT_LOCK, ACT_RESET_ALLEXPIRATION)
+
+
+def _arg(x):
+    ''' unwrap ctypes argument to python value '''
+    if isinstance(x, ctypes._SimpleCData):
+        x = x.value
+    if isinstance(x, bytes):
+        x = x.decode('utf-8')
+    return x
+
+def _out(ref, v):
+    ''' write to an output parameter passed by ctypes.byref() / ctypes.pointer() '''
+    obj = getattr(ref, '_obj', None)
+    if obj is None:
+        obj = ref.contents
+    obj.value = v
+
+# handles are unique across simulated cores, so objects left over from another core never alias live handles
+_handleIds = itertools.count(0x1000)
+
+def _bstr(s):
+    return None if s is None else s.encode('utf-8')
+
+
+class SimVariable:
+    """ simulated variable """
+    def __init__(self, name: str, type: int, value=None, attr: int = READ | WRITE):
+        self.name = name
+        self.type = type
+        self.attr = attr
+        self.value = value # None: invalid value
+        self._sync = None  # refresh dynamic value before read
+
+    def read(self):
+        if self._sync is not None:
+            self._sync()
+        return self.value
+
+
+class SimLicense:
+    """ simulated license model, params are initialized from keyword arguments """
+
+    # license id => (name, ((param, type, default), ...), model specific actions)
+    MODELS = {
+        'gs.lm.expire.accessTime.1': ("Trial By Access Times", (("maxAccessTimes", INT, 10), ("usedTimes", INT, 0)), (100, 101)),
+        'gs.lm.expire.sessionTime.1': ("Trial By Session Time", (("maxSessionTime", INT, 3600), ("sessionTimeUsed", INT, 0)), (104,)),
+        'gs.lm.expire.duration.1': ("Trial By Duration", (("maxDurationInSeconds", INT, 3600), ("usedDurationInSeconds", INT, 0)), (107, 108)),
+        'gs.lm.expire.period.1': ("Trial By Period", (("periodInSeconds", INT, 30 * 86400), ("timeFirstAccess", TIME, None)), (105, 106)),
+        'gs.lm.expire.hardDate.1': ("Trial By Hard Date", (("timeBeginEnabled", BOOL, False), ("timeBegin", TIME, None),
+                                                           ("timeEndEnabled", BOOL, True), ("timeEnd", TIME, 4102444800)), (102, 103)),
+        'gs.lm.alwaysRun.1': ("Always Run", (), ()),
+        'gs.lm.alwaysLock.1': ("Always Lock", (), ()),
+    }
+
+    def __init__(self, licenseId: str = 'gs.lm.expire.period.1', status: int = ACTIVE, exitAppOnExpire: bool = False, **params):
+        name, defs, acts = SimLicense.MODELS[licenseId]
+        self.id = licenseId
+        self.name = name
+        self.description = name
+        self.actions = _GENERIC_ACTIONS + acts
+        self.entity = None
+
+        self.params = [ SimVariable("exitAppOnExpire", BOOL, exitAppOnExpire, READ) ] if defs else []
+        for pname, ptype, default in defs:
+            v = params.pop(pname, default)
+            if isinstance(v, datetime):
+                v = int((v - datetime(1970, 1, 1)).total_seconds())
+            self.params.append(SimVariable(pname, ptype, v, READ))
+        if params:
+            raise TypeError(f"unknown license parameters: {list(params)}")
+
+        self._initial = (status, [p.value for p in self.params])
+        self.status = LOCKED if licenseId == 'gs.lm.alwaysLock.1' else status
+        self._tAccess = None # start time of current access
+
+        for p in self.params:
+            if p.name in ("sessionTimeUsed", "usedDurationInSeconds"):
+                p._sync = self._syncCounters
+
+    def param(self, name: str)->SimVariable:
+        for p in self.params:
+            if p.name == name:
+                return p
+        raise KeyError(name)
+
+    def reset(self):
+        ''' back to original license status '''
+        status, values = self._initial
+        self.status = status
+        for p, v in zip(self.params, values):
+            p.value = v
+
+    def _now(self):
+        return self.entity.core.now()
+
+    def _syncCounters(self):
+        if self._tAccess is None:
+            return
+        now = self._now()
+        if self.id == 'gs.lm.expire.sessionTime.1':
+            self.param("sessionTimeUsed").value = now - self._tAccess
+        elif self.id == 'gs.lm.expire.duration.1':
+            p = self.param("usedDurationInSeconds")
+            p.value += now - self._tAccess
+            self._tAccess = now
+
+    def _expired(self, now)->bool:
+        ''' is the trial used up permanently? '''
+        if self.id == 'gs.lm.expire.accessTime.1':
+            # the last access is still valid until it ends
+            return self._tAccess is None and self.param("usedTimes").value >= self.param("maxAccessTimes").value
+        if self.id == 'gs.lm.expire.duration.1':
+            self._syncCounters()
+            return self.param("usedDurationInSeconds").value >= self.param("maxDurationInSeconds").value
+        if self.id == 'gs.lm.expire.period.1':
+            t0 = self.param("timeFirstAccess").value
+            return t0 is not None and now >= t0 + self.param("periodInSeconds").value
+        if self.id == 'gs.lm.expire.hardDate.1':
+            return self.param("timeEndEnabled").value and now >= self.param("timeEnd").value
+        return False
+
+    def evaluate(self)->int:
+        ''' current status, an expired trial is locked '''
+        if self.status == ACTIVE and self._expired(self._now()):
+            self.status = LOCKED
+        return self.status
+
+    def valid(self)->bool:
+        status = self.evaluate()
+        if status != ACTIVE:
+            return status == UNLOCKED
+
+        if self.id == 'gs.lm.expire.sessionTime.1':
+            # each session starts over
+            if self._tAccess is None:
+                return True
+            self._syncCounters()
+            return self.param("sessionTimeUsed").value < self.param("maxSessionTime").value
+        if self.id == 'gs.lm.expire.hardDate.1':
+            return not self.param("timeBeginEnabled").value or self._now() >= self.param("timeBegin").value
+        return True
+
+    def beginAccess(self):
+        now = self._now()
+        if self.id == 'gs.lm.expire.accessTime.1':
+            self.param("usedTimes").value += 1
+        elif self.id == 'gs.lm.expire.period.1':
+            p = self.param("timeFirstAccess")
+            if p.value is None:
+                p.value = now
+        elif self.id == 'gs.lm.expire.sessionTime.1':
+            self.param("sessionTimeUsed").value = 0
+        self._tAccess = now
+
+    def endAccess(self):
+        self._syncCounters()
+        self._tAccess = None
+
+    def apply(self, actId: int, params: dict):
+        ''' apply license action '''
+        if actId == ACT_UNLOCK:
+            self.status = UNLOCKED
+        elif actId == ACT_LOCK:
+            self.status = LOCKED
+        elif actId == ACT_RESET_ALLEXPIRATION:
+            self.reset()
+            self.status = ACTIVE
+        elif actId == ACT_CLEAN:
+            self.reset()
+        elif actId == 100:
+            self.param("maxAccessTimes").value += params["addedAccessTime"]
+        elif actId == 101:
+            self.param("maxAccessTimes").value = params["newAccessTime"]
+        elif actId == 102:
+            self.param("timeBeginEnabled").value = True
+            self.param("timeBegin").value = params["startDate"]
+        elif actId == 103:
+            self.param("timeEndEnabled").value = True
+            self.param("timeEnd").value = params["endDate"]
+        elif actId == 104:
+            self.param("maxSessionTime").value = params["newSessionTime"]
+        elif actId == 105:
+            self.param("periodInSeconds").value = params["newPeriodInSeconds"]
+        elif actId == 106:
+            self.param("periodInSeconds").value += params["addedPeriodInSeconds"]
+        elif actId == 107:
+            self.param("maxDurationInSeconds").value = params["duration"]
+        elif actId == 108:
+            self.param("maxDurationInSeconds").value += params["addedDuration"]
+
+        if actId >= 100 and self.status == LOCKED and not self._expired(self._now()):
+            # trial extended
+            self.status = ACTIVE
+
+
+class SimEntity:
+    """ simulated entity """
+    def __init__(self, id: str, name: str, description: str = '', license: SimLicense = None, autoStart: bool = False):
+        self.id = id
+        self.name = name
+        self.description = description
+        self.license = license or SimLicense()
+        self.license.entity = self
+        self.autoStart = autoStart
+        self.core = None
+        self.accessCount = 0
+
+    def attributes(self)->int:
+        status = self.license.evaluate()
+        attr = 0
+        if self.license.valid():
+            attr |= ACCESSIBLE
+        if status == UNLOCKED:
+            attr |= ENTITY_UNLOCKED
+        elif status == LOCKED:
+            attr |= ENTITY_LOCKED
+        if self.accessCount > 0:
+            attr |= ACCESSING
+        if self.autoStart:
+            attr |= AUTOSTART
+        return attr
+
+
+class _Action:
+    def __init__(self, actId: int, target: SimLicense):
+        self.id = actId
+        self.name, defs = _ACTIONS[actId]
+        self.target = target
+        self.params = [ SimVariable(n, t) for n, t in defs ]
+
+class _Request:
+    def __init__(self):
+        self.actions = []
+
+class _Event:
+    def __init__(self, source):
+        self.source = source
+
+
+def _demoProduct():
+    ''' the product defined in tests/data/Ne2_201908_b32.lic '''
+    return dict(
+        productId = "8fb82f54-ecf9-451c-9976-2344aefeaca4",
+        productName = "Ne2_201908",
+        buildId = 32,
+        entities = [ SimEntity("62a6ec4c-c05a-4fae-be40-2011a79f8c62", "E1", license=SimLicense('gs.lm.expire.period.1'), autoStart=True) ],
+        variables = [
+            SimVariable("age", INT, 10, READ | WRITE | PERSISTENT),
+            SimVariable("name", STRING, "randy", READ | WRITE | PERSISTENT),
+            SimVariable("male", BOOL, True, READ | WRITE | PERSISTENT),
+            SimVariable("salary", FLOAT, 123.5, READ | WRITE | PERSISTENT),
+            SimVariable("birthday", TIME, 1585778400, READ | WRITE | PERSISTENT),
+        ],
+        serials = ['0875-BB91-4449-9DCE', '0BD3-4F5C-4EB4-9EE9'],
+        licenseCodes = { 'TUVP-C9NM-PRRO-GH33-5KC3': ACT_UNLOCK },
+    )
+
+
+class SimCore(Backend):
+    """
+    Simulated sdk core
+
+    productId, productName, buildId, entities, variables: product definition (defaults to the test product)
+    serials: serial numbers accepted by the simulated license server (unlock all entities)
+    licenseCodes: license code => action id applied to all entities
+    latency: seconds each api call takes, either a number for all apis or a dict of api name => seconds
+    clock: epoch time source (defaults to time.time)
+    """
+    name = 'sim'
+
+    def __init__(self, productId: str = None, productName: str = None, buildId: int = None,
+                 entities: list = None, variables: list = None, serials: list = None, licenseCodes: dict = None,
+                 version: str = "5.3.8.5 (Simulated)", latency = 0, clock = time.time):
+        demo = _demoProduct()
+        self.productId = productId if productId is not None else demo['productId']
+        self.productName = productName if productName is not None else demo['productName']
+        self.buildId = buildId if buildId is not None else demo['buildId']
+        self.entities = entities if entities is not None else demo['entities']
+        self.variables = { v.name: v for v in (variables if variables is not None else demo['variables']) }
+        self.serials = set(serials if serials is not None else demo['serials'])
+        self.licenseCodes = dict(licenseCodes if licenseCodes is not None else demo['licenseCodes'])
+        self.version = version
+        self.clock = clock
+
+        self.serverAlive = True
+        self.inited = False
+        self.flushCount = 0
+        self.lastErrorCode = 0
+        self.lastErrorMessage = ""
+
+        for e in self.entities:
+            e.core = self
+
+        self._appliedSerials = set()
+        self._monitors = []
+        self._handles = {}
+        self._stable = {} # id(obj) => handle of entities / licenses
+        self._lock = threading.RLock()
+
+        self._latency = {}
+        self._defaultLatency = 0
+        self.setLatency(latency)
+
+    #----- Backend ------
+    def resolve(self, name: str):
+        f = getattr(self, name)
+        delay = self._latency.get(name, self._defaultLatency)
+        if delay <= 0:
+            return f
+
+        def timed(*args):
+            _delay(delay)
+            return f(*args)
+        return timed
+
+    def setLatency(self, latency, name: str = None):
+        '''
+        setup per-call latency in seconds
+
+        latency: a number for api (name) or all apis, or a dict of api name => seconds
+        '''
+        if isinstance(latency, dict):
+            self._latency.update(latency)
+        elif name is None:
+            self._defaultLatency = latency
+            self._latency.clear()
+        else:
+            self._latency[name] = latency
+        self.invalidate()
+
+    #----- simulation helpers -----
+    def now(self)->int:
+        return int(self.clock())
+
+    @property
+    def openHandles(self)->int:
+        ''' number of open handles (entity / license handles are permanent and not counted) '''
+        return len(self._handles) - len(self._stable)
+
+    def fire(self, eventId: int, source: SimEntity = None):
+        ''' broadcast an event to monitors '''
+        h = self._open(_Event(source))
+        try:
+            for cb, userData in list(self._monitors):
+                cb(eventId, h, userData)
+        finally:
+            self._handles.pop(h, None)
+
+    def pulse(self):
+        ''' heartbeat of all entities being accessed, expired entities are notified '''
+        for e in self.entities:
+            if e.accessCount > 0:
+                self.fire(EVENT_ENTITY_ACCESS_HEARTBEAT, e)
+                if not e.license.valid():
+                    self.fire(EVENT_ENTITY_ACCESS_INVALID, e)
+
+    def applyAction(self, actId: int, entities: list = None, **params):
+        ''' apply a license action to (entities) or all entities '''
+        for e in (entities or self.entities):
+            if actId in e.license.actions:
+                e.license.apply(actId, params)
+                self.fire(EVENT_ENTITY_ACTION_APPLIED, e)
+
+    #----- handles -----
+    def _open(self, obj)->int:
+        with self._lock:
+            h = next(_handleIds)
+            self._handles[h] = obj
+        return h
+
+    def _stableHandle(self, obj)->int:
+        with self._lock:
+            h = self._stable.get(id(obj))
+            if h is None:
+                h = self._stable[id(obj)] = self._open(obj)
+        return h
+
+    def _get(self, h, kind):
+        obj = self._handles.get(_arg(h))
+        if not isinstance(obj, kind):
+            raise ValueError(f"invalid {kind.__name__} handle ({h})")
+        return obj
+
+    def _error(self, code: int, msg: str):
+        self.lastErrorCode = code
+        self.lastErrorMessage = msg
+
+    def _ok(self):
+        self.lastErrorCode = 0
+        self.lastErrorMessage = ""
+
+    #----- sdk apis -----
+    def gsGetVersion(self):
+        return _bstr(self.version)
+
+    def gsInit(self, productId, pathToLic, password, reserved):
+        self.fire(EVENT_LICENSE_LOADING)
+        if _arg(productId) != self.productId:
+            self._error(-1, "product id mismatch")
+            self.fire(EVENT_LICENSE_FAIL)
+            return -1
+        self.inited = True
+        self._ok()
+        self.fire(EVENT_LICENSE_READY)
+        return 0
+
+    def gsInitEx(self, productId, origLic, licSize, password, reserved):
+        return self.gsInit(productId, None, password, reserved)
+
+    def gsCleanUp(self):
+        self.inited = False
+        self._monitors.clear()
+        return 0
+
+    def gsCloseHandle(self, h):
+        h = _arg(h)
+        with self._lock:
+            obj = self._handles.get(h)
+            if obj is not None and self._stable.get(id(obj)) != h:
+                del self._handles[h]
+
+    def gsFlush(self):
+        self.flushCount += 1
+
+    def gsGetLastErrorMessage(self):
+        return _bstr(self.lastErrorMessage)
+
+    def gsGetLastErrorCode(self):
+        return self.lastErrorCode
+
+    def gsGetBuildId(self):
+        return self.buildId
+
+    def gsGetProductName(self):
+        return _bstr(self.productName)
+
+    def gsGetProductId(self):
+        return _bstr(self.productId)
+
+    # Entity
+    def gsGetEntityCount(self):
+        return len(self.entities)
+
+    def gsOpenEntityByIndex(self, index):
+        index = _arg(index)
+        if 0 <= index < len(self.entities):
+            return self._stableHandle(self.entities[index])
+        return None
+
+    def gsOpenEntityById(self, entityId):
+        entityId = _arg(entityId)
+        for e in self.entities:
+            if e.id == entityId:
+                return self._stableHandle(e)
+        return None
+
+    def gsGetEntityAttributes(self, h):
+        return self._get(h, SimEntity).attributes()
+
+    def gsGetEntityId(self, h):
+        return _bstr(self._get(h, SimEntity).id)
+
+    def gsGetEntityName(self, h):
+        return _bstr(self._get(h, SimEntity).name)
+
+    def gsGetEntityDescription(self, h):
+        return _bstr(self._get(h, SimEntity).description)
+
+    def gsBeginAccessEntity(self, h):
+        e = self._get(h, SimEntity)
+        if e.accessCount == 0:
+            self.fire(EVENT_ENTITY_ACCESS_STARTING, e)
+            if not e.license.valid():
+                self.fire(EVENT_ENTITY_ACCESS_INVALID, e)
+                return False
+            e.license.beginAccess()
+            e.accessCount = 1
+            self.fire(EVENT_ENTITY_ACCESS_STARTED, e)
+        else:
+            e.accessCount += 1
+        return True
+
+    def gsEndAccessEntity(self, h):
+        e = self._get(h, SimEntity)
+        if e.accessCount == 0:
+            return False
+        if e.accessCount == 1:
+            self.fire(EVENT_ENTITY_ACCESS_ENDING, e)
+            e.license.endAccess()
+            e.accessCount = 0
+            self.fire(EVENT_ENTITY_ACCESS_ENDED, e)
+        else:
+            e.accessCount -= 1
+        return True
+
+    # License
+    def gsOpenLicense(self, hEntity):
+        return self._stableHandle(self._get(hEntity, SimEntity).license)
+
+    def gsGetLicenseId(self, h):
+        return _bstr(self._get(h, SimLicense).id)
+
+    def gsGetLicenseName(self, h):
+        return _bstr(self._get(h, SimLicense).name)
+
+    def gsGetLicenseDescription(self, h):
+        return _bstr(self._get(h, SimLicense).description)
+
+    def gsGetLicenseStatus(self, h):
+        return self._get(h, SimLicense).evaluate()
+
+    def gsIsLicenseValid(self, h):
+        return self._get(h, SimLicense).valid()
+
+    def gsLockLicense(self, h):
+        self._get(h, SimLicense).status = LOCKED
+
+    def gsGetLicenseParamCount(self, h):
+        return len(self._get(h, SimLicense).params)
+
+    def gsGetLicenseParamByIndex(self, h, index):
+        params = self._get(h, SimLicense).params
+        index = _arg(index)
+        return self._open(params[index]) if 0 <= index < len(params) else None
+
+    # Variable
+    def gsGetVariable(self, name):
+        v = self.variables.get(_arg(name))
+        return None if v is None else self._open(v)
+
+    def gsGetVariableName(self, h):
+        return _bstr(self._get(h, SimVariable).name)
+
+    def gsGetVariableType(self, h):
+        return self._get(h, SimVariable).type
+
+    def gsVariableTypeToString(self, typ):
+        return _bstr(_TYPE_NAMES.get(_arg(typ), "unknown"))
+
+    def gsGetVariableAttr(self, h):
+        return self._get(h, SimVariable).attr
+
+    def gsIsVariableValid(self, h):
+        return self._get(h, SimVariable).read() is not None
+
+    def _getValue(self, h, out, conv):
+        v = self._get(h, SimVariable).read()
+        if v is None:
+            return False
+        _out(out, conv(v))
+        return True
+
+    def _setValue(self, h, v):
+        x = self._get(h, SimVariable)
+        if x.attr & WRITE == 0:
+            return False
+        x.value = bool(v) if x.type == BOOL else v
+        return True
+
+    def gsGetVariableValueAsString(self, h):
+        v = self._get(h, SimVariable).read()
+        if isinstance(v, bool):
+            v = int(v)
+        return _bstr("" if v is None else str(v))
+
+    def gsSetVariableValueFromString(self, h, v):
+        x = self._get(h, SimVariable)
+        s = _arg(v)
+        try:
+            if x.type == STRING:
+                v = s
+            elif x.type in (FLOAT, DOUBLE):
+                v = float(s)
+            else:
+                v = int(s)
+        except ValueError:
+            return False
+        return self._setValue(h, v)
+
+    def gsGetVariableValueAsInt(self, h, out):
+        return self._getValue(h, out, int)
+
+    def gsSetVariableValueFromInt(self, h, v):
+        return self._setValue(h, _arg(v))
+
+    def gsGetVariableValueAsInt64(self, h, out):
+        return self._getValue(h, out, int)
+
+    def gsSetVariableValueFromInt64(self, h, v):
+        return self._setValue(h, _arg(v))
+
+    def gsGetVariableValueAsFloat(self, h, out):
+        return self._getValue(h, out, float)
+
+    def gsSetVariableValueFromFloat(self, h, v):
+        # keep float32 precision like a native float variable
+        return self._setValue(h, ctypes.c_float(_arg(v)).value)
+
+    def gsGetVariableValueAsDouble(self, h, out):
+        return self._getValue(h, out, float)
+
+    def gsSetVariableValueFromDouble(self, h, v):
+        return self._setValue(h, float(_arg(v)))
+
+    def gsGetVariableValueAsTime(self, h, out):
+        return self._getValue(h, out, int)
+
+    def gsSetVariableValueFromTime(self, h, v):
+        return self._setValue(h, int(_arg(v)))
+
+    # Request
+    def gsCreateRequest(self):
+        return self._open(_Request())
+
+    def gsAddRequestAction(self, hReq, actId, hLic):
+        req = self._get(hReq, _Request)
+        actId = _arg(actId)
+        if actId not in _ACTIONS:
+            return None
+        target = None
+        if _arg(hLic):
+            target = self._get(hLic, SimLicense)
+            if actId not in target.actions:
+                return None
+        act = _Action(actId, target)
+        req.actions.append(act)
+        return self._open(act)
+
+    def gsGetRequestCode(self, hReq):
+        req = self._get(hReq, _Request)
+        digest = hashlib.sha1(self.productId.encode('utf-8'))
+        for act in req.actions:
+            target = '*' if act.target is None else act.target.entity.id
+            values = ','.join(str(p.value) for p in act.params)
+            digest.update(f"{act.id}:{target}:{values};".encode('utf-8'))
+        code = digest.hexdigest().upper()[:20]
+        return _bstr('-'.join(code[i:i + 4] for i in range(0, 20, 4)))
+
+    # action
+    def gsGetActionInfoCount(self, hLic):
+        return len(self._get(hLic, SimLicense).actions)
+
+    def gsGetActionInfoByIndex(self, hLic, index, out):
+        actions = self._get(hLic, SimLicense).actions
+        index = _arg(index)
+        if not 0 <= index < len(actions):
+            return None
+        _out(out, actions[index])
+        return _bstr(_ACTIONS[actions[index]][0])
+
+    def gsGetActionName(self, h):
+        return _bstr(self._get(h, _Action).name)
+
+    def gsGetActionDescription(self, h):
+        return _bstr(self._get(h, _Action).name)
+
+    def gsGetActionString(self, h):
+        act = self._get(h, _Action)
+        return _bstr(f"{act.id}:{act.name}")
+
+    def gsGetActionParamCount(self, h):
+        return len(self._get(h, _Action).params)
+
+    def gsGetActionParamByIndex(self, h, index):
+        params = self._get(h, _Action).params
+        index = _arg(index)
+        return self._open(params[index]) if 0 <= index < len(params) else None
+
+    # online activation
+    def gsIsServerAlive(self, timeout):
+        return self.serverAlive
+
+    def gsApplySN(self, serial, rc, msg, timeout):
+        serial = _arg(serial)
+        if not self.serverAlive:
+            self._error(-2, "license server not available")
+        elif serial not in self.serials:
+            self._error(-3, "invalid serial number")
+        else:
+            self._ok()
+            self._appliedSerials.add(serial)
+            self.applyAction(ACT_UNLOCK)
+        if rc is not None:
+            _out(rc, self.lastErrorCode)
+        return self.lastErrorCode == 0
+
+    def gsIsSNValid(self, serial, timeout):
+        return self.serverAlive and _arg(serial) in self.serials
+
+    def gsRevokeApp(self, timeout, reserved):
+        if not self.serverAlive or not self._appliedSerials:
+            return False
+        self._appliedSerials.clear()
+        self.applyAction(ACT_LOCK)
+        return True
+
+    def gsRevokeSN(self, timeout, serial):
+        serial = _arg(serial)
+        if not self.serverAlive or serial not in self._appliedSerials:
+            return False
+        self._appliedSerials.discard(serial)
+        self.applyAction(ACT_LOCK)
+        return True
+
+    # offline activation
+    def gsApplyLicenseCodeEx(self, code, serial, reserved):
+        actId = self.licenseCodes.get(_arg(code))
+        if actId is None:
+            self._error(-4, "invalid license code")
+            return False
+        self._ok()
+        self.applyAction(actId)
+        return True
+
+    # monitor
+    def gsCreateMonitorEx(self, cb, userData, name):
+        self._monitors.append((cb, userData))
+        return self._open(self._monitors[-1])
+
+    def gsGetEventSource(self, hEvent):
+        ev = self._get(hEvent, _Event)
+        return None if ev.source is None else self._stableHandle(ev.source)
+
+
+def _delay(seconds: float):
+    ''' simulate the latency of a native call '''
+    if seconds >= 1e-3:
+        time.sleep(seconds)
+        return
+    # busy-wait for sub-millisecond latency, sleep() is not precise enough
+    t = time.perf_counter() + seconds
+    while time.perf_counter() < t:
+        pass
@@ -1,164 +1,206 @@
-""" Interface to SDK v5 """
+""" Interface to SDK v5
 
-import ctypes
+The core library is loaded lazily on the first real SDK call, and each prototype
+is bound on first use from the ordinal table below, so importing the package costs
+nothing until the SDK is actually used.
 
-from ctypes import cdll, windll, WINFUNCTYPE
-from ctypes.wintypes import LPCSTR, HANDLE, HMODULE, LPVOID, INT, DWORD, UINT, BOOL, BYTE
-from ctypes import c_bool, POINTER 
+The library path comes from setCorePath() or the GS_CORE_PATH environment variable;
+if neither is given the platform loader resolves the library by name.
+"""
 
-import os
+import ctypes
 
+from ctypes.wintypes import LPCSTR, HANDLE, LPVOID, INT, DWORD, BYTE
+from ctypes import c_bool, POINTER
 
-def _tryLoadCore():
+import os
+import logging
+import threading
+
+if os.name == 'nt':
+    from ctypes import windll, WINFUNCTYPE as FUNCTYPE
+    CORE_LIB_NAME = "gscore.dll"
+else:
+    from ctypes import cdll, CFUNCTYPE as FUNCTYPE
+    CORE_LIB_NAME = "libgscore.so"
+
+# environment variable to specify the core library (file or directory)
+ENV_CORE_PATH = "GS_CORE_PATH"
+
+_corePath = None  # explicit core path set by setCorePath()
+_hCore = None     # loaded core library
+_lock = threading.Lock()
+
+
+def setCorePath(path: str):
+    ''' specify the core library (file or directory) to load, must be called before the first SDK call '''
+    global _corePath
+    if _hCore is not None:
+        logging.warning(f"core lib already loaded, path ({path}) ignored")
+        return
+    _corePath = path
+
+def isCoreLoaded()->bool:
+    ''' is the core library loaded into process? '''
+    return _hCore is not None
+
+def _resolveCorePath():
+    ''' path to core lib, or None to let the platform loader search by name '''
+    path = _corePath or os.environ.get(ENV_CORE_PATH)
+    if path and os.path.isdir(path):
+        path = os.path.join(path, CORE_LIB_NAME)
+    return path
+
+def _loadCore():
     ''' Load gsCore lib to process '''
-    # load core lib from current working directory
-    core_path = os.path.join(os.getcwd(), "gscore")
-    print(f"try loading core lib({core_path})...")
-
-    hCore = None
+    path = _resolveCorePath()
+    logging.debug(f"loading core lib ({path or CORE_LIB_NAME})...")
 
     try:
         if os.name == 'nt':
-            hCore = windll.LoadLibrary(core_path)
-        else:
-            hCore = cdll.LoadLibrary(core_path)
-    except:
-        # load core lib from PATH
-        if os.name == 'nt':
-            print("\ntry loading core from PATH...")
-
+            if path:
+                return windll.LoadLibrary(path)
             try:
-                handle = windll.kernel32.LoadLibraryW("gscore")
-                print(f"Handle={hex(handle)}")
+                return windll.LoadLibrary(CORE_LIB_NAME)
+            except OSError:
+                # load core lib from PATH
+                handle = windll.kernel32.LoadLibraryW(CORE_LIB_NAME)
                 if handle:
-                    hCore = ctypes.WinDLL("gscore", handle=handle)
-            except Exception as ex:
-                print(ex)
-
-    return hCore
-
-
-_hCore = _tryLoadCore()
+                    return ctypes.WinDLL(CORE_LIB_NAME, handle=handle)
+                raise
+        return cdll.LoadLibrary(path or CORE_LIB_NAME)
+    except OSError as ex:
+        raise RuntimeError(f"Core lib cannot be loaded! ({ex})") from ex
 
-if _hCore is None:
-    raise RuntimeError("Core lib cannot be loaded!")
+def _core():
+    global _hCore
+    if _hCore is None:
+        with _lock:
+            if _hCore is None:
+                _hCore = _loadCore()
+    return _hCore
 
 
 """""""""""""""""""""""
  Prototypes
 """""""""""""""""""""""
-gsGetVersion = WINFUNCTYPE(LPCSTR)((2, _hCore))
-
-gsInit = WINFUNCTYPE(INT, LPCSTR, LPCSTR, LPCSTR, LPVOID)((3, _hCore))
-gsInitEx = WINFUNCTYPE(INT, LPCSTR, LPVOID, INT, LPCSTR, LPVOID)((103, _hCore))
-
-gsCleanUp = WINFUNCTYPE(INT)((4, _hCore))
-gsCloseHandle = WINFUNCTYPE(None, HANDLE)((5, _hCore))
-
-gsFlush = WINFUNCTYPE(None)((6, _hCore))
-
-gsGetLastErrorMessage = WINFUNCTYPE(LPCSTR)((7, _hCore))
-gsGetLastErrorCode = WINFUNCTYPE(INT)((8, _hCore))
-
-gsGetBuildId = WINFUNCTYPE(INT)((9, _hCore))
-gsGetProductName = WINFUNCTYPE(LPCSTR)((84, _hCore))
-gsGetProductId = WINFUNCTYPE(LPCSTR)((85, _hCore))
-
-# Entity
-gsGetEntityCount = WINFUNCTYPE(INT)((10, _hCore))
-
-gsOpenEntityByIndex = WINFUNCTYPE(HANDLE, INT)((11, _hCore))
-gsOpenEntityById = WINFUNCTYPE(HANDLE, LPCSTR)((12, _hCore))
-
-gsGetEntityAttributes = WINFUNCTYPE(DWORD, HANDLE)((13, _hCore))
-gsGetEntityId = WINFUNCTYPE(LPCSTR, HANDLE)((14, _hCore))
-gsGetEntityName = WINFUNCTYPE(LPCSTR, HANDLE)((15, _hCore))
-gsGetEntityDescription = WINFUNCTYPE(LPCSTR, HANDLE)((16, _hCore))
-
-gsBeginAccessEntity = WINFUNCTYPE(c_bool, HANDLE)((20, _hCore))
-gsEndAccessEntity = WINFUNCTYPE(c_bool, HANDLE)((21, _hCore))
-
-# License
-gsOpenLicense = WINFUNCTYPE(HANDLE, HANDLE)((137, _hCore))
-gsGetLicenseId = WINFUNCTYPE(LPCSTR, HANDLE)((28, _hCore))
-gsGetLicenseName = WINFUNCTYPE(LPCSTR, HANDLE)((22, _hCore))
-gsGetLicenseDescription = WINFUNCTYPE(LPCSTR, HANDLE)((23, _hCore))
-gsGetLicenseStatus = WINFUNCTYPE(DWORD, HANDLE)((24, _hCore))
-gsIsLicenseValid = WINFUNCTYPE(c_bool, HANDLE)((34, _hCore))
-
-gsLockLicense = WINFUNCTYPE(None, HANDLE)((138, _hCore))
-
-gsGetLicenseParamCount = WINFUNCTYPE(INT, HANDLE)((29, _hCore))
-gsGetLicenseParamByIndex = WINFUNCTYPE(HANDLE, HANDLE, INT)((30, _hCore))
-# Variable
-gsGetVariable = WINFUNCTYPE(HANDLE, LPCSTR)((52, _hCore))
-gsGetVariableName = WINFUNCTYPE(LPCSTR, HANDLE)((53, _hCore))
-gsGetVariableType = WINFUNCTYPE(BYTE, HANDLE)((54, _hCore))
-gsVariableTypeToString = WINFUNCTYPE(LPCSTR, BYTE)((55, _hCore))
-gsGetVariableAttr = WINFUNCTYPE(INT, HANDLE)((56, _hCore))
-gsIsVariableValid = WINFUNCTYPE(c_bool, HANDLE)((67, _hCore))
-
-gsGetVariableValueAsString = WINFUNCTYPE(LPCSTR, HANDLE)((57, _hCore))
-gsSetVariableValueFromString = WINFUNCTYPE(
-    c_bool, HANDLE, LPCSTR)((58, _hCore))
-
-gsGetVariableValueAsInt = WINFUNCTYPE(
-    c_bool, HANDLE, POINTER(ctypes.c_int))((59, _hCore))
-gsSetVariableValueFromInt = WINFUNCTYPE(
-    c_bool, HANDLE, ctypes.c_int)((60, _hCore))
-
-gsGetVariableValueAsInt64 = WINFUNCTYPE(
-    c_bool, HANDLE, POINTER(ctypes.c_int64))((61, _hCore))
-gsSetVariableValueFromInt64 = WINFUNCTYPE(
-    c_bool, HANDLE, ctypes.c_int64)((62, _hCore))
-
-gsGetVariableValueAsFloat = WINFUNCTYPE(
-    c_bool, HANDLE, POINTER(ctypes.c_float))((63, _hCore))
-gsSetVariableValueFromFloat = WINFUNCTYPE(
-    c_bool, HANDLE, ctypes.c_float)((64, _hCore))
-
-gsGetVariableValueAsDouble = WINFUNCTYPE(
-    c_bool, HANDLE, POINTER(ctypes.c_double))((78, _hCore))
-gsSetVariableValueFromDouble = WINFUNCTYPE(
-    c_bool, HANDLE, ctypes.c_double)((79, _hCore))
-
-gsGetVariableValueAsTime = WINFUNCTYPE(
-    c_bool, HANDLE, POINTER(ctypes.c_uint64))((68, _hCore))
-gsSetVariableValueFromTime = WINFUNCTYPE(
-    c_bool, HANDLE, ctypes.c_uint64)((69, _hCore))
-
-# Request
-gsCreateRequest = WINFUNCTYPE(HANDLE)((36, _hCore))
-gsAddRequestAction = WINFUNCTYPE(HANDLE, HANDLE, BYTE, HANDLE)((37, _hCore))
-gsGetRequestCode = WINFUNCTYPE(LPCSTR, HANDLE)((45, _hCore))
-
-# action
-gsGetActionInfoCount = WINFUNCTYPE(INT, HANDLE)((32, _hCore))
-gsGetActionInfoByIndex = WINFUNCTYPE(
-    LPCSTR, HANDLE, INT, POINTER(ctypes.c_byte))((33, _hCore))
-
-gsGetActionName = WINFUNCTYPE(LPCSTR, HANDLE)((38, _hCore))
-gsGetActionDescription = WINFUNCTYPE(LPCSTR, HANDLE)((40, _hCore))
-gsGetActionString = WINFUNCTYPE(LPCSTR, HANDLE)((41, _hCore))
-
-gsGetActionParamCount = WINFUNCTYPE(INT, HANDLE)((42, _hCore))
-gsGetActionParamByIndex = WINFUNCTYPE(HANDLE, HANDLE, INT)((44, _hCore))
-
-# online activation
-gsIsServerAlive = WINFUNCTYPE(c_bool, INT)((131, _hCore))
-gsApplySN = WINFUNCTYPE(c_bool, LPCSTR, POINTER(
-    ctypes.c_int), POINTER(ctypes.c_char_p), INT)((133, _hCore))
-gsIsSNValid = WINFUNCTYPE(c_bool, LPCSTR, INT)((139, _hCore))
-
-gsRevokeApp = WINFUNCTYPE(c_bool, INT, LPCSTR)((135, _hCore))
-gsRevokeSN = WINFUNCTYPE(c_bool, INT, LPCSTR)((144, _hCore))
-
-# offline activation
-gsApplyLicenseCodeEx = WINFUNCTYPE(
-    c_bool, LPCSTR, LPCSTR, LPCSTR)((158, _hCore))
-
-# callbacks
-gs5_monitor_callback = WINFUNCTYPE(None, INT, HANDLE, LPVOID)
-gsCreateMonitorEx = WINFUNCTYPE(HANDLE, LPVOID, LPVOID, LPCSTR)((90, _hCore))
-gsGetEventSource = WINFUNCTYPE(HANDLE, HANDLE)((88, _hCore))
+# name => (ordinal, restype, *argtypes)
+_PROTOTYPES = {
+    "gsGetVersion": (2, LPCSTR),
+
+    "gsInit": (3, INT, LPCSTR, LPCSTR, LPCSTR, LPVOID),
+    "gsInitEx": (103, INT, LPCSTR, LPVOID, INT, LPCSTR, LPVOID),
+
+    "gsCleanUp": (4, INT),
+    "gsCloseHandle": (5, None, HANDLE),
+
+    "gsFlush": (6, None),
+
+    "gsGetLastErrorMessage": (7, LPCSTR),
+    "gsGetLastErrorCode": (8, INT),
+
+    "gsGetBuildId": (9, INT),
+    "gsGetProductName": (84, LPCSTR),
+    "gsGetProductId": (85, LPCSTR),
+
+    # Entity
+    "gsGetEntityCount": (10, INT),
+
+    "gsOpenEntityByIndex": (11, HANDLE, INT),
+    "gsOpenEntityById": (12, HANDLE, LPCSTR),
+
+    "gsGetEntityAttributes": (13, DWORD, HANDLE),
+    "gsGetEntityId": (14, LPCSTR, HANDLE),
+    "gsGetEntityName": (15, LPCSTR, HANDLE),
+    "gsGetEntityDescription": (16, LPCSTR, HANDLE),
+
+    "gsBeginAccessEntity": (20, c_bool, HANDLE),
+    "gsEndAccessEntity": (21, c_bool, HANDLE),
+
+    # License
+    "gsOpenLicense": (137, HANDLE, HANDLE),
+    "gsGetLicenseId": (28, LPCSTR, HANDLE),
+    "gsGetLicenseName": (22, LPCSTR, HANDLE),
+    "gsGetLicenseDescription": (23, LPCSTR, HANDLE),
+    "gsGetLicenseStatus": (24, DWORD, HANDLE),
+    "gsIsLicenseValid": (34, c_bool, HANDLE),
+
+    "gsLockLicense": (138, None, HANDLE),
+
+    "gsGetLicenseParamCount": (29, INT, HANDLE),
+    "gsGetLicenseParamByIndex": (30, HANDLE, HANDLE, INT),
+
+    # Variable
+    "gsGetVariable": (52, HANDLE, LPCSTR),
+    "gsGetVariableName": (53, LPCSTR, HANDLE),
+    "gsGetVariableType": (54, BYTE, HANDLE),
+    "gsVariableTypeToString": (55, LPCSTR, BYTE),
+    "gsGetVariableAttr": (56, INT, HANDLE),
+    "gsIsVariableValid": (67, c_bool, HANDLE),
+
+    "gsGetVariableValueAsString": (57, LPCSTR, HANDLE),
+    "gsSetVariableValueFromString": (58, c_bool, HANDLE, LPCSTR),
+
+    "gsGetVariableValueAsInt": (59, c_bool, HANDLE, POINTER(ctypes.c_int)),
+    "gsSetVariableValueFromInt": (60, c_bool, HANDLE, ctypes.c_int),
+
+    "gsGetVariableValueAsInt64": (61, c_bool, HANDLE, POINTER(ctypes.c_int64)),
+    "gsSetVariableValueFromInt64": (62, c_bool, HANDLE, ctypes.c_int64),
+
+    "gsGetVariableValueAsFloat": (63, c_bool, HANDLE, POINTER(ctypes.c_float)),
+    "gsSetVariableValueFromFloat": (64, c_bool, HANDLE, ctypes.c_float),
+
+    "gsGetVariableValueAsDouble": (78, c_bool, HANDLE, POINTER(ctypes.c_double)),
+    "gsSetVariableValueFromDouble": (79, c_bool, HANDLE, ctypes.c_double),
+
+    "gsGetVariableValueAsTime": (68, c_bool, HANDLE, POINTER(ctypes.c_uint64)),
+    "gsSetVariableValueFromTime": (69, c_bool, HANDLE, ctypes.c_uint64),
+
+    # Request
+    "gsCreateRequest": (36, HANDLE),
+    "gsAddRequestAction": (37, HANDLE, HANDLE, BYTE, HANDLE),
+    "gsGetRequestCode": (45, LPCSTR, HANDLE),
+
+    # action
+    "gsGetActionInfoCount": (32, INT, HANDLE),
+    "gsGetActionInfoByIndex": (33, LPCSTR, HANDLE, INT, POINTER(ctypes.c_byte)),
+
+    "gsGetActionName": (38, LPCSTR, HANDLE),
+    "gsGetActionDescription": (40, LPCSTR, HANDLE),
+    "gsGetActionString": (41, LPCSTR, HANDLE),
+
+    "gsGetActionParamCount": (42, INT, HANDLE),
+    "gsGetActionParamByIndex": (44, HANDLE, HANDLE, INT),
+
+    # online activation
+    "gsIsServerAlive": (131, c_bool, INT),
+    "gsApplySN": (133, c_bool, LPCSTR, POINTER(ctypes.c_int), POINTER(ctypes.c_char_p), INT),
+    "gsIsSNValid": (139, c_bool, LPCSTR, INT),
+
+    "gsRevokeApp": (135, c_bool, INT, LPCSTR),
+    "gsRevokeSN": (144, c_bool, INT, LPCSTR),
+
+    # offline activation
+    "gsApplyLicenseCodeEx": (158, c_bool, LPCSTR, LPCSTR, LPCSTR),
+
+    # monitor
+    "gsCreateMonitorEx": (90, HANDLE, LPVOID, LPVOID, LPCSTR),
+    "gsGetEventSource": (88, HANDLE, HANDLE),
+}
+
+# callbacks (prototype only, no need to load core lib)
+gs5_monitor_callback = FUNCTYPE(None, INT, HANDLE, LPVOID)
+
+
+def _bind(name):
+    ''' bind a prototype to core lib (by ordinal on Windows, by symbol name elsewhere) '''
+    ordinal, restype, *argtypes = _PROTOTYPES[name]
+    entry = ordinal if os.name == 'nt' else name
+    return FUNCTYPE(restype, *argtypes)((entry, _core()))
 
+def __getattr__(name):
+    ''' bind prototype on first use and cache it as module attribute '''
+    if name not in _PROTOTYPES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    f = globals()[name] = _bind(name)
+    return f
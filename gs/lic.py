@@ -1,13 +1,18 @@
 """ License and License Model """
 
 from . import intf as _intf
-from .util import SdkError, pchar2str, str2pchar, HObject, once
-from .var import Variable
+from . import cache as _cache
+from . import trace as _trace
+from .util import SdkError, pchar2str, str2pchar, HObject, cached_property
+from .var import Params, _VarType
 from .act import ActionId
 
 from enum import IntEnum, Enum
 from datetime import timedelta, datetime
 import ctypes
+import weakref
+from contextlib import contextmanager
+import time
 
 
 class LicenseId(Enum):
@@ -45,8 +50,10 @@ class inspect:
 
 
 class License(HObject):
+    @_trace.traced("License.init", lambda self, entity: { 'entity': entity.id })
     def __init__(self, entity):
-        self._entity = entity
+        # the entity owns its license, a weak back reference keeps them out of a reference cycle
+        self._entity = weakref.ref(entity)
 
         h = _intf.gsOpenLicense(entity.handle)
         if not h:
@@ -64,37 +71,58 @@ class License(HObject):
             if p:
                 self._act_ids.append(act_id.value)
 
-    @property
-    @once
+        s = _trace.current()
+        if s is not None:
+            s.set(license=pchar2str(_intf.gsGetLicenseId(h)), actions=len(self._act_ids))
+
+    @cached_property
     def name(self):
         return pchar2str(_intf.gsGetLicenseName(self._handle))
 
-    @property
-    @once
+    @cached_property
     def id(self):
 
         return LicenseId(pchar2str(_intf.gsGetLicenseId(self._handle)))
-    @property
-    @once
+    @cached_property
     def description(self):
         return pchar2str(_intf.gsGetLicenseDescription(self._handle))
         
     @property
     def entity(self):
-        ''' the entity to protect '''
-        return self._entity
-
-    @property
-    @once
-    def params(self):
-        return { x.name: x for x in [Variable(_intf.gsGetLicenseParamByIndex(self._handle, i)) for i in range(_intf.gsGetLicenseParamCount(self._handle))] }
+        ''' the entity to protect, None once the entity is gone '''
+        return self._entity()
+
+    @cached_property
+    def params(self)->Params:
+        """ license parameters by name, each Variable is opened on access """
+        return Params(self._handle, _intf.gsGetLicenseParamCount, _intf.gsGetLicenseParamByIndex)
+
+    @contextmanager
+    def params_scope(self):
+        """ license parameters opened at once, closed on exit of with block """
+        params = dict(self.params)
+        try:
+            yield params
+        finally:
+            for v in params.values():
+                v.close()
     
     @property
     def valid(self):
+        if _cache.state.enabled:
+            return _cache.get(self, '_cachedValid', self._readValid)
+        return _intf.gsIsLicenseValid(self._handle)
+
+    def _readValid(self):
         return _intf.gsIsLicenseValid(self._handle)
 
     @property
     def status(self):
+        if _cache.state.enabled:
+            return _cache.get(self, '_cachedStatus', self._readStatus)
+        return LicenseStatus(_intf.gsGetLicenseStatus(self._handle))
+
+    def _readStatus(self):
         return LicenseStatus(_intf.gsGetLicenseStatus(self._handle))
     # status helper
     @property
@@ -110,9 +138,9 @@ class License(HObject):
     def lock(self):
         ''' lock the license '''
         _intf.gsLockLicense(self._handle)
+        _cache.invalidate()
 
-    @property
-    @once
+    @cached_property
     def inspector(self):
         # license inspector for more details 
         return _Inspectors[self.id](self)
@@ -123,17 +151,84 @@ class License(HObject):
 
     @property
     def unlockRequestCode(self)->str:
-        """ the request code to unlock this license only """
+        """ the request code to unlock this license only, the entity must still be alive """
         from .core import Core
-        req = Core().createRequest()
-        req.addAction(ActionId.ACT_UNLOCK, self.entity)
-        return req.code
+        entity = self.entity
+        if entity is None:
+            # a None target would unlock all entities
+            raise SdkError("license detached from its entity, cannot request unlocking it")
+        with Core().request() as req:
+            req.addAction(ActionId.ACT_UNLOCK, entity).close()
+            return req.code
 
     
 # License Model Inspectors
+
+# utc time base, time-derived inspector values are computed from the monotonic clock instead of querying
+# the wall clock on each access. the base is re-sampled periodically to follow wall clock adjustments.
+_CLOCK_RESYNC = 60
+_clockBase = (time.time(), time.monotonic())
+
+def _utcnow()->float:
+    """ current utc time in epoch seconds """
+    global _clockBase
+    t0, m0 = _clockBase
+    m = time.monotonic()
+    if m - m0 >= _CLOCK_RESYNC:
+        _clockBase = t0, m0 = time.time(), m
+    return t0 + (m - m0)
+
+def _utcdate(t: int)->datetime:
+    return datetime.utcfromtimestamp(t)
+
+
+def inspectorOf(licId: LicenseId, values: dict)->'Inspector':
+    """ inspector of license model (licId) working on parameter (values) (name => value, TIME in epoch seconds) """
+    return _Inspectors[licId](None, values)
+
+
 class Inspector:
-    def __init__(self, lic: License):
+    """
+    License model inspector
+
+    Static license parameters are read from sdk core once and kept until license actions
+    are applied or the core is re-initialized; mutable counters are read on demand.
+
+    With (values) given (parameter name => value, TIME values in epoch seconds), values are
+    derived from these parameters instead of a live license, see inspectorOf().
+    """
+    def __init__(self, lic: License, values: dict = None):
         self._lic = lic
+        self._values = values
+        self._static = {}
+        self._epoch = _cache.state.epoch
+
+    def _param(self, name: str):
+        """ value of static parameter (name), TIME parameters in epoch seconds """
+        if self._values is not None:
+            return self._values[name]
+        if self._epoch != _cache.state.epoch:
+            self.refresh()
+        try:
+            return self._static[name]
+        except KeyError:
+            pass
+
+        var = self._lic.params[name]
+        v = var.value_epoch if var._type == _VarType.TIME else var.value
+        self._static[name] = v
+        return v
+
+    def _counter(self, name: str):
+        """ current value of mutable parameter (name) """
+        if self._values is not None:
+            return self._values[name]
+        return self._lic.params[name].value
+
+    def refresh(self):
+        """ drop cached parameters, they are read from sdk core again on next access """
+        self._static.clear()
+        self._epoch = _cache.state.epoch
 
 
 @inspect(LicenseId.ALWAYS_LOCK)
@@ -147,7 +242,7 @@ class TrialInspector(Inspector):
     @property
     def exitAppOnExpired(self)->bool:
         """ app will be terminated once license becomes expired by sdk core """
-        return self._lic.params['exitAppOnExpire'].value
+        return self._param('exitAppOnExpire')
 
 
 @inspect(LicenseId.TRIAL_ACCESS)
@@ -155,12 +250,12 @@ class LM_Access(TrialInspector):
     @property
     def maxTimes(self)->int:
         """ total times allowed to access the entity """
-        return self._lic.params['maxAccessTimes'].value
+        return self._param('maxAccessTimes')
 
     @property
     def timesUsed(self)->int:
         """ how many times consumed accessing the entity """
-        return self._lic.params['usedTimes'].value
+        return self._counter('usedTimes')
 
     @property
     def timesLeft(self)->int:
@@ -169,69 +264,76 @@ class LM_Access(TrialInspector):
 
 @inspect(LicenseId.TRIAL_DURATION)
 class LM_Duration(TrialInspector):
-    def __init__(self, lic: License):
-        self._lic = lic
-
     @property
     def duration(self)->int:
         """ how many seconds allowed to access the entity """
-        return self._lic.params['maxDurationInSeconds'].value
+        return self._param('maxDurationInSeconds')
 
     @property
     def secondsPassed(self)->int:
         """ how many seconds accumulated since entity is accessed """
-        return self._lic.params['usedDurationInSeconds'].value
+        return self._counter('usedDurationInSeconds')
 
     @property
     def secondsLeft(self)->int:
         """ how many seconds left to access the entity """
-        return 0 if self.secondsPassed >= self.duration else self.duration - self.secondsLeft
+        return max(0, self.duration - self.secondsPassed)
 
 
 @inspect(LicenseId.TRIAL_HARDDATE)
 class LM_HardDate(TrialInspector):
-
     class Scenario(Enum):
         VaidBetween = 1 # valid between (tBegin, tEnd)
         ExpireAfter = 2 # valid until tEnd, tBegin undefined
         ValidSince  = 3 # valid since tBegin, tEnd undefined
 
 
-    def __init__(self, lic: License):
-        self._lic = lic
-        
+    def __init__(self, lic: License, values: dict = None):
+        super().__init__(lic, values)
+        self._scenario = self._readScenario()
+
+    def _readScenario(self):
         # three valid scenarios (ref: http://doc.softwareshield.com/UG/license_action.html#expire_by_harddate)
-        if lic.params['timeBeginEnabled'].value:
-            if lic.params['timeEndEnabled'].value:
-                self._scenario = LM_HardDate.Scenario.VaidBetween
-            else:
-                self._scenario = LM_HardDate.Scenario.ValidSince
-        else:
-            if lic.params['timeEndEnabled'].value:
-                self._scenario = LM_HardDate.Scenario.ExpireAfter
-            else:
-                raise SdkError("Invalid license parameters")
+        if self._param('timeBeginEnabled'):
+            if self._param('timeEndEnabled'):
+                return LM_HardDate.Scenario.VaidBetween
+            return LM_HardDate.Scenario.ValidSince
+
+        if self._param('timeEndEnabled'):
+            return LM_HardDate.Scenario.ExpireAfter
+        raise SdkError("Invalid license parameters")
+
+    def refresh(self):
+        super().refresh()
+        self._scenario = self._readScenario()
 
     @property
     def timeBegin(self)->datetime:
         """ When the license becomes valid? 
             Only available for scenerio 'ValidBetween' and 'ValidSince'
         """
+        return _utcdate(self._timeBegin())
 
+    def _timeBegin(self)->int:
+        if self._epoch != _cache.state.epoch:
+            self.refresh()
         if self._scenario == LM_HardDate.Scenario.ExpireAfter:
             raise SdkError("timeBegin not defined for scenario 'ExpireAfter'")
-
-        return self._lic.params['timeBegin'].value
+        return self._param('timeBegin')
 
     @property
     def timeEnd(self)->datetime:
         """ when the license will be expired? (alias of property 'expireDate')
             Only available for scenerio 'ValidBetween' and 'ExpireAfter'
         """
+        return _utcdate(self._timeEnd())
+
+    def _timeEnd(self)->int:
+        if self._epoch != _cache.state.epoch:
+            self.refresh()
         if self._scenario == LM_HardDate.Scenario.ValidSince:
             raise SdkError("timeEnd not defined for scenario 'ValidSince'")
-
-        return self._lic.params['timeEnd'].value
+        return self._param('timeEnd')
 
     @property
     def secondsLeft(self)->int:
@@ -239,11 +341,9 @@ class LM_HardDate(TrialInspector):
          how many seconds left before license is expired (ValidBetween / ExpireAfter)
          or how many seconds left before license is valid (ValidSince)
         """
-        t = datetime.utcnow()
-        if self._scenario == LM_HardDate.Scenario.ValidSince:
-            return 0 if t >= self.timeBegin else int((self.timeBegin - t).total_seconds())
-        else:
-            return 0 if t >= self.timeEnd else int((self.timeEnd - t).total_seconds())
+        t = self._timeBegin() if self._scenario == LM_HardDate.Scenario.ValidSince else self._timeEnd()
+        return max(0, int(t - _utcnow()))
+
     @property 
     def expireDate(self)->datetime:
         """ when the license will be expired? (alias of property 'timeEnd') """
@@ -252,34 +352,32 @@ class LM_HardDate(TrialInspector):
 
 @inspect(LicenseId.TRIAL_SESSION)
 class LM_Session(TrialInspector):
-    def __init__(self, lic: License):
-        self._lic = lic
     @property
     def secondsPassed(self)->int:
         """Session time elapsed in seconds"""
-        return self._lic.params['sessionTimeUsed'].value
+        return self._counter('sessionTimeUsed')
     @property
     def secondsTotal(self)->int:
         """ maximum seconds allowed in a session """
-        return self._lic.params['maxSessionTime'].value
+        return self._param('maxSessionTime')
     @property
     def secondsLeft(self)->int:
         """ how many seconds left before this session expires """
-        return 0 if self.secondsPassed >= self.secondsTotal else self.secondsTotal - self.secondsPassed
+        return max(0, self.secondsTotal - self.secondsPassed)
     @property 
     def expireDate(self)->datetime:
         """ when the license will be expired for this session? """
-        return datetime.now() + self.secondsLeft
+        return _utcdate(int(_utcnow()) + self.secondsLeft)
     
 
 @inspect(LicenseId.TRIAL_PERIOD)
 class LM_Period(TrialInspector):
     """
     Trial By Period license inspector
+
+    The first access time is kept once the entity has been accessed, so that time-derived values are computed
+    locally without querying sdk core.
     """
-    def __init__(self, lic: License):
-        self._lic = lic
-    
     def __repr__(self):
         if self.used:
             return f'''
@@ -299,22 +397,32 @@ class LM_Period(TrialInspector):
                 firstAccessDate: N/A \n
                 expireDate: N/A '''
 
+    def _firstAccess(self)->int:
+        """ first access time in epoch seconds, None if never accessed """
+        if self._values is not None:
+            return self._values.get('timeFirstAccess')
+        if self._epoch != _cache.state.epoch:
+            self.refresh()
+        t = self._static.get('timeFirstAccess')
+        if t is None and self._lic.params['timeFirstAccess'].valid:
+            # set once on first access, static from then on
+            t = self._param('timeFirstAccess')
+        return t
 
     @property
     def used(self)->bool:
         """ entity has been accessed before """
-        return self._lic.params['timeFirstAccess'].valid
+        return self._firstAccess() is not None
 
     @property 
     def expirePeriodInSeconds(self)->int:
         """ trial period settings in seconds """
-        return self._lic.params['periodInSeconds'].value
+        return self._param('periodInSeconds')
 
     @property 
     def secondsLeft(self)->int:
         """ how many seconds left before license is expired """
-        x = self.expirePeriodInSeconds - self.secondsPassed
-        return x if x >=0 else 0
+        return max(0, self.expirePeriodInSeconds - self.secondsPassed)
 
     @property 
     def secondsPassed(self)->int:
@@ -322,16 +430,18 @@ class LM_Period(TrialInspector):
          how many seconds has elapsed since entity was first accessed
          return 0 if entity is never accessed before
         """
-        return 0 if not self.used else int((datetime.utcnow() - self.firstAccessDate).total_seconds())
+        t = self._firstAccess()
+        return 0 if t is None else int(_utcnow() - t)
 
     @property 
     def firstAccessDate(self)->datetime:
         """ the first time entity is accessed """
-        if self.used:
-            return self._lic.params['timeFirstAccess'].value
-        raise SdkError("entity is never accessed before")
+        t = self._firstAccess()
+        if t is None:
+            raise SdkError("entity is never accessed before")
+        return _utcdate(t)
 
     @property 
     def expireDate(self)->datetime:
         """ when the license will be expired? """
-        return self.firstAccessDate + timedelta(seconds=self.expirePeriodInSeconds)
\ No newline at end of file
+        return self.firstAccessDate + timedelta(seconds=self.expirePeriodInSeconds)
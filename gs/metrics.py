@@ -0,0 +1,84 @@
+"""
+Metrics shared by sdk instrumentation
+"""
+
+import bisect
+import threading
+
+
+class Histogram:
+    """
+    Log-bucketed histogram of durations (in seconds)
+
+    bucket i counts values <= base * 2**i, values above the last bound go to the overflow bucket. with the
+    defaults buckets span 1us .. ~67s.
+    """
+    __slots__ = ('_bounds', '_counts', '_lock', 'count', 'sum', 'min', 'max')
+
+    def __init__(self, base: float = 1e-6, buckets: int = 27):
+        self._bounds = [ base * (1 << i) for i in range(buckets) ]
+        self._counts = [0] * (buckets + 1)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, v: float):
+        i = bisect.bisect_left(self._bounds, v)
+        with self._lock:
+            self._counts[i] += 1
+            self.count += 1
+            self.sum += v
+            if self.min is None or v < self.min:
+                self.min = v
+            if self.max is None or v > self.max:
+                self.max = v
+
+    @property
+    def mean(self)->float:
+        return self.sum / self.count if self.count else 0.0
+
+    def percentile(self, q: float)->float:
+        """ upper bound of the bucket holding the (q) quantile (0..1), max for the overflow bucket """
+        with self._lock:
+            if self.count == 0:
+                return 0.0
+            rank = q * self.count
+            n = 0
+            for i, c in enumerate(self._counts):
+                n += c
+                if n >= rank and c:
+                    return self._bounds[i] if i < len(self._bounds) else self.max
+            return self.max
+
+    def buckets(self)->list:
+        """ cumulative [(upper bound, count)], the last bound is +inf """
+        with self._lock:
+            counts = list(self._counts)
+        out = []
+        n = 0
+        for bound, c in zip(self._bounds + [float('inf')], counts):
+            n += c
+            out.append((bound, n))
+        return out
+
+    def to_dict(self)->dict:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min,
+            'max': self.max,
+            'mean': self.mean,
+            'p50': self.percentile(0.5),
+            'p90': self.percentile(0.9),
+            'p99': self.percentile(0.99),
+        }
+
+    def reset(self):
+        with self._lock:
+            self._counts = [0] * len(self._counts)
+            self.count = 0
+            self.sum = 0.0
+            self.min = None
+            self.max = None
@@ -1,10 +1,21 @@
 from . import intf as _intf
+from . import cache as _cache
 from .util import SdkError, str2pchar
 from .entity import Entity
+from .core import Core
+from .metrics import Histogram
 
 from enum import IntFlag 
 
+import collections
+import functools
+import heapq
+import itertools
 import logging
+import threading
+import time
+import weakref
+
 class Event(IntFlag):
     """ System Event IDs """
 
@@ -129,20 +140,148 @@ _appListeners = {}
 _entityListeners = {}
 _licListeners = {}
 
-# entity event decorators
-class entity_listener(object):
+class _Timer:
+    """
+    single thread delivering coalesced listener calls, owner._deliver(key) is called (delay) seconds after
+    schedule(). the thread leaves once no call is pending, stop() drops pending calls.
+    """
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._heap = []
+        self._seq = itertools.count()
+        self._thread = None
+
+    def schedule(self, delay: float, owner, key):
+        with self._cond:
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._seq), owner, key))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="gs-coalesce", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def stop(self):
+        with self._cond:
+            dropped, self._heap = self._heap, []
+            thread, self._thread = self._thread, None
+            self._cond.notify()
+        for _, _, owner, key in dropped:
+            owner._drop(key)
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def _run(self):
+        me = threading.current_thread()
+        while True:
+            with self._cond:
+                while True:
+                    if self._thread is not me:
+                        return
+                    if not self._heap:
+                        self._thread = None
+                        return
+                    wait = self._heap[0][0] - time.monotonic()
+                    if wait <= 0:
+                        break
+                    self._cond.wait(wait)
+                _, _, owner, key = heapq.heappop(self._heap)
+            owner._deliver(key)
+
+_timer = _Timer()
+
+class _Throttle:
+    """
+    calls listener at most once per (interval) seconds per key (entity), the number of events suppressed since
+    the previous call is passed as keyword argument 'suppressed'.
+
+    when coalescing, the last event of a burst is not dropped but delivered (from the timer thread) as soon as
+    the interval has elapsed.
+    """
+    def __init__(self, f, interval: float, coalesce: bool):
+        self._f = f
+        self._interval = interval
+        self._coalesce = coalesce
+        self._lock = threading.Lock()
+        self._last = {}       # key => time of last call
+        self._suppressed = {} # key => events suppressed since last call
+        self._pending = {}    # key => args of the coalesced event to deliver
+
+    def __call__(self, key, *args):
+        now = time.monotonic()
+        with self._lock:
+            last = self._last.get(key)
+            if last is not None and now - last < self._interval:
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                if self._coalesce:
+                    if key not in self._pending:
+                        _timer.schedule(self._interval - (now - last), self, key)
+                    self._pending[key] = args
+                return
+
+            self._last[key] = now
+            n = self._suppressed.pop(key, 0)
+        self._f(*args, suppressed=n)
+
+    def _deliver(self, key):
+        with self._lock:
+            args = self._pending.pop(key, None)
+            if args is None:
+                return
+            # the delivered event is not suppressed
+            n = self._suppressed.pop(key, 0) - 1
+            self._last[key] = time.monotonic()
+        _invoke(self._f, args[-1], args, { 'suppressed': n })
+
+    def _drop(self, key):
+        with self._lock:
+            self._pending.pop(key, None)
+
+class _listener(object):
+    """
+    base of listener decorators, used as is or with options:
+
+        @gs.entity_access_heartbeat(min_interval=5.0, coalesce=True)
+        def alive(entity, event, suppressed):
+            ...
+
+    min_interval: listener is called at most once per (min_interval) seconds (per entity for entity events),
+                  and receives the number of events suppressed in between as keyword argument 'suppressed'.
+    coalesce: the last event suppressed in an interval is delivered once the interval elapsed.
+    """
     _event: Event = None
 
-    def __init__(self, f):
+    def __new__(cls, f = None, *, min_interval: float = None, coalesce: bool = False):
+        if f is None:
+            return functools.partial(cls, min_interval=min_interval, coalesce=coalesce)
+        return object.__new__(cls)
+
+    def __init__(self, f, *, min_interval: float = None, coalesce: bool = False):
         # save native function to be decorated so that when calling no recursion occurs
-        self._f = f if not isinstance(f, entity_listener) else f._f
+        self._f = f if not isinstance(f, _listener) else f._f
+
+        self._throttle = None
+        if min_interval is not None:
+            self._throttle = _Throttle(self._f, min_interval, coalesce)
+        elif coalesce:
+            raise SdkError("coalescing listener requires min_interval")
+
+    def _register(self, listeners: dict):
         try:
-            _entityListeners[self._event].append(self)
+            listeners[self._event].append(self)
         except KeyError:
-            _entityListeners[self._event] = [self]
+            listeners[self._event] = [self]
+        _rebuild()
+
+# entity event decorators
+class entity_listener(_listener):
+    def __init__(self, f, **options):
+        super().__init__(f, **options)
+        self._register(_entityListeners)
 
     def __call__(self, entity: Entity, event):
-        self._f(entity, event)
+        if self._throttle is None:
+            self._f(entity, event)
+        else:
+            self._throttle(entity.id, entity, event)
 
 class entity_access_starting(entity_listener):
     _event = Event.EVENT_ENTITY_ACCESS_STARTING
@@ -170,19 +309,16 @@ class entity_action_applied(entity_listener):
 
 
 # license event decorators
-class license_listener(object):
-    _event: Event = None
-
-    def __init__(self, f):
-        # save native function to be decorated so that when calling no recursion occurs
-        self._f = f if not isinstance(f, license_listener) else f._f
-        try:
-            _licListeners[self._event].append(self)
-        except KeyError:
-            _licListeners[self._event] = [self]
+class license_listener(_listener):
+    def __init__(self, f, **options):
+        super().__init__(f, **options)
+        self._register(_licListeners)
 
     def __call__(self, event):
-        self._f(event)
+        if self._throttle is None:
+            self._f(event)
+        else:
+            self._throttle(None, event)
 
 
 class license_loading(license_listener):
@@ -198,19 +334,16 @@ class license_fail(license_listener):
     _event = Event.EVENT_LICENSE_FAIL
 
 # application event decorators
-class app_listener(object):
-    _event: Event = None
-
-    def __init__(self, f):
-        # save native function to be decorated so that when calling no recursion occurs
-        self._f = f if not isinstance(f, app_listener) else f._f
-        try:
-            _appListeners[self._event].append(self)
-        except KeyError:
-            _appListeners[self._event] = [self]
+class app_listener(_listener):
+    def __init__(self, f, **options):
+        super().__init__(f, **options)
+        self._register(_appListeners)
 
     def __call__(self, event):
-        self._f(event)
+        if self._throttle is None:
+            self._f(event)
+        else:
+            self._throttle(None, event)
 
 class app_begin(app_listener):
     _event = Event.EVENT_APP_BEGIN
@@ -231,58 +364,503 @@ class app_integrity_corrupted(app_listener):
 _hMonitor = None # internal monitor handle
 
 
-def _resolveEntity(hEvent, event)->Entity:
-    """ resolve entity from hEvent (handle to entity event) """
+# entities created for event sources unknown to core, interned by handle while referenced
+_eventEntities = weakref.WeakValueDictionary()
+
+def _eventSource(hEvent, event):
+    """ handle of entity sending entity event (hEvent) """
     hEntity = _intf.gsGetEventSource(hEvent)
     if hEntity is None:
         raise SdkError(f"entity event ({event}) cannot resolve event source")
+    return hEntity
 
+def _entityOf(hEntity)->Entity:
+    """ entity of handle (hEntity) """
     # first check if the entity already exists in core
-    from .core import Core
-    for e in Core().entities:
-        if e.handle == hEntity:
+    core = Core._inst
+    if core is not None:
+        e = core._findEntityByHandle(hEntity)
+        if e is not None:
             return e
-    # create an entity instance as last resort
-    return Entity(hEntity)
 
-@_intf.gs5_monitor_callback
-def _gs_cb(eventId, hEvent, userData):
-    event = Event(eventId)
-    print(f"event: {event} hEvent: {hEvent} userData: {userData}")
+    e = _eventEntities.get(hEntity)
+    if e is None:
+        # create an entity instance as last resort
+        e = _eventEntities[hEntity] = Entity(hEntity)
+    return e
 
+def _resolveEntity(hEvent, event)->Entity:
+    """ resolve entity from hEvent (handle to entity event) """
+    return _entityOf(_eventSource(hEvent, event))
+
+# internal hooks called with (eventId, hEvent) ahead of listeners, event id => [hook]
+_hooks = {}
+
+def addHook(hook, events):
+    """ call hook(eventId, hEvent) on native thread for (events), ahead of any listener """
+    with _lock:
+        for eventId in events:
+            _hooks.setdefault(eventId, []).append(hook)
+            _rebuildSlot(eventId)
+
+def removeHook(hook):
+    with _lock:
+        for eventId, hooks in _hooks.items():
+            if hook in hooks:
+                hooks.remove(hook)
+                _rebuildSlot(eventId)
+
+def clearListeners():
+    """ remove all event listeners """
+    _appListeners.clear()
+    _entityListeners.clear()
+    _licListeners.clear()
+    _rebuild()
+
+_debug = False
+
+def setDebug(enabled: bool):
+    """ log every event received (debug level) """
+    global _debug
+    _debug = enabled
+    _rebuild()
+
+def _logEvent(eventId, hEvent):
+    event = _eventOf(eventId)
+    logging.debug("event: %s (%d) hEvent: %s", getattr(event, 'name', 'unknown'), eventId, hEvent)
+
+def _eventOf(eventId: int):
+    try:
+        return Event(eventId)
+    except ValueError:
+        return eventId
+
+#------------------ scoped subscriptions -------------------------
+class Subscription:
+    """
+    listener subscribed by Entity.on() / Core.on(), call unsubscribe() to stop receiving events.
+
+    the listener is held by weak reference (unless subscribed with weak=False), the subscription ends when
+    the listener is garbage collected. a lambda is only referenced by the subscription, it must be subscribed
+    with weak=False.
+    """
+    __slots__ = ('eventId', 'hEntity', '_fn', '__weakref__')
+
+    def __init__(self, eventId: int, hEntity, fn, weak: bool = True):
+        self.eventId = eventId
+        self.hEntity = hEntity # None: any entity
+        if weak and getattr(fn, '__name__', None) == '<lambda>':
+            raise SdkError("a lambda listener would be collected right away, subscribe it with weak=False")
+        self._fn = _weakListener(fn, self._expired) if weak else (lambda: fn)
+
+    def __repr__(self):
+        return f"Subscription({_eventOf(self.eventId)!r}, hEntity={self.hEntity}, active={self.active})"
+
+    @property
+    def active(self)->bool:
+        return self._fn is not None and self._fn() is not None
+
+    def unsubscribe(self):
+        if self._fn is not None:
+            self._fn = None
+            _unsubscribe(self)
+
+    def _expired(self, ref):
+        self.unsubscribe()
+
+def _weakListener(fn, callback):
+    try:
+        if hasattr(fn, '__self__') and hasattr(fn, '__func__'):
+            return weakref.WeakMethod(fn, callback)
+        return weakref.ref(fn, callback)
+    except TypeError:
+        # not weakly referenceable (builtin...)
+        return lambda: fn
+
+# event id => { entity handle (None: any entity) => [Subscription] }
+_subscriptions = {}
+# guards _subscriptions / _hooks and dispatch table updates, re-entrant as weak reference callbacks can
+# unsubscribe from within garbage collection
+_lock = threading.RLock()
+
+def subscribe(eventId: int, fn, hEntity = None, weak: bool = True)->Subscription:
+    """ listen to event (eventId) of entity (hEntity), any entity if None """
+    sub = Subscription(int(eventId), hEntity, fn, weak)
+    with _lock:
+        _subscriptions.setdefault(sub.eventId, {}).setdefault(hEntity, []).append(sub)
+        _rebuildSlot(sub.eventId)
+    return sub
+
+def _unsubscribe(sub: Subscription):
+    with _lock:
+        byEntity = _subscriptions.get(sub.eventId, {})
+        subs = byEntity.get(sub.hEntity)
+        if subs is not None and sub in subs:
+            subs.remove(sub)
+            if not subs:
+                del byEntity[sub.hEntity]
+            _rebuildSlot(sub.eventId)
+
+
+# dispatch table, event id => (hooks, event, listeners, entity event?, scoped subscriptions), None if nobody
+# is interested. rebuilt when listeners / hooks / subscriptions change, so the native callback does no lookups
+_table = [None] * (Event.EVENT_ID_MAX + 1)
+
+def _slot(eventId: int):
     eventType = getEventType(eventId)
+    if eventType == EventType.EVENT_TYPE_APP:
+        listeners = _appListeners.get(eventId)
+    elif eventType == EventType.EVENT_TYPE_LICENSE:
+        listeners = _licListeners.get(eventId)
+    else:
+        listeners = _entityListeners.get(eventId)
+
+    hooks = list(_hooks.get(eventId, ()))
+    if _debug:
+        hooks.insert(0, _logEvent)
+
+    scoped = { h: tuple(subs) for h, subs in _subscriptions.get(eventId, {}).items() } or None
+    if hooks or listeners or scoped:
+        return (tuple(hooks), _eventOf(eventId), tuple(listeners or ()), eventType == EventType.EVENT_TYPE_ENTITY, scoped)
+    return None
+
+def _rebuildSlot(eventId: int):
+    with _lock:
+        _table[eventId] = _slot(eventId)
+
+def _rebuild():
+    global _table
+    with _lock:
+        _table = [ _slot(eventId) for eventId in range(Event.EVENT_ID_MAX + 1) ]
+
+# events changing entity / license state
+_stateEvents = frozenset((
+    Event.EVENT_LICENSE_READY,
+    Event.EVENT_ENTITY_ACCESS_STARTED,
+    Event.EVENT_ENTITY_ACCESS_ENDED,
+    Event.EVENT_ENTITY_ACCESS_INVALID,
+    Event.EVENT_ENTITY_ACTION_APPLIED,
+))
+
+def _invalidateState(eventId, hEvent):
+    if eventId == Event.EVENT_ENTITY_ACTION_APPLIED:
+        _cache.reset()
+    else:
+        _cache.invalidate()
+
+addHook(_invalidateState, _stateEvents)
 
-    if eventType == EventType.EVENT_TYPE_UNKNOWN:
-        logging.debug(f"Unknown eventId: {eventId}")
-    elif eventType == EventType.EVENT_TYPE_APP:
+@_intf.gs5_monitor_callback
+def _gs_cb(eventId, hEvent, userData):
+    _handleEvent(eventId, hEvent)
+
+def _handleEvent(eventId, hEvent):
+    st = _stats
+    if st is None:
+        _handle(eventId, hEvent)
+        return
+
+    t = time.perf_counter()
+    try:
+        _handle(eventId, hEvent)
+    finally:
+        st.event(eventId, time.perf_counter() - t)
+
+def _handle(eventId, hEvent):
+    table = _table
+    if not 0 <= eventId < len(table):
+        return # negative ids would index from the end
+    slot = table[eventId]
+    if slot is None:
+        return
+
+    hooks, event, listeners, isEntity, scoped = slot
+    for hook in hooks:
         try:
-            listeners = _appListeners[eventId]
-            if len(listeners) > 0:
-                for x in listeners:
-                    x(event)
-        except KeyError:
-            pass # no listeners
+            hook(eventId, hEvent)
+        except Exception:
+            logging.exception("monitor hook failure")
+
+    hEntity = None
+    if isEntity:
+        if not listeners and scoped is None:
+            return
+        hEntity = _eventSource(hEvent, event)
+        if not listeners and hEntity not in scoped and None not in scoped:
+            return # no entity resolution for events nobody listens to
+    elif not listeners and scoped is None:
+        return
+
+    d = _dispatcher
+    # event handle is only valid in callback, pass on the event source. a dispatcher being stopped refuses
+    # events, they are dispatched inline
+    if d is None or eventId in d.inline or d._isDispatching() or not d.put(eventId, hEntity):
+        _run(slot, hEntity)
+
+def _dispatch(eventId, hEntity):
+    """ run listeners of event, (hEntity) is the source of entity events """
+    slot = _table[eventId]
+    if slot is not None:
+        _run(slot, hEntity)
+
+def _run(slot, hEntity):
+    """ run listeners and scoped subscriptions of event (slot) """
+    _, event, listeners, isEntity, scoped = slot
+    subs = ()
+    if scoped is not None:
+        subs = scoped.get(None, ())
+        if hEntity is not None:
+            subs = scoped.get(hEntity, ()) + subs
+
+    args = (_entityOf(hEntity), event) if isEntity else (event,)
+    for x in listeners:
+        _invoke(x, event, args)
+    for sub in subs:
+        fn = sub._fn and sub._fn()
+        if fn is not None:
+            _invoke(fn, event, args)
+
+def _invoke(fn, event, args, kwargs = {}):
+    """ call listener fn(*args, **kwargs) of (event), a failing listener does not stop others """
+    st = _stats
+    t = time.perf_counter() if st is not None else 0
+    try:
+        fn(*args, **kwargs)
+    except Exception:
+        logging.exception(f"listener ({_listenerName(fn)}) failure on event ({event!r})")
+    finally:
+        if st is not None:
+            st.listener(_listenerName(fn), event, time.perf_counter() - t)
+
+
+#------------------ statistics -------------------------
+class _Stats:
+    def __init__(self, slowThreshold: float, slowLogSize: int):
+        self.slowThreshold = slowThreshold
+        self.events = [0] * (Event.EVENT_ID_MAX + 1) # event id => events received
+        self.callback = Histogram() # time spent in python per native callback
+        self.listeners = {} # listener name => Histogram
+        self.slow = collections.deque(maxlen=slowLogSize) # (time, event, listener, seconds)
+        self.lock = threading.Lock()
+
+    def event(self, eventId: int, t: float):
+        self.callback.observe(t)
+        if 0 <= eventId <= Event.EVENT_ID_MAX:
+            self.events[eventId] += 1
+
+    def listener(self, name: str, event, t: float):
+        h = self.listeners.get(name)
+        if h is None:
+            with self.lock:
+                h = self.listeners.setdefault(name, Histogram())
+        h.observe(t)
+        if t >= self.slowThreshold:
+            self.slow.append((time.time(), event, name, t))
+
+_stats = None
+
+def _listenerName(x)->str:
+    f = getattr(x, '_f', x)
+    return f"{getattr(f, '__module__', '?')}.{getattr(f, '__qualname__', repr(f))}"
+
+def enableStats(slowThreshold: float = 0.01, slowLogSize: int = 100):
+    """
+    collect event counters and callback / listener latencies, see stats()
 
-    elif eventType == EventType.EVENT_TYPE_ENTITY:
-        try:
-            listeners = _entityListeners[eventId]
-            if len(listeners) > 0:
-                entity = _resolveEntity(hEvent, event)
-                for x in listeners:
-                    x(entity, event)
-        except KeyError:
-            pass # no listeners
+    listeners running for (slowThreshold) seconds or longer are logged, the last (slowLogSize) are kept.
+    """
+    global _stats
+    _stats = _Stats(slowThreshold, slowLogSize)
 
-    elif eventType == EventType.EVENT_TYPE_LICENSE:
-        try:
-            listeners = _licListeners[eventId]
-            if len(listeners) > 0:
-                for x in listeners:
-                    x(event)
-        except KeyError:
-            pass # no listeners
+def disableStats():
+    global _stats
+    _stats = None
 
-        
+def stats()->dict:
+    """
+    monitor statistics:
+
+    events: event name => events received
+    callback: histogram of time (seconds) spent in python per native callback
+    listeners: listener name => histogram of time (seconds) spent per call
+    slow: [(epoch time, event, listener, seconds)] of listener calls slower than threshold, oldest first
+    dispatcher: dispatcher statistics, if dispatcher mode is on
+    """
+    st = _stats
+    d = _dispatcher
+    out = { 'enabled': st is not None }
+    if st is not None:
+        out['events'] = { getattr(_eventOf(i), 'name', str(i)): n for i, n in enumerate(st.events) if n }
+        out['callback'] = st.callback.to_dict()
+        out['listeners'] = { name: h.to_dict() for name, h in list(st.listeners.items()) }
+        out['slow'] = list(st.slow)
+    if d is not None:
+        out['dispatcher'] = d.stats
+    return out
+
+
+#------------------ dispatcher -------------------------
+# events dispatched on the native thread by default even in dispatcher mode, their listeners may need to
+# change the license store before sdk core proceeds
+INLINE_EVENTS = frozenset((
+    Event.EVENT_ENTITY_ACCESS_STARTING,
+    Event.EVENT_LICENSE_LOADING,
+))
+
+class Dispatcher:
+    """
+    Runs listeners on dispatcher threads, the native callback only enqueues (eventId, event source)
+
+    maxsize: events queued at most
+    threads: dispatcher threads; with more than one, listeners of events of the same entity may run concurrently
+    overflow: policy when the queue is full:
+        BLOCK: native callback waits for room
+        DROP_OLDEST: oldest event is dropped
+        DROP_HEARTBEAT: oldest heartbeat event is dropped, the oldest event if no heartbeat queued
+    inline: ids of events dispatched inline on the native thread
+    """
+    BLOCK = 'block'
+    DROP_OLDEST = 'drop-oldest'
+    DROP_HEARTBEAT = 'drop-heartbeat'
+
+    def __init__(self, maxsize: int = 1024, threads: int = 1, overflow: str = BLOCK, inline = INLINE_EVENTS):
+        if overflow not in (Dispatcher.BLOCK, Dispatcher.DROP_OLDEST, Dispatcher.DROP_HEARTBEAT):
+            raise SdkError(f"unknown overflow policy ({overflow})")
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.inline = frozenset(inline)
+
+        self._queue = collections.deque()
+        self._cond = threading.Condition()
+        self._running = True
+        self._busy = 0 # events being dispatched
+        self._local = threading.local()
+
+        # statistics
+        self._queued = 0
+        self._dispatched = 0
+        self._dropped = 0
+        self._maxDepth = 0
+        self._lag = 0.0  # seconds last event waited in queue
+        self._maxLag = 0.0
+        self._totalLag = 0.0
+
+        self._threads = [ threading.Thread(target=self._run, name=f"gs-dispatch-{i}", daemon=True) for i in range(threads) ]
+        for t in self._threads:
+            t.start()
+
+    def _isDispatching(self)->bool:
+        # events raised by listeners running on a dispatcher thread are dispatched inline, so that a full
+        # queue never waits on its own consumer
+        return getattr(self._local, 'active', False)
+
+    def put(self, eventId: int, hEntity)->bool:
+        """ queue event, False if the dispatcher is stopped (the event is not queued) """
+        with self._cond:
+            q = self._queue
+            while True:
+                # checked under the lock stop() takes, no event is queued once the threads may have left
+                if not self._running:
+                    return False
+                if len(q) < self.maxsize:
+                    break
+                if self.overflow == Dispatcher.BLOCK:
+                    self._cond.wait()
+                    continue
+
+                if self.overflow == Dispatcher.DROP_HEARTBEAT:
+                    for x in q:
+                        if x[0] == Event.EVENT_ENTITY_ACCESS_HEARTBEAT:
+                            q.remove(x)
+                            break
+                    else:
+                        q.popleft()
+                else:
+                    q.popleft()
+                self._dropped += 1
+
+            q.append((eventId, hEntity, time.monotonic()))
+            self._queued += 1
+            if len(q) > self._maxDepth:
+                self._maxDepth = len(q)
+            self._cond.notify_all()
+        return True
+
+    def _run(self):
+        self._local.active = True
+        while True:
+            with self._cond:
+                while not self._queue:
+                    if not self._running:
+                        return
+                    self._cond.wait()
+                eventId, hEntity, t = self._queue.popleft()
+                self._busy += 1
+                lag = time.monotonic() - t
+                self._lag = lag
+                self._totalLag += lag
+                if lag > self._maxLag:
+                    self._maxLag = lag
+                self._cond.notify_all() # room for blocked producers
+
+            try:
+                _dispatch(eventId, hEntity)
+            except Exception:
+                logging.exception(f"event ({eventId}) dispatch failure")
+
+            with self._cond:
+                self._busy -= 1
+                self._dispatched += 1
+                self._cond.notify_all()
+
+    def drain(self, timeout: float = None)->bool:
+        """ wait until all queued events are dispatched """
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._queue and self._busy == 0, timeout)
+
+    def stop(self):
+        """ dispatch queued events and stop dispatcher threads, events put afterwards are refused """
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        me = threading.current_thread()
+        for t in self._threads:
+            if t is not me:
+                t.join()
+
+    @property
+    def stats(self)->dict:
+        with self._cond:
+            return {
+                'depth': len(self._queue),
+                'maxDepth': self._maxDepth,
+                'queued': self._queued,
+                'dispatched': self._dispatched,
+                'dropped': self._dropped,
+                'lag': self._lag,
+                'maxLag': self._maxLag,
+                'avgLag': self._totalLag / self._dispatched if self._dispatched else 0.0,
+            }
+
+_dispatcher = None
+
+def enableDispatcher(maxsize: int = 1024, threads: int = 1, overflow: str = Dispatcher.BLOCK, inline = INLINE_EVENTS)->Dispatcher:
+    """ run listeners on dispatcher threads instead of the native callback thread """
+    global _dispatcher
+    disableDispatcher()
+    _dispatcher = Dispatcher(maxsize, threads, overflow, inline)
+    return _dispatcher
+
+def disableDispatcher():
+    """ dispatch queued events and go back to dispatching on the native callback thread """
+    global _dispatcher
+    d, _dispatcher = _dispatcher, None
+    if d is not None:
+        d.stop()
+
+def dispatcher()->Dispatcher:
+    """ dispatcher in use, None in inline mode """
+    return _dispatcher
 
 
 def initMonitor():
@@ -292,3 +870,8 @@ def initMonitor():
         if _hMonitor is None:
             raise SdkError("global monitor creation failure")
 
+def closeMonitor():
+    """ forget the monitor released by sdk core on clean up, coalesced events not delivered yet are dropped """
+    global _hMonitor
+    _hMonitor = None
+    _timer.stop()
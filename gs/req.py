@@ -3,6 +3,7 @@ Request code
 """
 
 from . import intf as _intf
+from . import trace as _trace
 from .util import HObject, SdkError, pchar2str
 from .entity import Entity
 from .act import ActionId, Action
@@ -10,6 +11,7 @@ from .act import ActionId, Action
 class Request(HObject):
     """ request code generator """
 
+    @_trace.traced("Request.addAction", lambda self, actId, target=None: { 'action': int(actId), 'entity': None if target is None else target.id })
     def addAction(self, actId: ActionId, target: Entity = None):
         """
         Create an action object with an optional target entity
@@ -28,6 +30,7 @@ class Request(HObject):
         return Action.create(actId, hAct)
     
     @property
+    @_trace.traced("Request.code")
     def code(self)->str:
         """ request code """
         return pchar2str(_intf.gsGetRequestCode(self._handle))
\ No newline at end of file
@@ -0,0 +1,219 @@
+"""
+License expiry scheduler
+
+Deadlines of entities are derived from their license inspectors (LM_HardDate, LM_Period, LM_Session and
+LM_Duration) and kept in a min-heap served by a single timer thread. Callbacks registered by at_expiry() run
+on the timer thread (before) seconds ahead of the deadline.
+
+Deadlines are recomputed only for the entity concerned when it starts / ends being accessed or license actions
+are applied to it, a deadline moved later re-arms callbacks already fired.
+
+    @gs.monitor.entity_access_started
+    ...
+    gs.scheduler.at_expiry(entity, lambda e: print(f"{e.name} expires in 1 minute"), before=60)
+"""
+
+from . import monitor as _monitor
+from .monitor import Event
+from .entity import Entity
+from .lic import LicenseId, LicenseStatus, _utcnow
+
+import heapq
+import itertools
+import logging
+import threading
+
+
+def deadline(entity: Entity)->float:
+    """ epoch time (in seconds) the license of (entity) expires, None if it is not running out of time """
+    lic = entity.license
+    if lic is None or lic.status != LicenseStatus.ACTIVE:
+        return None
+
+    licId = lic.id
+    isp = lic.inspector
+    if licId == LicenseId.TRIAL_HARDDATE:
+        return None if isp._scenario == isp.Scenario.ValidSince else isp._timeEnd()
+
+    if licId == LicenseId.TRIAL_PERIOD:
+        t = isp._firstAccess()
+        return None if t is None else t + isp.expirePeriodInSeconds
+
+    if licId == LicenseId.TRIAL_SESSION or licId == LicenseId.TRIAL_DURATION:
+        # time only runs out while the entity is being accessed
+        return _utcnow() + isp.secondsLeft if entity.accessing else None
+
+    return None
+
+
+class Job:
+    """ callback scheduled ahead of an entity's deadline """
+    __slots__ = ('entity', 'fn', 'before', 'deadline', '_scheduler', '_version', '_fired')
+
+    def __init__(self, scheduler, entity: Entity, fn, before: float):
+        self.entity = entity
+        self.fn = fn
+        self.before = before
+        self.deadline = None # current deadline of entity
+        self._scheduler = scheduler
+        self._version = 0    # bumped when re-armed / cancelled, outdated heap entries are skipped
+        self._fired = None   # deadline the callback has been fired for
+
+    def __repr__(self):
+        return f"Job({self.entity.id}, deadline={self.deadline}, before={self.before})"
+
+    def cancel(self):
+        """ the callback will not be called anymore """
+        self._scheduler._cancel(self)
+
+
+# events changing deadlines of entities
+_refreshEvents = frozenset((
+    Event.EVENT_ENTITY_ACCESS_STARTED,
+    Event.EVENT_ENTITY_ACCESS_ENDED,
+    Event.EVENT_ENTITY_ACTION_APPLIED,
+))
+
+class Scheduler:
+    """ min-heap of (due time, job) served by a single timer thread """
+    # a deadline moving less than this (seconds) is the same deadline, keeps session / duration deadlines
+    # derived from whole seconds left from re-firing
+    _JITTER = 1
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._heap = []
+        self._jobs = {}  # entity id => [Job]
+        self._seq = itertools.count()
+        self._thread = None
+
+    def at_expiry(self, entity: Entity, fn, before: float = 0)->Job:
+        """ call fn(entity) (before) seconds before license of (entity) expires """
+        job = Job(self, entity, fn, before)
+        d = deadline(entity)
+        with self._cond:
+            self._jobs.setdefault(entity.id, []).append(job)
+            self._arm(job, d)
+            self._start()
+        return job
+
+    def refresh(self, entity: Entity = None):
+        """ recompute deadline of (entity), or all scheduled entities """
+        if entity is None:
+            with self._cond:
+                entities = [ jobs[0].entity for jobs in self._jobs.values() ]
+            for e in entities:
+                self.refresh(e)
+            return
+
+        d = deadline(entity)
+        with self._cond:
+            for job in self._jobs.get(entity.id, ()):
+                if not self._same(job.deadline, d):
+                    self._arm(job, d)
+
+    @property
+    def jobs(self)->list:
+        """ scheduled jobs """
+        with self._cond:
+            return [ job for jobs in self._jobs.values() for job in jobs ]
+
+    def shutdown(self):
+        """ cancel all jobs and stop the timer thread """
+        with self._cond:
+            for jobs in self._jobs.values():
+                for job in jobs:
+                    job._version += 1
+            self._jobs.clear()
+            self._heap.clear()
+            thread, self._thread = self._thread, None
+            self._cond.notify_all()
+
+        if thread is not None:
+            _monitor.removeHook(self._onEvent)
+            if thread is not threading.current_thread():
+                thread.join()
+
+    # internals, called with lock held
+    def _same(self, d1, d2)->bool:
+        if d1 is None or d2 is None:
+            return d1 is d2
+        return abs(d1 - d2) < self._JITTER
+
+    def _arm(self, job: Job, d: float):
+        job.deadline = d
+        job._version += 1
+        if d is None or (job._fired is not None and d < job._fired + self._JITTER):
+            return
+        job._fired = None
+        heapq.heappush(self._heap, (d - job.before, next(self._seq), job._version, job))
+        self._cond.notify()
+
+    def _cancel(self, job: Job):
+        with self._cond:
+            job._version += 1
+            jobs = self._jobs.get(job.entity.id)
+            if jobs is not None and job in jobs:
+                jobs.remove(job)
+                if not jobs:
+                    del self._jobs[job.entity.id]
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="gs-scheduler", daemon=True)
+            _monitor.addHook(self._onEvent, _refreshEvents)
+            self._thread.start()
+
+    # timer thread
+    def _run(self):
+        me = threading.current_thread()
+        while True:
+            with self._cond:
+                job = None
+                while job is None:
+                    if self._thread is not me:
+                        return
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+
+                    due, _, version, top = self._heap[0]
+                    if version != top._version:
+                        heapq.heappop(self._heap) # outdated
+                        continue
+
+                    wait = due - _utcnow()
+                    if wait > 0:
+                        self._cond.wait(wait)
+                        continue
+
+                    heapq.heappop(self._heap)
+                    top._fired = top.deadline
+                    job = top
+
+            try:
+                job.fn(job.entity)
+            except Exception:
+                logging.exception("expiry callback failure (%s)", job)
+
+    # monitor hook
+    def _onEvent(self, eventId: int, hEvent):
+        if self._jobs:
+            entity = _monitor._resolveEntity(hEvent, Event(eventId))
+            if entity.id in self._jobs:
+                self.refresh(entity)
+
+
+_scheduler = Scheduler()
+
+def at_expiry(entity: Entity, fn, before: float = 0)->Job:
+    """ call fn(entity) (before) seconds before license of (entity) expires """
+    return _scheduler.at_expiry(entity, fn, before)
+
+def refresh(entity: Entity = None):
+    """ recompute deadline of (entity), or all scheduled entities """
+    _scheduler.refresh(entity)
+
+def shutdown():
+    """ cancel all jobs and stop the timer thread """
+    _scheduler.shutdown()
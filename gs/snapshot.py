@@ -0,0 +1,309 @@
+"""
+Whole-product license snapshot
+
+Core.snapshot() collects product info, all entities, their license status and parameters and the values
+derived by license inspectors in a single sweep. Handles opened for the sweep are closed before it returns,
+the result is an immutable tree of slotted records serializable to JSON (to_json) and a compact binary
+form (to_bytes).
+"""
+
+from . import intf as _intf
+from .util import pchar2str
+from .var import _VarType, _readRaw, _NOVALUE
+from .lic import LicenseId, inspectorOf
+from .util import SdkError
+
+import json
+import struct
+import time
+from datetime import datetime
+
+
+class _Record:
+    """ immutable record with slots """
+    __slots__ = ()
+
+    def __init__(self, *args):
+        for k, v in zip(self.__slots__, args):
+            object.__setattr__(self, k, v)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __eq__(self, other):
+        return type(other) is type(self) and all(getattr(self, k) == getattr(other, k) for k in self.__slots__)
+
+    def __hash__(self):
+        return hash(tuple(getattr(self, k) for k in self.__slots__))
+
+    def __repr__(self):
+        fields = ', '.join(f"{k}={getattr(self, k)!r}" for k in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+    def _values(self):
+        return [ getattr(self, k) for k in self.__slots__ ]
+
+
+class ParamSnapshot(_Record):
+    """ license parameter, value is None if the parameter does not hold a valid value """
+    __slots__ = ('name', 'type', 'value')
+
+
+class LicenseSnapshot(_Record):
+    """
+    license status and parameters
+
+    secondsLeft / timesLeft / expireDate are derived from parameters as the license inspector does, None if
+    not applicable to the license model.
+    """
+    __slots__ = ('id', 'status', 'valid', 'params', 'secondsLeft', 'timesLeft', 'expireDate')
+
+    def param(self, name: str):
+        """ value of parameter (name) """
+        for p in self.params:
+            if p.name == name:
+                return p.value
+        raise KeyError(name)
+
+
+class EntitySnapshot(_Record):
+    """ entity with its license """
+    __slots__ = ('id', 'name', 'description', 'attributes', 'license')
+
+    @property
+    def accessible(self)->bool:
+        return self.attributes & 1 != 0
+
+    @property
+    def unlocked(self)->bool:
+        return self.attributes & 2 != 0
+
+    @property
+    def accessing(self)->bool:
+        return self.attributes & 4 != 0
+
+    @property
+    def locked(self)->bool:
+        return self.attributes & 8 != 0
+
+
+class ProductSnapshot(_Record):
+    """ product with all of its entities, (time) is the epoch time the snapshot is taken """
+    __slots__ = ('productId', 'productName', 'buildId', 'time', 'entities')
+
+    def entity(self, entityId: str)->EntitySnapshot:
+        """ entity of id (entityId) """
+        for e in self.entities:
+            if e.id == entityId:
+                return e
+        raise KeyError(entityId)
+
+    # serialization
+    def to_json(self)->str:
+        return json.dumps(_toTree(self), separators=(',', ':'))
+
+    @staticmethod
+    def from_json(s: str)->'ProductSnapshot':
+        return _fromTree(json.loads(s))
+
+    def to_bytes(self)->bytes:
+        out = [_MAGIC]
+        _pack(_toTree(self), out)
+        return b''.join(out)
+
+    @staticmethod
+    def from_bytes(b: bytes)->'ProductSnapshot':
+        if not b.startswith(_MAGIC):
+            raise ValueError("not a license snapshot")
+        tree, _ = _unpack(b, len(_MAGIC))
+        return _fromTree(tree)
+
+
+#------------------ sweep -------------------------
+def take()->ProductSnapshot:
+    """ collect snapshot of the whole product, all handles used are closed on return """
+    handles = []
+    try:
+        now = time.time()
+        entities = []
+        for i in range(_intf.gsGetEntityCount()):
+            hEntity = _intf.gsOpenEntityByIndex(i)
+            if hEntity is None:
+                continue
+            handles.append(hEntity)
+
+            attributes = _intf.gsGetEntityAttributes(hEntity)
+            hLic = _intf.gsOpenLicense(hEntity)
+            lic = None
+            if hLic is not None:
+                handles.append(hLic)
+                lic = _takeLicense(hLic, attributes, handles)
+
+            entities.append(EntitySnapshot(
+                pchar2str(_intf.gsGetEntityId(hEntity)),
+                pchar2str(_intf.gsGetEntityName(hEntity)),
+                pchar2str(_intf.gsGetEntityDescription(hEntity)),
+                attributes, lic))
+
+        return ProductSnapshot(
+            pchar2str(_intf.gsGetProductId()),
+            pchar2str(_intf.gsGetProductName()),
+            _intf.gsGetBuildId(),
+            int(now),
+            tuple(entities))
+    finally:
+        for h in reversed(handles):
+            _intf.gsCloseHandle(h)
+
+def _takeLicense(hLic, attributes: int, handles: list)->LicenseSnapshot:
+    params = []
+    for i in range(_intf.gsGetLicenseParamCount(hLic)):
+        hVar = _intf.gsGetLicenseParamByIndex(hLic, i)
+        if hVar is None:
+            continue
+        handles.append(hVar)
+
+        typ = _intf.gsGetVariableType(hVar)
+        value = None
+        if _intf.gsIsVariableValid(hVar):
+            value = _readRaw(hVar, typ)
+            if value is _NOVALUE:
+                value = None
+        params.append(ParamSnapshot(pchar2str(_intf.gsGetVariableName(hVar)), typ, value))
+
+    licId = pchar2str(_intf.gsGetLicenseId(hLic))
+    secondsLeft, timesLeft, expireDate = _derive(licId, { p.name: p.value for p in params }, attributes)
+    return LicenseSnapshot(licId, _intf.gsGetLicenseStatus(hLic), _intf.gsIsLicenseValid(hLic), tuple(params),
+                           secondsLeft, timesLeft, expireDate)
+
+def _derive(licId: str, p: dict, attributes: int):
+    """ (secondsLeft, timesLeft, expireDate) of license model (licId) with parameters (p), by its inspector """
+    try:
+        isp = inspectorOf(LicenseId(licId), { k: _epoch(v) if isinstance(v, datetime) else v for k, v in p.items() })
+    except (ValueError, KeyError, TypeError, SdkError):
+        return None, None, None # unknown license model, or parameters not set
+
+    secondsLeft = _derived(isp, 'secondsLeft')
+    timesLeft = _derived(isp, 'timesLeft')
+    # a session only expires while being accessed
+    expireDate = _derived(isp, 'expireDate') if licId != LicenseId.TRIAL_SESSION.value or attributes & 4 else None
+    return secondsLeft, timesLeft, expireDate
+
+def _derived(isp, name: str):
+    """ value (name) derived by inspector (isp), None if not applicable or parameters are not set """
+    try:
+        return getattr(isp, name, None)
+    except (KeyError, TypeError, SdkError):
+        return None
+
+def _epoch(t: datetime)->int:
+    return int((t - datetime(1970, 1, 1)).total_seconds())
+
+
+#------------------ serialization -------------------------
+_MAGIC = b'GSS1'
+
+def _toTree(x):
+    ''' records => nested lists of plain values, datetime => {'t': epoch} '''
+    if isinstance(x, _Record):
+        return [ _toTree(v) for v in x._values() ]
+    if isinstance(x, tuple):
+        return [ _toTree(v) for v in x ]
+    if isinstance(x, datetime):
+        return { 't': _epoch(x) }
+    return x
+
+def _fromTime(v):
+    return None if v is None else datetime.utcfromtimestamp(v['t'])
+
+def _fromTree(t)->ProductSnapshot:
+    entities = []
+    for e in t[4]:
+        lic = e[4]
+        if lic is not None:
+            params = tuple(ParamSnapshot(n, typ, _fromTime(v) if typ == _VarType.TIME else v) for n, typ, v in lic[3])
+            lic = LicenseSnapshot(lic[0], lic[1], lic[2], params, lic[4], lic[5], _fromTime(lic[6]))
+        entities.append(EntitySnapshot(e[0], e[1], e[2], e[3], lic))
+    return ProductSnapshot(t[0], t[1], t[2], t[3], tuple(entities))
+
+# binary tags, integers / lengths are zigzag / unsigned varints
+_NONE, _TRUE, _FALSE, _INT, _FLOAT, _STR, _LIST, _TIME = b'NTFidslt'
+
+def _varint(n: int)->bytes:
+    out = bytearray()
+    while n > 0x7f:
+        out.append(n & 0x7f | 0x80)
+        n >>= 7
+    out.append(n)
+    return bytes(out)
+
+def _zigzag(n: int)->bytes:
+    return _varint(n << 1 if n >= 0 else (-n << 1) - 1)
+
+def _readVarint(b: bytes, pos: int):
+    n = shift = 0
+    while True:
+        x = b[pos]
+        pos += 1
+        n |= (x & 0x7f) << shift
+        if x < 0x80:
+            return n, pos
+        shift += 7
+
+def _readZigzag(b: bytes, pos: int):
+    n, pos = _readVarint(b, pos)
+    return (n >> 1) ^ -(n & 1), pos
+
+def _pack(x, out: list):
+    if x is None:
+        out.append(b'N')
+    elif x is True:
+        out.append(b'T')
+    elif x is False:
+        out.append(b'F')
+    elif isinstance(x, int):
+        out.append(b'i')
+        out.append(_zigzag(x))
+    elif isinstance(x, float):
+        out.append(struct.pack('<cd', b'd', x))
+    elif isinstance(x, str):
+        b = x.encode('utf-8')
+        out.append(b's')
+        out.append(_varint(len(b)))
+        out.append(b)
+    elif isinstance(x, dict):
+        out.append(b't')
+        out.append(_zigzag(x['t']))
+    else:
+        out.append(b'l')
+        out.append(_varint(len(x)))
+        for v in x:
+            _pack(v, out)
+
+def _unpack(b: bytes, pos: int):
+    tag = b[pos]
+    pos += 1
+    if tag == _NONE:
+        return None, pos
+    if tag == _TRUE:
+        return True, pos
+    if tag == _FALSE:
+        return False, pos
+    if tag == _INT:
+        return _readZigzag(b, pos)
+    if tag == _FLOAT:
+        return struct.unpack_from('<d', b, pos)[0], pos + 8
+    if tag == _TIME:
+        t, pos = _readZigzag(b, pos)
+        return { 't': t }, pos
+    if tag == _STR:
+        n, pos = _readVarint(b, pos)
+        return b[pos:pos + n].decode('utf-8'), pos + n
+    if tag == _LIST:
+        n, pos = _readVarint(b, pos)
+        items = []
+        for _ in range(n):
+            v, pos = _unpack(b, pos)
+            items.append(v)
+        return items, pos
+    raise ValueError(f"corrupted snapshot at offset {pos - 1}")
@@ -0,0 +1,119 @@
+"""
+Flushing of persistent license storage
+
+By default persisting writes to persistent variables is left to the sdk core. Writes can be grouped with
+Core.batch(), which flushes once when the outermost block of the calling thread exits, or handed to a
+write-behind policy (Core.enableWriteBehind()) flushing dirty variables in the background on an interval or
+as soon as a number of writes is pending.
+
+A batch defers flushes of the thread it is open in only, writes of other threads follow their own policy.
+"""
+
+from . import intf as _intf
+
+import logging
+import threading
+from contextlib import contextmanager
+
+
+class _State:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = 0        # writes to persistent variables since last flush
+        self.dirty = set()      # names of persistent variables written since last flush
+        self.writeBehind = None # WriteBehind policy in use
+        self.flushes = 0        # number of flushes issued
+
+state = _State()
+_local = threading.local() # depth: nested batch() blocks of a thread
+
+def _depth()->int:
+    return getattr(_local, 'depth', 0)
+
+
+def flush():
+    """ flush license storage """
+    with state.lock:
+        state.pending = 0
+        state.dirty.clear()
+        state.flushes += 1
+    _intf.gsFlush()
+
+def onWrite(var):
+    """ a persistent variable (var) has been written """
+    s = state
+    wb = s.writeBehind
+    depth = _depth()
+    if wb is None and depth == 0:
+        return # persisted by the sdk core
+
+    with s.lock:
+        s.pending += 1
+        s.dirty.add(var.name)
+        due = depth == 0 and s.pending >= wb.maxDirty
+
+    if due:
+        flush()
+
+@contextmanager
+def batch():
+    """ defer flushing until the outermost block of the calling thread exits """
+    _local.depth = _depth() + 1
+    try:
+        yield
+    finally:
+        _local.depth -= 1
+        if _local.depth == 0:
+            with state.lock:
+                due = state.pending > 0
+            if due:
+                flush()
+
+
+class WriteBehind:
+    """ flushes pending writes every (interval) seconds, or once (maxDirty) writes are pending """
+    def __init__(self, interval: float = 1.0, maxDirty: int = 100):
+        self.interval = interval
+        self.maxDirty = maxDirty
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="gs-write-behind", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        """ stop flushing in background, pending writes are flushed """
+        self._stop.set()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join()
+        with state.lock:
+            due = state.pending > 0
+        if due:
+            flush()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self._tick()
+            except Exception:
+                logging.exception("write-behind flush failure")
+
+    def _tick(self):
+        """ flush pending writes unless a batch is open in the calling thread """
+        if _depth():
+            return
+        with state.lock:
+            due = state.pending > 0
+        if due:
+            flush()
+
+def enableWriteBehind(interval: float = 1.0, maxDirty: int = 100):
+    disableWriteBehind()
+    wb = WriteBehind(interval, maxDirty)
+    state.writeBehind = wb
+    wb.start()
+
+def disableWriteBehind():
+    wb, state.writeBehind = state.writeBehind, None
+    if wb is not None:
+        wb.stop()
@@ -0,0 +1,289 @@
+"""
+Operation tracing
+
+Spans tie sdk api (FFI) calls to the high-level operation causing them. A span records its name, attributes
+(entity id, license id, action id...), wall time and the number / duration of api calls made by the thread
+while it is the innermost open span; spans opened inside another span are its children.
+
+Tracing is off by default, traced operations then cost a flag test. Finished spans are handed to sinks:
+
+    ring = gs.trace.RingSink(1000)
+    gs.trace.enable(ring, gs.trace.JsonLinesSink("trace.jsonl"))
+    ...
+    for s in ring.spans:
+        print(s.name, s.attrs, s.duration, s.ffiCalls)
+
+Custom operations are traced by span() or traced():
+
+    with gs.trace.span("activate", serial=sn) as s:
+        ...
+"""
+
+from .util import SdkError
+
+import functools
+import itertools
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+
+enabled = False
+
+_sinks = []
+_local = threading.local()
+_ids = itertools.count(1)
+_lock = threading.Lock()
+
+
+class Span:
+    """ a traced operation """
+    __slots__ = ('name', 'attrs', 'id', 'parent', 'thread', 'start', 'duration', 'error',
+                 'ffiCalls', 'ffiTime', 'ffi', '_t0', '_ext')
+
+    def __init__(self, name: str, attrs: dict, parent):
+        self.name = name
+        self.attrs = attrs
+        self.id = next(_ids)
+        self.parent = parent        # enclosing span (current span once entered), None for a root span
+        self.thread = threading.current_thread().name
+        self.start = time.time()    # epoch seconds
+        self.duration = None        # seconds, None while open
+        self.error = None           # repr of the exception ending the span
+        self.ffiCalls = 0           # api calls made directly within this span (not by children)
+        self.ffiTime = 0.0
+        self.ffi = {}               # api name => [calls, seconds]
+        self._t0 = time.perf_counter()
+        self._ext = None            # sink private data
+
+    def __repr__(self):
+        return f"Span({self.name}, {self.attrs}, duration={self.duration}, ffiCalls={self.ffiCalls})"
+
+    def set(self, **attrs):
+        """ add attributes """
+        self.attrs.update(attrs)
+
+    def to_dict(self)->dict:
+        return {
+            'name': self.name,
+            'id': self.id,
+            'parent': None if self.parent is None else self.parent.id,
+            'thread': self.thread,
+            'start': self.start,
+            'duration': self.duration,
+            'attrs': self.attrs,
+            'error': self.error,
+            'ffiCalls': self.ffiCalls,
+            'ffiTime': self.ffiTime,
+            'ffi': { k: { 'calls': v[0], 'time': v[1] } for k, v in self.ffi.items() },
+        }
+
+    # context manager
+    def __enter__(self):
+        self.parent = getattr(_local, 'span', None)
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        for sink in _sinks:
+            try:
+                sink.start(self)
+            except Exception:
+                logging.exception("trace sink failure (%s)", sink)
+        _local.span = self
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._t0
+        if exc is not None:
+            self.error = repr(exc)
+        _local.span = self.parent
+        for sink in _sinks:
+            try:
+                sink.end(self)
+            except Exception:
+                logging.exception("trace sink failure (%s)", sink)
+
+
+class _NoSpan:
+    """ span used while tracing is off """
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+_NOSPAN = _NoSpan()
+
+
+def current()->Span:
+    """ innermost open span of calling thread, None if none """
+    return getattr(_local, 'span', None)
+
+def span(name: str, **attrs):
+    """ new span (a context manager), once entered the current span of calling thread, child of the previous one """
+    if not enabled:
+        return _NOSPAN
+    return Span(name, attrs, None)
+
+def traced(name: str, attrs=None):
+    """
+    decorator tracing calls of a function as span (name)
+
+    attrs: optional attrs(*args, **kwargs) returning attributes of the span, only called when tracing is on
+    """
+    def deco(f):
+        @functools.wraps(f)
+        def new_f(*args, **kwargs):
+            if not enabled:
+                return f(*args, **kwargs)
+            with span(name, **(attrs(*args, **kwargs) if attrs else {})):
+                return f(*args, **kwargs)
+        return new_f
+    return deco
+
+
+def wrap(name: str, f):
+    """ wrap api (name) implemented by (f) to account its calls to the current span """
+    perf_counter = time.perf_counter
+
+    def call(*args):
+        s = getattr(_local, 'span', None)
+        if s is None:
+            return f(*args)
+        t = perf_counter()
+        try:
+            return f(*args)
+        finally:
+            dt = perf_counter() - t
+            s.ffiCalls += 1
+            s.ffiTime += dt
+            st = s.ffi.get(name)
+            if st is None:
+                s.ffi[name] = [1, dt]
+            else:
+                st[0] += 1
+                st[1] += dt
+
+    call.__name__ = name
+    call.__wrapped__ = f
+    return call
+
+
+def enable(*sinks):
+    """ start tracing, finished spans are sent to (sinks) in addition to sinks already added """
+    global enabled
+    from .intf import _clearResolved
+    with _lock:
+        for sink in sinks:
+            if sink not in _sinks:
+                _sinks.append(sink)
+        enabled = True
+    _clearResolved() # apis are wrapped on next use
+
+def disable():
+    """ stop tracing and remove all sinks """
+    global enabled
+    from .intf import _clearResolved
+    with _lock:
+        enabled = False
+        sinks = list(_sinks)
+        _sinks.clear()
+    _clearResolved()
+    for sink in sinks:
+        sink.close()
+
+def addSink(sink):
+    with _lock:
+        if sink not in _sinks:
+            _sinks.append(sink)
+
+def removeSink(sink):
+    with _lock:
+        if sink in _sinks:
+            _sinks.remove(sink)
+
+
+#------------------ Sinks -------------------------
+class Sink:
+    """ receives spans """
+    def start(self, span: Span):
+        """ span opened """
+
+    def end(self, span: Span):
+        """ span finished """
+
+    def close(self):
+        """ sink removed """
+
+
+class RingSink(Sink):
+    """ keeps the last (size) finished spans in memory """
+    def __init__(self, size: int = 1000):
+        self._spans = deque(maxlen=size)
+
+    def end(self, span: Span):
+        self._spans.append(span)
+
+    @property
+    def spans(self)->list:
+        """ finished spans, oldest first """
+        return list(self._spans)
+
+    def clear(self):
+        self._spans.clear()
+
+
+class JsonLinesSink(Sink):
+    """ appends finished spans to file (path), one json object per line """
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def end(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line + "\n")
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            f, self._file = self._file, None
+        if f is not None:
+            f.close()
+
+
+class OpenTelemetrySink(Sink):
+    """ re-emits spans through an OpenTelemetry tracer, requires package opentelemetry-api """
+    def __init__(self, tracer=None):
+        try:
+            from opentelemetry import trace as otel
+        except ImportError:
+            raise SdkError("OpenTelemetrySink requires package (opentelemetry-api)") from None
+        self._otel = otel
+        self._tracer = tracer if tracer is not None else otel.get_tracer("gs")
+
+    def start(self, span: Span):
+        parent = span.parent
+        context = None
+        if parent is not None and parent._ext is not None:
+            context = self._otel.set_span_in_context(parent._ext)
+        span._ext = self._tracer.start_span(span.name, context=context, start_time=int(span.start * 1e9))
+
+    def end(self, span: Span):
+        o = span._ext
+        if o is None:
+            return
+        for k, v in span.attrs.items():
+            o.set_attribute(f"gs.{k}", v if isinstance(v, (str, bool, int, float)) else str(v))
+        o.set_attribute("gs.ffi.calls", span.ffiCalls)
+        o.set_attribute("gs.ffi.time", span.ffiTime)
+        if span.error is not None:
+            o.set_status(self._otel.Status(self._otel.StatusCode.ERROR, span.error))
+        o.end(end_time=int((span.start + span.duration) * 1e9))
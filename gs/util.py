@@ -1,7 +1,7 @@
 """ Utility Helpers """
 
 from ctypes import c_char_p
-from .intf import gsCloseHandle
+from . import handles as _handles
 
 def mustbe(vtype, vname, v):
     """ make sure correct variable type """
@@ -27,24 +27,47 @@ class one_call:
 class once:
     """ class instance function decorator to cache result of the first call 
 
+        The result is stored in the instance itself, so it is released together with the instance.
         WARN: it should not be used for plain function or @staticmethod/@classmethod, uses 'one_call' for best performance 
     """
     def __init__(self, f):
-        self._cache = {}
         self._f = f
+        self._key = f"_once_{f.__name__}"
     
     def __call__(self, *args):
         # the first element of args should be object instance
-        inst = args[0]
+        d = args[0].__dict__
         try:
-            return self._cache[inst]
+            return d[self._key]
         except KeyError:
-            v= self._cache[inst] = self._f(*args)
+            v = d[self._key] = self._f(*args)
             return v
-            
 
+class cached_property:
+    """ class instance property decorator to cache result of the first access
 
+        The result is stored in the instance's __dict__ under the property name, so later reads are plain
+        attribute lookups and the cached value is released together with the instance.
+    """
+    def __init__(self, f):
+        self._f = f
+        self._name = f.__name__
+        self.__doc__ = f.__doc__
+
+    def __set_name__(self, owner, name):
+        self._name = name
 
+    def __get__(self, inst, owner=None):
+        if inst is None:
+            return self
+        v = inst.__dict__[self._name] = self._f(inst)
+        return v
+
+def uncache(inst, *names):
+    """ drop cached properties of an instance so that they are evaluated again on next access """
+    d = inst.__dict__
+    for name in names:
+        d.pop(name, None)
 
 
 def str2pchar(v):
@@ -61,13 +84,35 @@ def pchar2str(pstr):
 class SdkError(RuntimeError):pass
 
 class HObject:
-    """ Wrapper Object with handle from sdk core """
+    """
+    Wrapper Object with handle from sdk core
+
+    The handle is closed by close() or on exit of a with block, otherwise once the object is garbage collected.
+    """
+    _finalizer = None
+
     def __init__(self, handle):
         if handle is None:
             raise SdkError("SDK Object's handle cannot be empty!")
         self._handle = handle
-    def __del__(self):
-        gsCloseHandle(self._handle)
+        self._finalizer = _handles.track(self)
+
+    def close(self):
+        """ close handle now, the object cannot be used afterwards """
+        fin = self._finalizer
+        if fin is not None:
+            fin()
+        self._handle = None
+
+    @property
+    def closed(self)->bool:
+        return getattr(self, '_handle', None) is None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
 
     @property
     def handle(self):
@@ -1,9 +1,15 @@
 
 from . import intf as _intf
-from .util import SdkError, HObject, once, pchar2str, str2pchar, mustbe
+from . import cache as _cache
+from . import storage as _storage
+from .util import SdkError, HObject, cached_property, pchar2str, str2pchar, mustbe
 
 import ctypes
 import logging
+import threading
+import weakref
+from collections import OrderedDict
+from collections.abc import Mapping
 from datetime import datetime
 
 from enum import IntEnum, IntFlag
@@ -23,124 +29,219 @@ class _VarType(IntEnum):
     STRING = 20 # ansi-string
     TIME = 30   # datetime
 
+# returned by readers if value cannot be read
+_NOVALUE = object()
+
+# epoch of TIME variables
+_EPOCH = datetime(1970, 1, 1)
+
+
+class _Buffers:
+    """ output buffers of value readers, one set per thread """
+    def __init__(self):
+        self.i32 = ctypes.c_int()
+        self.i64 = ctypes.c_int64()
+        self.f32 = ctypes.c_float()
+        self.f64 = ctypes.c_double()
+        self.u64 = ctypes.c_uint64()
+        self.pi32 = ctypes.byref(self.i32)
+        self.pi64 = ctypes.byref(self.i64)
+        self.pf32 = ctypes.byref(self.f32)
+        self.pf64 = ctypes.byref(self.f64)
+        self.pu64 = ctypes.byref(self.u64)
+
+_tls = threading.local()
+
+def _buffers()->_Buffers:
+    try:
+        return _tls.buffers
+    except AttributeError:
+        b = _tls.buffers = _Buffers()
+        return b
+
+# readers: handle => value / _NOVALUE
+def _readBool(handle):
+    b = _buffers()
+    return b.i32.value != 0 if _intf.gsGetVariableValueAsInt(handle, b.pi32) else _NOVALUE
+
+def _readInt(handle):
+    b = _buffers()
+    return b.i32.value if _intf.gsGetVariableValueAsInt(handle, b.pi32) else _NOVALUE
+
+def _readInt64(handle):
+    b = _buffers()
+    return b.i64.value if _intf.gsGetVariableValueAsInt64(handle, b.pi64) else _NOVALUE
+
+def _readFloat(handle):
+    b = _buffers()
+    return b.f32.value if _intf.gsGetVariableValueAsFloat(handle, b.pf32) else _NOVALUE
+
+def _readDouble(handle):
+    b = _buffers()
+    return b.f64.value if _intf.gsGetVariableValueAsDouble(handle, b.pf64) else _NOVALUE
+
+def _readString(handle):
+    return pchar2str(_intf.gsGetVariableValueAsString(handle))
+
+def _readEpoch(handle):
+    b = _buffers()
+    return b.u64.value if _intf.gsGetVariableValueAsTime(handle, b.pu64) else _NOVALUE
+
+def _readTime(handle):
+    b = _buffers()
+    return datetime.utcfromtimestamp(b.u64.value) if _intf.gsGetVariableValueAsTime(handle, b.pu64) else _NOVALUE
+
+_READERS = {
+    _VarType.BOOL: _readBool,
+    _VarType.INT: _readInt,
+    _VarType.UINT: _readInt64,
+    _VarType.INT64: _readInt64,
+    _VarType.FLOAT: _readFloat,
+    _VarType.DOUBLE: _readDouble,
+    _VarType.STRING: _readString,
+    _VarType.TIME: _readTime,
+}
+
+# writers: (handle, value) => succeeded?
+def _writeBool(handle, v):
+    mustbe(bool, 'v', v)
+    return _intf.gsSetVariableValueFromInt(handle, 1 if v else 0)
+
+def _writeInt(handle, v):
+    mustbe(int, 'v', v)
+    return _intf.gsSetVariableValueFromInt(handle, v)
+
+def _writeInt64(handle, v):
+    mustbe(int, 'v', v)
+    return _intf.gsSetVariableValueFromInt64(handle, v)
+
+def _writeFloat(handle, v):
+    mustbe(float, 'v', v)
+    return _intf.gsSetVariableValueFromFloat(handle, v)
+
+def _writeDouble(handle, v):
+    mustbe(float, 'v', v)
+    return _intf.gsSetVariableValueFromDouble(handle, v)
+
+def _writeString(handle, v):
+    mustbe(str, 'v', v)
+    return _intf.gsSetVariableValueFromString(handle, str2pchar(v))
+
+def _writeEpoch(handle, v):
+    mustbe(int, 'v', v)
+    if v < 0:
+        # TIME values are unsigned, a negative value would wrap around
+        raise SdkError(f"time ({v}) before epoch (1970-01-01) not supported")
+    return _intf.gsSetVariableValueFromTime(handle, v)
+
+def _writeTime(handle, v):
+    mustbe(datetime, 'v', v)
+    # 3.x:
+    # timestamp = int(v.timestamp()+0.5)
+    return _writeEpoch(handle, int((v - _EPOCH).total_seconds()))
+
+_WRITERS = {
+    _VarType.BOOL: _writeBool,
+    _VarType.INT: _writeInt,
+    _VarType.UINT: _writeInt64,
+    _VarType.INT64: _writeInt64,
+    _VarType.FLOAT: _writeFloat,
+    _VarType.DOUBLE: _writeDouble,
+    _VarType.STRING: _writeString,
+    _VarType.TIME: _writeTime,
+}
+
+def _readRaw(handle, typ: _VarType)->any:
+    """ read value of variable (handle) of type (typ), returns _NOVALUE on failure """
+    reader = _READERS.get(typ)
+    return _NOVALUE if reader is None else reader(handle)
+
 
 class Variable(HObject):
     """
     User defined variable (UDV)
+
+    The value reader / writer is chosen once by variable type when the variable is created.
     """
     def __init__(self, handle):
         super().__init__(handle)
 
-        typ = _intf.gsGetVariableType(handle)
-        typstr = pchar2str(_intf.gsVariableTypeToString(typ))
-        logging.debug(f"typename: ({typstr})")
-
         self._type = _VarType(_intf.gsGetVariableType(handle))
         self._attr = _VarAttr(_intf.gsGetVariableAttr(handle))
+        self._readable = self._attr & _VarAttr.READ != 0
+        self._writable = self._attr & _VarAttr.WRITE != 0
+        self._persistent = self._attr & _VarAttr.PERSISTENT != 0
+        self._read = _READERS[self._type]
+        self._write = _WRITERS[self._type]
+
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug("typename: (%s)", pchar2str(_intf.gsVariableTypeToString(self._type)))
     
     def __repr__(self):
         vstr = "N/A" if not self.valid else self.value
         return f"{self.name} => {vstr}"
 
-    @property
-    @once
+    @cached_property
     def name(self)->str:
         return pchar2str(_intf.gsGetVariableName(self._handle))
         
     @property
     def value(self)->any:
-        if self._attr & _VarAttr.READ == 0:
+        if _cache.state.enabled:
+            return _cache.get(self, '_cachedValue', self._readValue)
+        return self._readValue()
+
+    def _readValue(self):
+        if not self._readable:
             raise SdkError(f"variable ({self.name}) not readable")
         if not self.valid:
             raise SdkError(f"variable ({self.name}) does not hold a valid value")
 
-        if self._type == _VarType.BOOL:
-            v = ctypes.c_int()
-            if _intf.gsGetVariableValueAsInt(self._handle, ctypes.byref(v)):
-                return v.value != 0
-        # int
-        if self._type == _VarType.INT:
-            v = ctypes.c_int()
-            if _intf.gsGetVariableValueAsInt(self._handle, ctypes.byref(v)):
-                return v.value
-        
-        if self._type == _VarType.INT64 or self._type == _VarType.UINT:
-            v = ctypes.c_int64()
-            if _intf.gsGetVariableValueAsInt64(self._handle, ctypes.byref(v)):
-                return v.value
-        
-        if self._type == _VarType.FLOAT:
-            v = ctypes.c_float()
-            if _intf.gsGetVariableValueAsFloat(self._handle, ctypes.byref(v)):
-                return v.value
-        
-        if self._type == _VarType.DOUBLE:
-            v = ctypes.c_double()
-            if _intf.gsGetVariableValueAsDouble(self._handle, ctypes.byref(v)):
-                return v.value
-        
-        # string
-        if self._type == _VarType.STRING:
-            return pchar2str(_intf.gsGetVariableValueAsString(self._handle))
-
-        # time
-        if self._type == _VarType.TIME:
-            v = ctypes.c_int64()
-            if _intf.gsGetVariableValueAsInt64(self._handle, ctypes.byref(v)):
-                return datetime.utcfromtimestamp(v.value)
-
-        raise SdkError(f"Unsupported variable type, name ({self.name})")
+        v = self._read(self._handle)
+        if v is _NOVALUE:
+            raise SdkError(f"Unsupported variable type, name ({self.name})")
+        return v
 
     @value.setter
     def value(self, v: any):
-        if self._attr & _VarAttr.WRITE == 0:
+        if not self._writable:
             raise SdkError(f"variable ({self.name}) not writable")
 
-        def raiseError():
+        if not self._write(self._handle, v):
             raise SdkError(f"variable ({self.name}) set failure")
 
-        if self._type == _VarType.BOOL:
-            mustbe(bool, 'v', v)
-            if not _intf.gsSetVariableValueFromInt(self._handle, 1 if v else 0):
-                raiseError()
-        # int
-        elif self._type == _VarType.INT:
-            mustbe(int, 'v', v)
-            if not _intf.gsSetVariableValueFromInt(self._handle, ctypes.c_int(v)):
-                raiseError()
-        
-        elif self._type == _VarType.INT64 or self._type == _VarType.UINT:
-            mustbe(int, 'v', v)
-            if not _intf.gsSetVariableValueFromInt64(self._handle, ctypes.c_int64(v)):
-                raiseError()
-        
-        elif self._type == _VarType.FLOAT:
-            mustbe(float, 'v', v)
-            if not _intf.gsSetVariableValueFromFloat(self._handle, ctypes.c_float(v)):
-                raiseError()
-        
-        elif self._type == _VarType.DOUBLE:
-            mustbe(float, 'v', v)
-            if not _intf.gsSetVariableValueFromDouble(self._handle, ctypes.c_double(v)):
-                raiseError()
-        
-        # string
-        elif self._type == _VarType.STRING:
-            mustbe(str, 'v', v)
-            if not _intf.gsSetVariableValueFromString(self._handle, str2pchar(v)):
-                raiseError()
-
-        # time
-        elif self._type == _VarType.TIME:
-            mustbe(datetime, 'v', v)
-            # 3.x:
-            # timestamp = int(v.timestamp()+0.5)
-            timestamp = int((v - datetime(1970, 1, 1)).total_seconds())
-            if not _intf.gsSetVariableValueFromInt64(self._handle, ctypes.c_int64(timestamp)):
-                raiseError()
-
-        else:
-            raise SdkError(f"Unsupported variable type, name ({self.name})")
+        _cache.invalidate()
+        if self._persistent:
+            _storage.onWrite(self)
+
+    @property
+    def value_epoch(self)->int:
+        """ value of TIME variable as epoch seconds, without building a datetime """
+        if self._type != _VarType.TIME:
+            raise SdkError(f"variable ({self.name}) is not a TIME variable")
+        if not self._readable:
+            raise SdkError(f"variable ({self.name}) not readable")
+        if not self.valid:
+            raise SdkError(f"variable ({self.name}) does not hold a valid value")
+
+        v = _readEpoch(self._handle)
+        if v is _NOVALUE:
+            raise SdkError(f"variable ({self.name}) read failure")
+        return v
+
+    @value_epoch.setter
+    def value_epoch(self, v: int):
+        if self._type != _VarType.TIME:
+            raise SdkError(f"variable ({self.name}) is not a TIME variable")
+        if not self._writable:
+            raise SdkError(f"variable ({self.name}) not writable")
+
+        if not _writeEpoch(self._handle, v):
+            raise SdkError(f"variable ({self.name}) set failure")
+
+        _cache.invalidate()
+        if self._persistent:
+            _storage.onWrite(self)
 
     @property
     def valid(self)->bool:
@@ -150,4 +251,114 @@ class Variable(HObject):
         some variable might not hold a valid value even the value itself looks valid. for example, if the variable holds a first-access timestamp of
         an app, its value won't be valid until the app is launched for the first time.
         """
-        return _intf.gsIsVariableValid(self._handle)
\ No newline at end of file
+        if _cache.state.enabled:
+            return _cache.get(self, '_cachedValid', self._readValid)
+        return _intf.gsIsVariableValid(self._handle)
+
+    def _readValid(self)->bool:
+        return _intf.gsIsVariableValid(self._handle)
+
+
+class Params(Mapping):
+    """
+    Parameters of a license / action by name
+
+    Only names are kept, a parameter's Variable is opened on access and closed once no longer referenced, so
+    long living owners do not pin a handle per parameter.
+    """
+    def __init__(self, handle, count, byIndex):
+        self._handle = handle
+        self._byIndex = byIndex
+        self._index = {} # name => index
+        for i in range(count(handle)):
+            var = Variable(byIndex(handle, i))
+            self._index[var.name] = i
+            var.close()
+        self._open = weakref.WeakValueDictionary() # name => Variable in use
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name: str)->Variable:
+        with self._lock:
+            var = self._open.get(name)
+            if var is None or var.closed:
+                var = Variable(self._byIndex(self._handle, self._index[name]))
+                self._open[name] = var
+            return var
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self)->int:
+        return len(self._index)
+
+    def __contains__(self, name)->bool:
+        return name in self._index
+
+
+class VariableRegistry:
+    """
+    Variables by name, each name is resolved from sdk core once and its Variable (handle, type and attributes)
+    is kept in a LRU cache of (maxsize) entries.
+
+    All cached variables are dropped when license actions are applied or the core is re-initialized.
+    """
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._vars = OrderedDict()
+        self._epoch = _cache.state.epoch
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name: str)->Variable:
+        with self._lock:
+            if self._epoch != _cache.state.epoch:
+                self._vars.clear()
+                self._epoch = _cache.state.epoch
+            try:
+                v = self._vars[name]
+                self._vars.move_to_end(name)
+                return v
+            except KeyError:
+                pass
+
+        h = _intf.gsGetVariable(str2pchar(name))
+        if h is None:
+            raise SdkError(f"variable ({name}) not found")
+        v = Variable(h)
+
+        with self._lock:
+            self._vars[name] = v
+            while len(self._vars) > self.maxsize:
+                self._vars.popitem(last=False)
+        return v
+
+    def __contains__(self, name: str)->bool:
+        try:
+            self[name]
+            return True
+        except SdkError:
+            return False
+
+    def __len__(self)->int:
+        """ number of cached variables """
+        return len(self._vars)
+
+    def get(self, name: str, default = None)->Variable:
+        """ variable of (name), or (default) if not defined """
+        try:
+            return self[name]
+        except SdkError:
+            return default
+
+    def get_many(self, names)->dict:
+        """ values of variables (names), name => value """
+        return { name: self[name].value for name in names }
+
+    def set_many(self, values: dict):
+        """ set values of variables, name => value """
+        for name, v in values.items():
+            self[name].value = v
+
+    def clear(self):
+        """ drop all cached variables """
+        with self._lock:
+            self._vars.clear()
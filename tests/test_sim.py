@@ -0,0 +1,1413 @@
+""" Tests of the python layer running on the simulated sdk core """
+
+import unittest
+from unittest import mock
+import asyncio
+import threading
+import time
+import gs
+import gs.intf
+from gs.intf.sim import SimCore, SimEntity, SimLicense
+from gs.lic import LicenseId
+from datetime import datetime, timedelta
+
+test_product = {
+    "buildId": 32,
+    "productId": "8fb82f54-ecf9-451c-9976-2344aefeaca4",
+    "productName": "Ne2_201908",
+}
+
+class FakeClock:
+    def __init__(self, t=1600000000):
+        self.t = t
+    def __call__(self):
+        return self.t
+
+def use_sim(self, **kwargs):
+    ''' switch to a fresh simulated core and initialize gs.Core on it '''
+    self.sim = SimCore(**kwargs)
+    gs.intf.use(self.sim)
+    self.assertTrue(gs.Core().init(self.sim.productId, "", ""))
+    self.addCleanup(gs.Core().cleanUp)
+
+
+class TestSimCore(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        use_sim(self, clock=self.clock)
+
+    def test_productInfo(self):
+        core = gs.Core()
+        self.assertEqual(core.productId, test_product['productId'])
+        self.assertEqual(core.productName, test_product['productName'])
+        self.assertEqual(core.buildId, test_product['buildId'])
+        self.assertEqual(core.lastErrorCode, 0)
+
+    def test_entity(self):
+        e0 = gs.Core().entities[0]
+        self.assertEqual(e0.name, "E1")
+        self.assertEqual(e0, gs.Core().getEntityById(e0.id))
+        self.assertTrue(e0.autoStart)
+        self.assertFalse(e0.accessing)
+        self.assertEqual(e0.accessible, e0.license.valid)
+
+        self.assertTrue(e0.beginAccess())
+        self.assertTrue(e0.accessing)
+        self.assertTrue(e0.endAccess())
+        self.assertFalse(e0.accessing)
+
+    def test_entity_status(self):
+        core = gs.Core()
+        e0 = core.entities[0]
+        s = e0.status()
+        self.assertEqual(s.accessible, e0.accessible)
+        self.assertEqual(s.valid, e0.license.valid)
+        self.assertEqual(s.licenseStatus, e0.license.status)
+        self.assertTrue(s.autoStart)
+        self.assertFalse(s.accessing)
+        with self.assertRaises(AttributeError):
+            s.valid = False
+
+        self.assertEqual(core.statusAll(), { e0.id: s })
+        e0.lock()
+        s = e0.status()
+        self.assertTrue(s.locked)
+        self.assertFalse(s.valid)
+        self.assertEqual(s.licenseStatus, gs.lic.LicenseStatus.LOCKED)
+
+    def test_entity_status_calls(self):
+        e0 = gs.Core().entities[0]
+        with mock.patch.object(self.sim, 'gsGetLicenseStatus') as status:
+            gs.intf._clearResolved()
+            self.addCleanup(gs.intf._clearResolved)
+            s = e0.status()
+        status.assert_not_called()
+        self.assertEqual(s.licenseStatus, gs.lic.LicenseStatus.ACTIVE)
+
+        # records differing in license status only are not equal
+        t = gs.EntityStatus(s.attributes, gs.lic.LicenseStatus.INVALID)
+        self.assertNotEqual(s, t)
+        self.assertEqual(len({ s, t }), 2)
+
+    def test_var(self):
+        core = gs.Core()
+        with self.assertRaises(gs.SdkError):
+            core.getVariable("level")
+
+        self.assertEqual(core.getVariable("age").value, 10)
+        self.assertEqual(core.getVariable("name").value, "randy")
+        self.assertEqual(core.getVariable("male").value, True)
+        self.assertEqual(core.getVariable("salary").value, 123.5)
+        self.assertEqual(str(core.getVariable("birthday").value), '2020-04-01 22:00:00')
+
+        age = core.getVariable("age")
+        age.value = 123
+        self.assertEqual(core.getVariable("age").value, 123)
+        with self.assertRaises(TypeError):
+            age.value = "123"
+
+        birthday = core.getVariable("birthday")
+        with self.assertRaises(gs.SdkError):
+            birthday.value = datetime(1969, 12, 31)
+        with self.assertRaises(gs.SdkError):
+            birthday.value_epoch = -1
+        self.assertEqual(str(birthday.value), '2020-04-01 22:00:00')
+        self.assertEqual(birthday.value_epoch, 1585778400)
+        birthday.value = datetime(2021, 1, 1)
+        self.assertEqual(birthday.value_epoch, 1609459200)
+        birthday.value_epoch = 1585778400
+        self.assertEqual(str(birthday.value), '2020-04-01 22:00:00')
+        with self.assertRaises(gs.SdkError):
+            age.value_epoch
+
+    def test_trial_period(self):
+        e0 = gs.Core().entities[0]
+        isp = e0.license.inspector
+        self.assertFalse(isp.used)
+
+        self.assertTrue(e0.beginAccess())
+        e0.endAccess()
+        self.assertTrue(isp.used)
+
+        self.clock.t += isp.expirePeriodInSeconds
+        self.assertFalse(e0.accessible)
+        self.assertTrue(e0.locked)
+        self.assertFalse(e0.beginAccess())
+
+    def test_activation(self):
+        core = gs.Core()
+        self.assertFalse(core.isValidSN('xxx-yyy-zzz'))
+        self.assertTrue(core.isValidSN('0875-BB91-4449-9DCE'))
+
+        self.assertTrue(core.applySN('0BD3-4F5C-4EB4-9EE9'))
+        self.assertTrue(core.isAllEntitiesUnlocked())
+        epoch = gs.cache.state.epoch
+        self.assertTrue(core.revokeSN('0BD3-4F5C-4EB4-9EE9'))
+        self.assertTrue(core.isAllEntitiesLocked())
+        self.assertGreater(gs.cache.state.epoch, epoch) # epoch keyed caches dropped
+
+        self.assertTrue(core.applyLicenseCode('TUVP-C9NM-PRRO-GH33-5KC3', '0BD3-4F5C-4EB4-9EE9'))
+        self.assertTrue(core.isAllEntitiesUnlocked())
+
+    def test_validate_serials(self):
+        core = gs.Core()
+        core.clearSerialCache()
+        self.sim.setLatency(0.05, 'gsIsSNValid')
+
+        serials = [' 0875-bb91-4449-9dce', '0875-BB91-4449-9DCE', 'xxx-yyy-zzz', '0000-0000-0000-0000', '0BD3-4F5C-4EB4-9EE9']
+        t = time.monotonic()
+        results = dict(core.validateSerials(serials, workers=4, format=r'[0-9A-F]{4}(-[0-9A-F]{4}){3}'))
+        self.assertLess(time.monotonic() - t, 0.15)
+        self.assertEqual(results, {
+            '0875-BB91-4449-9DCE': True,
+            'XXX-YYY-ZZZ': False,
+            '0000-0000-0000-0000': False,
+            '0BD3-4F5C-4EB4-9EE9': True,
+        })
+
+        # served from cache
+        t = time.monotonic()
+        self.assertEqual(dict(core.validateSerials(serials)), dict(results, **{ 'XXX-YYY-ZZZ': False }))
+        self.assertLess(time.monotonic() - t, 0.15)
+
+    def test_validate_serials_failures(self):
+        core = gs.Core()
+        core.clearSerialCache()
+        serials = ['0875-BB91-4449-9DCE', '0000-0000-0000-0000', 'any format']
+
+        # not cached while the server is down
+        self.sim.serverAlive = False
+        self.assertEqual(dict(core.validateSerials(serials)), dict.fromkeys([ s.upper() for s in serials ]))
+        self.sim.serverAlive = True
+        self.assertEqual(dict(core.validateSerials(serials)), {
+            '0875-BB91-4449-9DCE': True, '0000-0000-0000-0000': False, 'ANY FORMAT': False })
+
+        # a failing call is reported for its serial only
+        core.clearSerialCache()
+        core.enableHealthMonitor(ttl=60, failureThreshold=1)
+        self.addCleanup(core.disableHealthMonitor)
+        while core.health.stats['probes'] == 0: # background probe would close the circuit
+            time.sleep(0.001)
+        core.health.breaker.failure()
+        self.assertEqual(dict(core.validateSerials(serials[:1])), { '0875-BB91-4449-9DCE': None })
+
+        core.SN_CACHE_SIZE = 2
+        self.addCleanup(delattr, core, 'SN_CACHE_SIZE')
+        core.health.breaker.success()
+        list(core.validateSerials(serials))
+        self.assertEqual(len(core._snCache), 2)
+
+    def test_request(self):
+        core = gs.Core()
+        req = core.createRequest()
+        act = req.addAction(gs.ActionId.ACT_SET_EXPIRE_PERIOD, core.entities[0])
+        act.period = 1000
+        self.assertEqual(act.period, 1000)
+        with self.assertRaises(gs.SdkError):
+            req.addAction(gs.ActionId.ACT_ADD_ACCESSTIME, core.entities[0])
+
+        self.assertRegex(req.code, r'^(\w{4}-){4}\w{4}$')
+        self.assertNotEqual(core.unlockRequestCode, core.cleanRequestCode)
+
+    def test_events(self):
+        events = []
+
+        @gs.entity_access_started
+        @gs.entity_access_ended
+        def handler(e, event):
+            events.append((e.id, event))
+
+        e0 = gs.Core().entities[0]
+        e0.beginAccess()
+        e0.endAccess()
+        self.assertEqual(events, [(e0.id, gs.Event.EVENT_ENTITY_ACCESS_STARTED), (e0.id, gs.Event.EVENT_ENTITY_ACCESS_ENDED)])
+
+    def test_event_entity(self):
+        ''' event sources resolve to the entities enumerated by core '''
+        sources = []
+
+        @gs.entity_access_heartbeat
+        def ping(e, event):
+            sources.append(e)
+
+        e0 = gs.Core().entities[0]
+        e0.beginAccess()
+        self.sim.pulse()
+        self.sim.pulse()
+        e0.endAccess()
+        self.assertEqual(len(sources), 2)
+        self.assertIs(sources[0], e0)
+        self.assertIs(sources[1], e0)
+
+    def test_entity_index(self):
+        core = gs.Core()
+        e0 = core.entities[0]
+        self.assertIs(core.getEntityByName("E1"), e0)
+        self.assertIs(core.getEntityById(e0.id), e0)
+        with self.assertRaises(gs.SdkError):
+            core.getEntityByName("x1")
+
+
+class TestVariableRegistry(unittest.TestCase):
+    def setUp(self):
+        use_sim(self)
+
+    def test_registry(self):
+        core = gs.Core()
+        age = core.vars['age']
+        self.assertIs(core.vars['age'], age)
+        self.assertIn('name', core.vars)
+        self.assertNotIn('level', core.vars)
+        self.assertIsNone(core.vars.get('level'))
+        with self.assertRaises(gs.SdkError):
+            core.vars['level']
+
+        core.vars.set_many({'age': 20, 'name': 'janet'})
+        self.assertEqual(core.vars.get_many(['age', 'name']), {'age': 20, 'name': 'janet'})
+
+    def test_lru(self):
+        core = gs.Core()
+        core.vars.maxsize = 2
+        self.addCleanup(setattr, core.vars, 'maxsize', 256)
+        core.vars.clear()
+
+        age = core.vars['age']
+        core.vars['name']
+        core.vars['age']
+        core.vars['male'] # evicts 'name'
+        self.assertEqual(len(core.vars), 2)
+        self.assertIs(core.vars['age'], age)
+
+    def test_invalidate(self):
+        core = gs.Core()
+        age = core.vars['age']
+        self.sim.applyAction(gs.ActionId.ACT_UNLOCK)
+        self.assertIsNot(core.vars['age'], age)
+
+        age = core.vars['age']
+        core.cleanUp()
+        self.assertTrue(core.init(self.sim.productId, "", ""))
+        self.assertIsNot(core.vars['age'], age)
+
+
+class TestFlush(unittest.TestCase):
+    def setUp(self):
+        use_sim(self)
+
+    def test_flush(self):
+        gs.Core().flush()
+        self.assertEqual(self.sim.flushCount, 1)
+
+    def test_batch(self):
+        core = gs.Core()
+        with core.batch():
+            for i in range(10):
+                core.vars['age'].value = i
+                with core.batch():
+                    core.vars['name'].value = str(i)
+            self.assertEqual(self.sim.flushCount, 0)
+            self.assertEqual(core.dirtyVariables, {'age', 'name'})
+        self.assertEqual(self.sim.flushCount, 1)
+        self.assertEqual(core.dirtyVariables, frozenset())
+
+    def test_default(self):
+        # left to the sdk core, no flush per write
+        core = gs.Core()
+        core.vars['age'].value = 1
+        core.vars['name'].value = "bob"
+        self.assertEqual(self.sim.flushCount, 0)
+        self.assertEqual(core.dirtyVariables, frozenset())
+
+    def test_batch_thread(self):
+        # a batch defers flushes of its own thread only
+        core = gs.Core()
+        core.enableWriteBehind(interval=3600, maxDirty=1)
+        self.addCleanup(core.disableWriteBehind)
+        with core.batch():
+            core.vars['age'].value = 1
+            t = threading.Thread(target=lambda: setattr(core.vars['name'], 'value', "bob"))
+            t.start()
+            t.join()
+            self.assertEqual(self.sim.flushCount, 1)
+            core.vars['age'].value = 2
+            self.assertEqual(self.sim.flushCount, 1)
+        self.assertEqual(self.sim.flushCount, 2)
+
+    def test_write_behind(self):
+        core = gs.Core()
+        core.enableWriteBehind(interval=3600, maxDirty=5) # interval flush driven by hand
+        self.addCleanup(core.disableWriteBehind)
+
+        age = core.vars['age']
+        for i in range(5):
+            age.value = i
+        self.assertEqual(self.sim.flushCount, 1)
+
+        age.value = 10
+        self.assertEqual(self.sim.flushCount, 1)
+        wb = gs.storage.state.writeBehind
+        with core.batch():
+            wb._tick() # not within a batch
+        self.assertEqual(self.sim.flushCount, 2) # batch exit
+        age.value = 10
+        wb._tick()
+        self.assertEqual(self.sim.flushCount, 3)
+        wb._tick()
+        self.assertEqual(self.sim.flushCount, 3)
+
+        age.value = 11
+        core.disableWriteBehind()
+        self.assertEqual(self.sim.flushCount, 4)
+
+
+class TestSnapshot(unittest.TestCase):
+    def test_snapshot(self):
+        clock = FakeClock()
+        use_sim(self, clock=clock, entities=[
+            SimEntity("e-access", "access", license=SimLicense('gs.lm.expire.accessTime.1', maxAccessTimes=5)),
+            SimEntity("e-period", "period", license=SimLicense('gs.lm.expire.period.1', periodInSeconds=100)),
+            SimEntity("e-run", "run", license=SimLicense('gs.lm.alwaysRun.1')),
+        ])
+        core = gs.Core()
+        core.getEntityById("e-period").beginAccess()
+        n = self.sim.openHandles
+
+        snap = core.snapshot()
+        self.assertEqual(self.sim.openHandles, n)
+        self.assertEqual(snap.productId, test_product['productId'])
+        self.assertEqual([e.id for e in snap.entities], ["e-access", "e-period", "e-run"])
+
+        access = snap.entity("e-access")
+        self.assertEqual(access.license.id, LicenseId.TRIAL_ACCESS.value)
+        self.assertEqual(access.license.timesLeft, 5)
+        self.assertTrue(access.accessible)
+
+        period = snap.entity("e-period").license
+        self.assertTrue(period.valid)
+        self.assertTrue(period.secondsLeft <= 100)
+        self.assertEqual(period.expireDate, period.param('timeFirstAccess') + timedelta(seconds=100))
+
+        with self.assertRaises(AttributeError):
+            snap.buildId = 1
+
+        from gs.snapshot import ProductSnapshot
+        self.assertEqual(ProductSnapshot.from_bytes(snap.to_bytes()), snap)
+        self.assertEqual(ProductSnapshot.from_json(snap.to_json()), snap)
+        self.assertLess(len(snap.to_bytes()), len(snap.to_json()))
+
+    def test_snapshot_unset_params(self):
+        use_sim(self, entities=[
+            SimEntity("e-access", "access", license=SimLicense('gs.lm.expire.accessTime.1', maxAccessTimes=5)),
+            SimEntity("e-period", "period", license=SimLicense('gs.lm.expire.period.1', periodInSeconds=100)),
+        ])
+        from gs.snapshot import _derive
+        self.assertEqual(_derive(LicenseId.TRIAL_ACCESS.value, { 'maxAccessTimes': 5, 'usedTimes': None }, 0), (None, None, None))
+        self.assertEqual(_derive(LicenseId.TRIAL_HARDDATE.value, { 'timeEndEnabled': True, 'timeBeginEnabled': False, 'timeEnd': None }, 0), (None, None, None))
+        self.assertEqual(_derive(LicenseId.TRIAL_DURATION.value, {}, 0), (None, None, None))
+
+        lic = gs.Core().snapshot().entity("e-period").license
+        self.assertEqual(lic.secondsLeft, 100) # never accessed
+        self.assertIsNone(lic.expireDate)
+
+
+class TestStateCache(unittest.TestCase):
+    def setUp(self):
+        use_sim(self)
+        gs.Core().enableStateCache()
+        self.addCleanup(gs.Core().disableStateCache)
+
+    def test_cached_until_invalidated(self):
+        from gs.intf import sim
+        e0 = gs.Core().entities[0]
+        self.assertTrue(e0.accessible)
+        self.assertTrue(e0.license.valid)
+        self.assertEqual(e0.license.status, gs.lic.LicenseStatus.ACTIVE)
+
+        # changed behind sdk's back, no event
+        self.sim.entities[0].license.status = sim.LOCKED
+        self.assertTrue(e0.accessible)
+        self.assertTrue(e0.license.valid)
+
+        # action applied event
+        self.sim.applyAction(sim.ACT_UNLOCK)
+        self.assertTrue(e0.unlocked)
+        self.assertEqual(e0.license.status, gs.lic.LicenseStatus.UNLOCKED)
+
+        # local mutation
+        e0.lock()
+        self.assertTrue(e0.status().locked)
+        self.assertFalse(e0.license.valid)
+
+    def test_variable(self):
+        age = gs.Core().getVariable("age")
+        self.assertEqual(age.value, 10)
+        self.sim.variables["age"].value = 11
+        self.assertEqual(age.value, 10)
+        age.value = 12
+        self.assertEqual(age.value, 12)
+
+    def test_max_staleness(self):
+        gs.Core().enableStateCache(maxStaleness=0.01)
+        e0 = gs.Core().entities[0]
+        self.assertTrue(e0.accessible)
+        self.sim.entities[0].license.status = 0
+        self.assertTrue(e0.accessible)
+        time.sleep(0.02)
+        self.assertFalse(e0.accessible)
+
+
+class TestSimModels(unittest.TestCase):
+    def test_trial_models(self):
+        clock = FakeClock()
+        use_sim(self, clock=clock, entities=[
+            SimEntity("e-access", "access", license=SimLicense('gs.lm.expire.accessTime.1', maxAccessTimes=1)),
+            SimEntity("e-session", "session", license=SimLicense('gs.lm.expire.sessionTime.1', maxSessionTime=60)),
+            SimEntity("e-duration", "duration", license=SimLicense('gs.lm.expire.duration.1', maxDurationInSeconds=60)),
+            SimEntity("e-hardDate", "hardDate", license=SimLicense('gs.lm.expire.hardDate.1', timeEnd=clock.t + 60)),
+        ])
+        core = gs.Core()
+        ids = [ lic.id for lic in (e.license for e in core.entities) ]
+        self.assertEqual(ids, [LicenseId.TRIAL_ACCESS, LicenseId.TRIAL_SESSION, LicenseId.TRIAL_DURATION, LicenseId.TRIAL_HARDDATE])
+
+        for e in core.entities:
+            self.assertTrue(e.beginAccess())
+        self.assertEqual(core.getEntityById("e-access").license.inspector.timesLeft, 0)
+
+        clock.t += 61
+        for e in core.entities[1:]:
+            self.assertFalse(e.accessible, e.id)
+
+        for e in core.entities:
+            e.endAccess()
+        self.assertFalse(core.getEntityById("e-access").accessible)
+        # a new session starts over
+        self.assertTrue(core.getEntityById("e-session").accessible)
+
+
+class TestDispatcher(unittest.TestCase):
+    def setUp(self):
+        use_sim(self)
+        self.addCleanup(gs.monitor.disableDispatcher)
+        self.addCleanup(gs.monitor.clearListeners)
+
+    def test_dispatch(self):
+        main = threading.current_thread()
+        seen = []
+        release = threading.Event()
+
+        @gs.monitor.entity_access_starting
+        def starting(entity, event):
+            seen.append((event, threading.current_thread() is main))
+
+        @gs.monitor.entity_access_started
+        def started(entity, event):
+            release.wait(1)
+            seen.append((event, threading.current_thread() is main))
+
+        d = gs.monitor.enableDispatcher()
+        e = gs.Core().entities[0]
+        # slow listener does not hold up the core
+        self.assertTrue(e.beginAccess())
+        self.assertEqual(seen, [(gs.monitor.Event.EVENT_ENTITY_ACCESS_STARTING, True)])
+        release.set()
+        self.assertTrue(d.drain(1))
+        self.assertEqual(seen[1], (gs.monitor.Event.EVENT_ENTITY_ACCESS_STARTED, False))
+        self.assertEqual(d.stats['dispatched'], d.stats['queued'])
+
+    def test_put_after_stop(self):
+        HEARTBEAT = gs.monitor.Event.EVENT_ENTITY_ACCESS_HEARTBEAT
+        release = threading.Event()
+        pings = []
+        @gs.monitor.entity_access_heartbeat
+        def ping(entity, event):
+            release.wait(1)
+            pings.append(entity)
+
+        e = gs.Core().entities[0]
+        d = gs.monitor.Dispatcher(maxsize=1, overflow=gs.monitor.Dispatcher.BLOCK)
+        self.assertTrue(d.put(HEARTBEAT, e.handle)) # being dispatched
+        while d.stats['depth']:
+            time.sleep(0.001)
+        self.assertTrue(d.put(HEARTBEAT, e.handle)) # queue full
+
+        results = []
+        producer = threading.Thread(target=lambda: results.append(d.put(HEARTBEAT, e.handle)))
+        producer.start()
+        stopper = threading.Thread(target=d.stop)
+        stopper.start()
+        while d._running:
+            time.sleep(0.001)
+        release.set()
+        stopper.join()
+        producer.join()
+
+        # queued events are dispatched, the blocked one and later ones are refused
+        self.assertEqual(results, [False])
+        self.assertFalse(d.put(HEARTBEAT, e.handle))
+        self.assertEqual(pings, [e, e])
+
+    def test_event_out_of_range(self):
+        MAX = gs.monitor.Event.EVENT_ID_MAX
+        seen = []
+        def hook(eventId, hEvent):
+            seen.append(eventId)
+        gs.monitor.addHook(hook, [MAX])
+        self.addCleanup(gs.monitor.removeHook, hook)
+        for eventId in (-1, MAX + 1, MAX):
+            gs.monitor._handleEvent(eventId, None)
+        self.assertEqual(seen, [MAX])
+
+    def test_table(self):
+        HEARTBEAT = gs.monitor.Event.EVENT_ENTITY_ACCESS_HEARTBEAT
+        gs.monitor.clearListeners()
+        self.assertIsNone(gs.monitor._table[HEARTBEAT])
+
+        pings = []
+        @gs.monitor.entity_access_heartbeat
+        def ping(entity, event):
+            pings.append(entity)
+        self.assertEqual(gs.monitor._table[HEARTBEAT][2], (ping,))
+
+        gs.monitor.setDebug(True)
+        self.addCleanup(gs.monitor.setDebug, False)
+        e = gs.Core().entities[0]
+        e.beginAccess()
+        with self.assertLogs(level='DEBUG') as logs:
+            self.sim.pulse()
+        e.endAccess()
+        self.assertEqual(pings, [e])
+        self.assertIn("EVENT_ENTITY_ACCESS_HEARTBEAT", logs.output[0])
+
+    def test_rate_limit(self):
+        pings = []
+        @gs.monitor.entity_access_heartbeat(min_interval=0.05)
+        def ping(entity, event, suppressed):
+            pings.append(suppressed)
+
+        coalesced = []
+        @gs.monitor.entity_access_heartbeat(min_interval=0.05, coalesce=True)
+        def alive(entity, event, suppressed):
+            coalesced.append((entity, suppressed))
+
+        e = gs.Core().entities[0]
+        e.beginAccess()
+        for _ in range(5):
+            self.sim.pulse()
+        self.assertEqual(pings, [0])
+        self.assertEqual(coalesced, [(e, 0)])
+
+        # trailing event of the burst is delivered, by a single timer thread gone once idle
+        self.assertEqual([ t.name for t in threading.enumerate() if t.name == 'gs-coalesce' ], ['gs-coalesce'])
+        time.sleep(0.1)
+        self.assertEqual(coalesced, [(e, 0), (e, 3)])
+        self.assertIsNone(gs.monitor._timer._thread)
+        self.sim.pulse()
+        e.endAccess()
+        self.assertEqual(pings, [0, 4])
+
+        with self.assertRaises(gs.SdkError):
+            gs.monitor.app_begin(coalesce=True)(lambda event: None)
+
+    def test_coalesce_delivery(self):
+        @gs.monitor.entity_access_heartbeat(min_interval=0.05, coalesce=True)
+        def alive(entity, event, suppressed):
+            raise RuntimeError("boom")
+
+        gs.monitor.enableStats()
+        self.addCleanup(gs.monitor.disableStats)
+        e = gs.Core().entities[0]
+        e.beginAccess()
+        with self.assertLogs(level='ERROR'):
+            self.sim.pulse()
+            self.sim.pulse()
+        # delivered through the listener path: failure logged, latency recorded
+        with self.assertLogs(level='ERROR') as logs:
+            time.sleep(0.1)
+        self.assertIn("alive", logs.output[0])
+        name = f"{__name__}.TestDispatcher.test_coalesce_delivery.<locals>.alive"
+        # both dispatched pulses and the coalesced delivery
+        self.assertEqual(gs.monitor.stats()['listeners'][name]['count'], 3)
+
+        # clean up drops pending deliveries
+        with self.assertLogs(level='ERROR'):
+            self.sim.pulse()
+            self.sim.pulse()
+        self.assertTrue(gs.monitor._timer._heap)
+        gs.Core().cleanUp()
+        self.assertEqual(gs.monitor._timer._heap, [])
+        self.assertIsNone(gs.monitor._timer._thread)
+        gs.Core().init(self.sim.productId, "", "")
+
+    def test_overflow(self):
+        release = threading.Event()
+
+        @gs.monitor.entity_access_started
+        def started(entity, event):
+            release.wait(1)
+
+        d = gs.monitor.enableDispatcher(maxsize=2, overflow=gs.monitor.Dispatcher.DROP_HEARTBEAT)
+        HEARTBEAT = gs.monitor.Event.EVENT_ENTITY_ACCESS_HEARTBEAT
+        h = gs.Core().entities[0].handle
+        d.put(gs.monitor.Event.EVENT_ENTITY_ACCESS_STARTED, h)
+        for _ in range(100):
+            if d.stats['depth'] == 0:
+                break
+            time.sleep(0.01)
+        # dispatcher is busy, queue fills up
+        d.put(HEARTBEAT, h)
+        d.put(gs.monitor.Event.EVENT_ENTITY_ACCESS_ENDED, h)
+        d.put(gs.monitor.Event.EVENT_ENTITY_ACCESS_ENDED, h)
+        self.assertEqual([x[0] for x in d._queue], [gs.monitor.Event.EVENT_ENTITY_ACCESS_ENDED] * 2)
+        self.assertEqual(d.stats['dropped'], 1)
+        release.set()
+        self.assertTrue(d.drain(1))
+        self.assertGreater(d.stats['maxLag'], 0)
+
+
+class TestMonitorStats(unittest.TestCase):
+    def setUp(self):
+        use_sim(self)
+        self.addCleanup(gs.monitor.clearListeners)
+        self.addCleanup(gs.monitor.disableStats)
+
+    def test_stats(self):
+        self.assertEqual(gs.monitor.stats(), {'enabled': False})
+
+        @gs.monitor.entity_access_started
+        def slow(entity, event):
+            time.sleep(0.02)
+
+        def fast(entity, event):
+            pass
+        e = gs.Core().entities[0]
+        sub = e.on(gs.Event.EVENT_ENTITY_ACCESS_ENDED, fast)
+
+        gs.monitor.enableStats(slowThreshold=0.01)
+        e.beginAccess()
+        self.sim.pulse()
+        e.endAccess()
+
+        st = gs.monitor.stats()
+        self.assertTrue(st['enabled'])
+        self.assertEqual(st['events']['EVENT_ENTITY_ACCESS_STARTED'], 1)
+        self.assertEqual(st['events']['EVENT_ENTITY_ACCESS_HEARTBEAT'], 1)
+        self.assertEqual(st['callback']['count'], sum(st['events'].values()))
+        self.assertGreaterEqual(st['callback']['max'], 0.02)
+
+        name = f"{__name__}.TestMonitorStats.test_stats.<locals>."
+        self.assertEqual(st['listeners'][name + 'slow']['count'], 1)
+        self.assertEqual(st['listeners'][name + 'fast']['count'], 1)
+        self.assertEqual([x[2] for x in st['slow']], [name + 'slow'])
+
+        gs.monitor.disableStats()
+        e.beginAccess()
+        self.assertEqual(gs.monitor.stats(), {'enabled': False})
+
+    def test_listener_failure(self):
+        seen = []
+        @gs.monitor.entity_access_started
+        def failing(entity, event):
+            raise RuntimeError("boom")
+        def after(entity, event):
+            seen.append(event)
+        e = gs.Core().entities[0]
+        e.on(gs.Event.EVENT_ENTITY_ACCESS_STARTED, after)
+
+        gs.monitor.enableStats()
+        with self.assertLogs(level='ERROR') as logs:
+            e.beginAccess()
+        self.assertEqual(seen, [gs.Event.EVENT_ENTITY_ACCESS_STARTED])
+        self.assertIn("test_listener_failure.<locals>.failing", logs.output[0])
+        name = f"{__name__}.TestMonitorStats.test_listener_failure.<locals>.failing"
+        self.assertEqual(gs.monitor.stats()['listeners'][name]['count'], 1)
+
+    def test_histogram(self):
+        from gs.metrics import Histogram
+        h = Histogram()
+        for v in (1e-6, 3e-6, 1e-3, 0.5):
+            h.observe(v)
+        self.assertEqual(h.count, 4)
+        self.assertEqual(h.percentile(0.5), 4e-6)
+        self.assertEqual(h.buckets()[-1], (float('inf'), 4))
+        self.assertEqual(h.to_dict()['max'], 0.5)
+
+
+class TestSubscription(unittest.TestCase):
+    def test_scoped(self):
+        use_sim(self, entities=[
+            SimEntity("e1", "e1", license=SimLicense('gs.lm.alwaysRun.1')),
+            SimEntity("e2", "e2", license=SimLicense('gs.lm.alwaysRun.1')),
+        ])
+        Event = gs.Event
+        core = gs.Core()
+        e1, e2 = core.entities
+
+        seen = []
+        def listener(entity, event):
+            seen.append((entity.id, event))
+        def loaded(event):
+            seen.append(event)
+
+        sub = e1.on(Event.EVENT_ENTITY_ACCESS_STARTED, listener)
+        core.on(Event.EVENT_ENTITY_ACCESS_ENDED, listener)
+        core.on(Event.EVENT_LICENSE_READY, loaded)
+
+        # entity is not resolved for events without matching listener
+        resolved = []
+        entityOf = gs.monitor._entityOf
+        gs.monitor._entityOf = lambda h: resolved.append(h) or entityOf(h)
+        self.addCleanup(setattr, gs.monitor, '_entityOf', entityOf)
+
+        for e in (e1, e2):
+            e.beginAccess()
+            e.endAccess()
+        self.assertEqual(seen, [("e1", Event.EVENT_ENTITY_ACCESS_STARTED), ("e1", Event.EVENT_ENTITY_ACCESS_ENDED), ("e2", Event.EVENT_ENTITY_ACCESS_ENDED)])
+        self.assertEqual(resolved, [e1.handle, e1.handle, e2.handle])
+
+        sub.unsubscribe()
+        self.assertFalse(sub.active)
+        self.sim.fire(Event.EVENT_LICENSE_READY)
+        e1.beginAccess()
+        self.assertEqual(seen[3:], [Event.EVENT_LICENSE_READY])
+
+        # listeners are held weakly
+        seen.clear()
+        del listener, loaded
+        e1.endAccess()
+        self.sim.fire(Event.EVENT_LICENSE_READY)
+        self.assertEqual(seen, [])
+        self.assertIsNone(gs.monitor._table[Event.EVENT_ENTITY_ACCESS_ENDED][4])
+
+        # bound methods
+        class Watcher:
+            def __init__(self):
+                self.events = []
+            def on_started(self, entity, event):
+                self.events.append(event)
+        w = Watcher()
+        sub = e2.on(Event.EVENT_ENTITY_ACCESS_STARTED, w.on_started)
+        e2.beginAccess()
+        self.assertEqual(w.events, [Event.EVENT_ENTITY_ACCESS_STARTED])
+        del w
+        self.assertFalse(sub.active)
+
+        # a weak lambda would never be called
+        with self.assertRaises(gs.SdkError):
+            e2.on(Event.EVENT_ENTITY_ACCESS_ENDED, lambda entity, event: seen.append(event))
+        sub = e2.on(Event.EVENT_ENTITY_ACCESS_ENDED, lambda entity, event: seen.append(event), weak=False)
+        e2.endAccess()
+        self.assertEqual(seen, [Event.EVENT_ENTITY_ACCESS_ENDED])
+        sub.unsubscribe()
+
+
+class TestInspectors(unittest.TestCase):
+    def test_static_params(self):
+        use_sim(self, entities=[
+            SimEntity("e-period", "period", license=SimLicense('gs.lm.expire.period.1', periodInSeconds=100)),
+        ])
+        e = gs.Core().getEntityById("e-period")
+        isp = e.license.inspector
+        self.assertFalse(isp.used)
+        self.assertEqual(isp.secondsLeft, 100)
+        self.assertTrue(e.beginAccess())
+
+        # first access time and period are read once, then secondsLeft is computed locally
+        self.assertTrue(isp.used)
+        repr(isp)
+        calls = []
+        for name in ('gsGetVariableValueAsInt', 'gsGetVariableValueAsTime', 'gsIsVariableValid'):
+            f = getattr(gs.intf, name)
+            patch = mock.patch.object(gs.intf, name, lambda *args, f=f, name=name: calls.append(name) or f(*args))
+            patch.start()
+            self.addCleanup(patch.stop)
+        for _ in range(100):
+            self.assertTrue(0 <= isp.secondsLeft <= 100)
+        repr(isp)
+        self.assertEqual(calls, [])
+        self.assertEqual(isp.expireDate, isp.firstAccessDate + timedelta(seconds=100))
+
+        # license actions refresh static params
+        self.sim.applyAction(105, newPeriodInSeconds=1000)
+        self.assertEqual(isp.expirePeriodInSeconds, 1000)
+        self.assertTrue(900 < isp.secondsLeft <= 1000)
+
+    def test_counters(self):
+        use_sim(self, entities=[
+            SimEntity("e-session", "session", license=SimLicense('gs.lm.expire.sessionTime.1', maxSessionTime=60)),
+            SimEntity("e-duration", "duration", license=SimLicense('gs.lm.expire.duration.1', maxDurationInSeconds=60)),
+        ])
+        core = gs.Core()
+        session = core.getEntityById("e-session").license.inspector
+        duration = core.getEntityById("e-duration").license.inspector
+        self.assertEqual(duration.secondsLeft, 60)
+        self.assertEqual(session.secondsLeft, 60)
+        self.assertIsInstance(session.expireDate, datetime)
+
+
+class TestScheduler(unittest.TestCase):
+    def test_at_expiry(self):
+        from gs import scheduler
+        use_sim(self, entities=[
+            SimEntity("e-period", "period", license=SimLicense('gs.lm.expire.period.1', periodInSeconds=2)),
+            SimEntity("e-session", "session", license=SimLicense('gs.lm.expire.sessionTime.1', maxSessionTime=60)),
+            SimEntity("e-run", "run", license=SimLicense('gs.lm.alwaysRun.1')),
+        ])
+        core = gs.Core()
+        period, session, run = core.entities
+        self.assertIsNone(scheduler.deadline(period))
+        self.assertIsNone(scheduler.deadline(session))
+        self.assertIsNone(scheduler.deadline(run))
+
+        fired = []
+        scheduler.at_expiry(period, fired.append, before=1.9)
+        job = scheduler.at_expiry(session, fired.append, before=59.9)
+        self.assertIsNone(job.deadline)
+
+        # deadlines are armed once entities are accessed
+        self.assertTrue(session.beginAccess())
+        self.assertTrue(period.beginAccess())
+        self.assertIsNotNone(job.deadline)
+        for _ in range(100):
+            if len(fired) == 2:
+                break
+            time.sleep(0.01)
+        self.assertEqual(set(fired), {period, session})
+
+        # extending the period re-arms the callback
+        self.sim.applyAction(106, [self.sim.entities[0]], addedPeriodInSeconds=1)
+        for _ in range(200):
+            if len(fired) == 3:
+                break
+            time.sleep(0.01)
+        self.assertEqual(fired[2:], [period])
+
+        session.endAccess()
+        self.assertIsNone(job.deadline)
+        job.cancel()
+        self.assertEqual(len(scheduler._scheduler.jobs), 1)
+
+
+class TestHealth(unittest.TestCase):
+    def setUp(self):
+        use_sim(self)
+        self.addCleanup(gs.Core().disableHealthMonitor)
+
+    def wait(self, cond):
+        for _ in range(100):
+            if cond():
+                return
+            time.sleep(0.01)
+        self.fail("timeout")
+
+    def test_circuit_breaker(self):
+        from gs.health import ServerUnavailable
+        core = gs.Core()
+        core.enableHealthMonitor(ttl=10, failureThreshold=1, resetTimeout=0.1)
+        health = core.health
+        self.wait(lambda: health.stats['probes'] == 1)
+        self.assertTrue(core.isServerAlive())
+
+        # outage detected by a failed call, then calls fail fast
+        self.sim.serverAlive = False
+        self.assertFalse(core.isValidSN('0875-BB91-4449-9DCE'))
+        self.assertEqual(health.breaker.state, 'open')
+        self.wait(lambda: health.stats['probes'] == 2) # probed by the monitor thread
+        self.assertFalse(core.isServerAlive())
+        self.sim.setLatency(1, 'gsIsSNValid')
+        with self.assertRaises(ServerUnavailable):
+            core.isValidSN('0875-BB91-4449-9DCE')
+        self.assertEqual(health.stats['rejected'], 1)
+
+        # a trial call closes the circuit once the server is back
+        self.sim.serverAlive = True
+        self.sim.setLatency(0)
+        time.sleep(0.1)
+        self.assertEqual(health.breaker.state, 'half-open')
+        self.assertTrue(core.isValidSN('0875-BB91-4449-9DCE'))
+        self.assertEqual(health.breaker.state, 'closed')
+        self.assertEqual(health.stats['opens'], 1)
+
+    def test_failed_calls(self):
+        core = gs.Core()
+        core.enableHealthMonitor(ttl=60, failureThreshold=2)
+        health = core.health
+        self.wait(lambda: health.stats['probes'] == 1)
+
+        # failures open the circuit, the probe scheduled on the monitor thread closes it for a live server
+        patch = mock.patch.object(self.sim, 'gsIsSNValid', side_effect=OSError("network down"))
+        patch.start()
+        gs.intf._clearResolved()
+        for _ in range(2):
+            with self.assertRaises(OSError):
+                core.isValidSN('0875-BB91-4449-9DCE')
+        patch.stop()
+        gs.intf._clearResolved()
+        self.assertEqual(health.stats['opens'], 1)
+        self.wait(lambda: health.stats['probes'] == 2)
+        self.assertEqual(health.breaker.state, 'closed')
+        self.assertEqual([ t.name for t in threading.enumerate() if t.name == 'gs-health-probe' ], [])
+
+    def test_invalid_serials(self):
+        # negative answers of a live server are no failures
+        core = gs.Core()
+        core.clearSerialCache()
+        core.enableHealthMonitor(ttl=60, failureThreshold=2)
+        health = core.health
+        self.wait(lambda: health.stats['probes'] == 1)
+        self.sim.setLatency(0.01, 'gsIsSNValid')
+
+        serials = [ f'0000-0000-0000-{i:04}' for i in range(10) ] + ['0875-BB91-4449-9DCE']
+        results = dict(core.validateSerials(serials, workers=4))
+        self.assertEqual(results, dict(dict.fromkeys(serials[:10], False), **{ '0875-BB91-4449-9DCE': True }))
+        self.assertEqual(health.stats['state'], 'closed')
+        self.assertEqual(health.stats['opens'], 0)
+        self.assertEqual(health.stats['rejected'], 0)
+        self.assertLess(health.stats['probes'], 11) # confirmations are shared
+
+
+class TestAio(unittest.TestCase):
+    def setUp(self):
+        use_sim(self)
+
+    def test_facade(self):
+        from gs.aio import AsyncCore
+
+        async def main():
+            async with AsyncCore(timeout=5) as core:
+                self.assertEqual(core.productId, test_product['productId'])
+                entities = await core.entities()
+                self.assertEqual([e.name for e in entities], ["E1"])
+                e = await core.getEntityByName("E1")
+                self.assertIs(e, entities[0])
+                self.assertEqual(e.license.id, LicenseId.TRIAL_PERIOD)
+
+                self.assertTrue(await e.beginAccess())
+                self.assertTrue((await e.status()).accessing)
+                self.assertEqual(await e.license.inspect('expirePeriodInSeconds', 'used'),
+                                 {'expirePeriodInSeconds': e.entity.license.inspector.expirePeriodInSeconds, 'used': True})
+                await e.endAccess()
+
+                self.assertTrue(await core.isValidSN('0875-BB91-4449-9DCE'))
+                self.assertTrue(await core.applySN('0BD3-4F5C-4EB4-9EE9'))
+                self.assertTrue(await core.isAllEntitiesUnlocked())
+                self.assertEqual(await core.getValues(['age', 'name']), {'age': 10, 'name': 'randy'})
+
+        asyncio.run(main())
+
+    def test_timeout_and_cap(self):
+        from gs.aio import AsyncCore
+        self.sim.setLatency(0.05, 'gsIsSNValid')
+
+        async def main():
+            async with AsyncCore(max_workers=4, max_network=1) as core:
+                with self.assertRaises(asyncio.TimeoutError):
+                    await core.isValidSN('0875-BB91-4449-9DCE', timeout=0.01)
+
+                # network calls are serialized by the cap
+                t = time.monotonic()
+                results = await asyncio.gather(*[ core.isValidSN('0875-BB91-4449-9DCE') for _ in range(3) ])
+                self.assertEqual(results, [True] * 3)
+                self.assertGreaterEqual(time.monotonic() - t, 0.15)
+
+                # loop is not blocked by calls in flight
+                task = asyncio.ensure_future(core.isValidSN('0875-BB91-4449-9DCE'))
+                await asyncio.sleep(0)
+                self.assertFalse(task.done())
+                self.assertTrue(await task)
+
+        asyncio.run(main())
+
+    def test_cap_after_timeout(self):
+        from gs.aio import AsyncCore
+        inflight = []
+        peak = []
+        isValid = self.sim.gsIsSNValid
+
+        def slow(*args):
+            inflight.append(1)
+            peak.append(len(inflight))
+            time.sleep(0.05)
+            inflight.pop()
+            return isValid(*args)
+
+        patch = mock.patch.object(self.sim, 'gsIsSNValid', slow)
+        patch.start()
+        self.addCleanup(patch.stop)
+        gs.intf._clearResolved()
+        self.addCleanup(gs.intf._clearResolved)
+
+        async def main():
+            async with AsyncCore(max_workers=4, max_network=1) as core:
+                with self.assertRaises(asyncio.TimeoutError):
+                    await core.isValidSN('0875-BB91-4449-9DCE', timeout=0.01)
+                # the timed out call still holds the cap until it returns
+                self.assertTrue(await core.isValidSN('0875-BB91-4449-9DCE'))
+
+        asyncio.run(main())
+        self.assertEqual(max(peak), 1)
+
+    def test_close(self):
+        from gs.aio import AsyncCore
+        self.sim.setLatency(0.1, 'gsIsSNValid')
+        ticks = []
+
+        async def tick():
+            while True:
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.01)
+
+        async def main():
+            async with AsyncCore() as core:
+                call = asyncio.ensure_future(core.isValidSN('0875-BB91-4449-9DCE'))
+                await asyncio.sleep(0.01)
+                ticker = asyncio.ensure_future(tick())
+            # the loop kept running while the call in flight was completed
+            self.assertTrue(await call)
+            self.assertGreater(len(ticks), 3)
+            ticker.cancel()
+            self.assertEqual(len(core._network), 1)
+            return core
+
+        import gc
+        core = asyncio.run(main())
+        gc.collect()
+        self.assertEqual(len(core._network), 0) # closed loop released
+
+
+class TestEventStream(unittest.TestCase):
+    def test_events(self):
+        use_sim(self, entities=[
+            SimEntity("e1", "e1", license=SimLicense('gs.lm.alwaysRun.1')),
+            SimEntity("e2", "e2", license=SimLicense('gs.lm.alwaysRun.1')),
+        ])
+        Event = gs.Event
+        e1, e2 = gs.Core().entities
+
+        async def main():
+            started = gs.events(kinds=[Event.EVENT_ENTITY_ACCESS_STARTED])
+            of_e2 = gs.events(entity="e2")
+            small = gs.events(entity=e1, maxsize=2, overflow='drop-oldest')
+
+            # events are raised from another thread
+            def access():
+                for e in (e1, e2):
+                    e.beginAccess()
+                    e.endAccess()
+                    self.sim.pulse()
+            await asyncio.get_running_loop().run_in_executor(None, access)
+            for s in (started, of_e2, small):
+                s.close()
+
+            self.assertEqual([(ev, e) async for ev, e in started],
+                             [(Event.EVENT_ENTITY_ACCESS_STARTED, e1), (Event.EVENT_ENTITY_ACCESS_STARTED, e2)])
+            self.assertEqual([ev async for ev, e in of_e2], [
+                Event.EVENT_ENTITY_ACCESS_STARTING, Event.EVENT_ENTITY_ACCESS_STARTED,
+                Event.EVENT_ENTITY_ACCESS_ENDING, Event.EVENT_ENTITY_ACCESS_ENDED,
+            ])
+            self.assertEqual([ev async for ev, e in small], [Event.EVENT_ENTITY_ACCESS_ENDING, Event.EVENT_ENTITY_ACCESS_ENDED])
+            self.assertEqual(small.dropped, 2)
+
+        asyncio.run(main())
+
+    def test_not_closed(self):
+        use_sim(self)
+        e = gs.Core().entities[0]
+        hooks = lambda: sum(len(h) for h in gs.monitor._hooks.values())
+        n = hooks()
+
+        async def consume(stream):
+            e.beginAccess()
+            async for event, entity in stream:
+                break # leave without close()
+
+        async def main():
+            # stream garbage collected
+            await consume(gs.events())
+            await asyncio.sleep(0) # pending wakeup
+            self.assertEqual(hooks(), n)
+            # stream outliving its loop
+            return gs.events()
+
+        stream = asyncio.run(main())
+        self.assertGreater(hooks(), n)
+        e.endAccess() # no failure once the loop is closed
+        self.assertEqual(hooks(), n)
+        del stream
+
+
+class TestInstrument(unittest.TestCase):
+    def setUp(self):
+        from gs.intf import instrument
+        self.instrument = instrument
+        use_sim(self)
+        instrument.reset()
+        instrument.enable()
+        self.addCleanup(instrument.disable)
+
+    def test_stats(self):
+        core = gs.Core()
+        e = core.entities[0]
+        for _ in range(10):
+            e.accessible
+        self.assertFalse(core.applySN('0000-0000-0000-0000'))
+        self.assertFalse(core.isValidSN('0000-0000-0000-0000'))
+
+        st = self.instrument.stats()
+        self.assertEqual(st['gsGetEntityAttributes']['calls'], 10)
+        self.assertEqual(st['gsApplySN']['errors'], 1)
+        self.assertEqual(st['gsApplySN']['errorCodes'], {self.sim.lastErrorCode: 1})
+        self.assertEqual(st['gsIsSNValid']['errors'], 0)
+
+        # raw apis once disabled
+        self.instrument.disable()
+        self.assertFalse(hasattr(gs.intf.gsGetEntityAttributes, '__wrapped__'))
+        e.accessible
+        self.assertEqual(self.instrument.stats()['gsGetEntityAttributes']['calls'], 10)
+
+    def test_openmetrics(self):
+        import urllib.request
+        gs.Core().entities[0].accessible
+        server = self.instrument.serve(0)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics") as r:
+            self.assertEqual(r.headers['Content-Type'], self.instrument.CONTENT_TYPE)
+            text = r.read().decode()
+        self.assertIn('gs_ffi_calls_total{function="gsGetEntityAttributes"} 1', text)
+        self.assertIn('gs_ffi_call_seconds_bucket{function="gsGetEntityAttributes",le="+Inf"} 1', text)
+        self.assertTrue(text.endswith("# EOF\n"))
+
+
+class TestTrace(unittest.TestCase):
+    def setUp(self):
+        from gs import trace
+        self.trace = trace
+        self.ring = trace.RingSink()
+        trace.enable(self.ring)
+        self.addCleanup(trace.disable)
+        use_sim(self)
+
+    def test_spans(self):
+        core = gs.Core()
+        e = core.entities[0]
+        e.beginAccess()
+        e.endAccess()
+        self.assertTrue(core.unlockRequestCode)
+
+        spans = { s.name: s for s in self.ring.spans }
+        self.assertEqual(spans['Core.init'].attrs, { 'product': self.sim.productId })
+        ents = spans['Core.entities']
+        self.assertEqual(ents.attrs['count'], len(core.entities))
+        self.assertEqual(ents.ffi['gsGetEntityCount'][0], 1)
+
+        lic = spans['License.init']
+        self.assertIs(lic.parent, ents)
+        self.assertEqual(lic.attrs['entity'], e.id)
+        self.assertIn('license', lic.attrs)
+        self.assertGreater(lic.ffiCalls, 0)
+
+        access = spans['Entity.beginAccess']
+        self.assertIsNone(access.parent)
+        self.assertEqual(access.attrs, { 'entity': e.id })
+        self.assertEqual(access.ffi['gsBeginAccessEntity'][0], 1)
+        self.assertEqual(spans['Request.addAction'].attrs['action'], gs.ActionId.ACT_UNLOCK)
+        self.assertEqual(spans['Request.code'].ffi['gsGetRequestCode'][0], 1)
+
+    def test_nesting(self):
+        with self.trace.span("outer", tag=1) as outer:
+            self.assertIs(self.trace.current(), outer)
+            gs.Core().applySN('0000-0000-0000-0000')
+        self.assertIsNone(self.trace.current())
+
+        inner, last = self.ring.spans[-2:]
+        self.assertEqual(inner.name, 'Core.applySN')
+        self.assertIs(inner.parent, outer)
+        self.assertIs(last, outer)
+        self.assertEqual(outer.ffiCalls, 0)
+        self.assertEqual(inner.ffi['gsApplySN'][0], 1)
+
+    def test_not_entered(self):
+        # a span is current from __enter__ to __exit__ only
+        s = self.trace.span("unused")
+        self.assertIsNone(self.trace.current())
+        gs.Core().applySN('0000-0000-0000-0000')
+        self.assertIsNone(self.ring.spans[-1].parent)
+        with s:
+            self.assertIs(self.trace.current(), s)
+        self.assertIsNone(self.trace.current())
+
+        # parent is the span current when entered, not when created
+        with self.trace.span("outer") as outer:
+            late = self.trace.span("late")
+        with late:
+            self.assertIsNone(late.parent)
+        self.assertIsNone(self.trace.current())
+        early = self.trace.span("early")
+        with self.trace.span("outer") as outer:
+            with early:
+                self.assertIs(early.parent, outer)
+            self.assertIs(self.trace.current(), outer)
+
+    def test_jsonlines(self):
+        import json, os, tempfile
+        fd, path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        e = gs.Core().entities[0]
+        self.trace.enable(self.trace.JsonLinesSink(path))
+        e.beginAccess()
+        self.trace.disable()
+
+        with open(path) as f:
+            lines = [ json.loads(x) for x in f ]
+        self.assertEqual([ x['name'] for x in lines ], ['Entity.beginAccess'])
+        self.assertEqual(lines[0]['ffi']['gsBeginAccessEntity']['calls'], 1)
+
+    def test_disabled(self):
+        self.trace.disable()
+        self.assertFalse(hasattr(gs.intf.gsBeginAccessEntity, '__wrapped__'))
+        with self.trace.span("x") as s:
+            s.set(a=1)
+        gs.Core().entities[0].beginAccess()
+        self.assertEqual(self.ring.spans[-1].name, 'Core.init')
+
+
+class TestHandles(unittest.TestCase):
+    def setUp(self):
+        from gs import handles
+        self.handles = handles
+        use_sim(self)
+        handles.reset()
+
+    def test_report(self):
+        core = gs.Core()
+        n = len(core.entities)
+        self.assertEqual(self.handles.live('Entity'), n)
+        self.assertEqual(self.handles.live('License'), n)
+
+        self.handles.setSampling(1)
+        self.addCleanup(self.handles.setSampling, 100)
+        req = core.createRequest()
+        req.addAction(gs.ActionId.ACT_UNLOCK)
+        rep = self.handles.report(oldest=1000)
+        self.assertEqual(rep['live']['Request'], 1)
+        self.assertNotIn('Action', rep['live']) # released right away
+        self.assertEqual(rep['created']['Action'], 1)
+        site = [ x for x in rep['oldest'] if x['kind'] == 'Request' ][0]['site']
+        self.assertIn('test_report', "".join(site))
+
+        del req
+        rep = self.handles.report()
+        self.assertNotIn('Request', rep['live'])
+        self.assertEqual(rep['peak']['Request'], 1)
+        self.assertGreaterEqual(rep['totalPeak'], rep['total'])
+        self.assertLessEqual(len(rep['oldest']), 10)
+
+    def test_cyclic_gc(self):
+        import gc
+        self.handles.setDebug(True)
+        self.addCleanup(self.handles.setDebug, False)
+        req = gs.Core().createRequest()
+        req.me = req
+        del req
+        with self.assertLogs(level='WARNING') as logs:
+            gc.collect()
+        self.assertIn("Request handle", logs.output[0])
+        self.assertEqual(self.handles.live('Request'), 0)
+
+    def test_no_cycle(self):
+        # entity and license are released by reference counting, without the cyclic gc
+        import gc
+        gc.disable()
+        self.addCleanup(gc.enable)
+        e = gs.Entity(self.sim.gsOpenEntityByIndex(0))
+        lic = e.license
+        self.assertIs(lic.entity, e)
+        n = self.handles.live()
+        self.assertNotEqual(lic.unlockRequestCode, gs.Core().unlockRequestCode)
+        del e
+        self.assertEqual(self.handles.live(), n - 1)
+        self.assertIsNone(lic.entity)
+        # never widened to an unlock of all entities
+        with self.assertRaises(gs.SdkError):
+            lic.unlockRequestCode
+        del lic
+        self.assertEqual(self.handles.live(), n - 2)
+
+    def test_params_not_pinned(self):
+        lic = gs.Core().entities[0].license
+        n = self.handles.live('Variable')
+        names = list(lic.params)
+        self.assertTrue(names)
+        self.assertEqual(self.handles.live('Variable'), n)
+        v = lic.params[names[0]]
+        self.assertIs(lic.params[names[0]], v) # shared while in use
+        self.assertEqual(self.handles.live('Variable'), n + 1)
+        del v
+        self.assertEqual(self.handles.live('Variable'), n)
+        self.assertIn(names[0], lic.params)
+
+    def test_reused_id(self):
+        # a new object may get the id() of a collected one, it must not share its record
+        core = gs.Core()
+        keys = {} # id => key
+        for _ in range(100):
+            req = core.createRequest()
+            key = req._finalizer.peek()[2][0]
+            self.assertNotEqual(keys.get(id(req)), key)
+            keys[id(req)] = key
+            del req
+        self.assertLess(len(keys), 100) # ids were reused
+        self.assertEqual(self.handles.live('Request'), 0)
+
+    def test_close(self):
+        core = gs.Core()
+        with core.request() as req:
+            self.assertEqual(self.handles.live('Request'), 1)
+            self.assertFalse(req.addAction(gs.ActionId.ACT_UNLOCK).closed)
+        self.assertTrue(req.closed)
+        self.assertEqual(self.handles.live('Request'), 0)
+        req.close() # no-op once closed
+        self.assertTrue(core.unlockRequestCode)
+        self.assertEqual(self.handles.live('Request'), 0)
+
+        lic = core.entities[0].license
+        n = self.handles.live('Variable')
+        with lic.params_scope() as params:
+            self.assertEqual(self.handles.live('Variable'), n + len(params))
+        self.assertEqual(self.handles.live('Variable'), n)
+        self.assertTrue(all(v.closed for v in params.values()))
+        self.assertTrue(lic.params) # re-opened
+
+    def test_close_all(self):
+        core = gs.Core()
+        e = core.entities[0]
+        self.assertTrue(self.handles.live() > 0)
+        closed = []
+        self.sim.gsCloseHandle = lambda h, _close=self.sim.gsCloseHandle: closed.append(h) or _close(h)
+        gs.intf._clearResolved()
+
+        core.cleanUp()
+        self.assertEqual(self.handles.live(), 0)
+        self.assertTrue(e.closed and e.license.closed)
+        self.assertGreaterEqual(len(closed), 2)
+        n = len(closed)
+        del e
+        self.assertEqual(len(closed), n) # finalizers detached
+        core.init(self.sim.productId, "", "")
+
+
+class TestSimLatency(unittest.TestCase):
+    def test_latency(self):
+        use_sim(self, latency={"gsGetEntityAttributes": 0.002})
+        e0 = gs.Core().entities[0]
+
+        t = time.perf_counter()
+        for _ in range(5):
+            e0.attribute
+        self.assertGreaterEqual(time.perf_counter() - t, 0.01)
+
+        self.sim.setLatency(0)
+        t = time.perf_counter()
+        e0.attribute
+        self.assertLess(time.perf_counter() - t, 0.002)
@@ -0,0 +1,71 @@
+""" Tests of gs.util helpers """
+
+import unittest
+import gc
+import gs
+import gs.intf
+from gs.util import once, cached_property, uncache
+from gs.intf.sim import SimCore
+
+
+class Probe:
+    ''' counts live instances '''
+    alive = 0
+
+    def __init__(self, v):
+        Probe.alive += 1
+        self._v = v
+
+    def __del__(self):
+        Probe.alive -= 1
+
+    @cached_property
+    def value(self):
+        return [self._v]
+
+    @property
+    @once
+    def legacy(self):
+        return (self._v,)
+
+
+class TestCachedProperty(unittest.TestCase):
+    def test_cache(self):
+        p = Probe(1)
+        v = p.value
+        self.assertIs(p.value, v)
+        self.assertIs(p.legacy, p.legacy)
+
+        uncache(p, 'value')
+        self.assertIsNot(p.value, v)
+        self.assertEqual(p.value, v)
+
+    def test_no_leak(self):
+        ''' cached values must not keep 1M instances alive '''
+        gc.collect()
+        base = Probe.alive
+        for i in range(1000000):
+            p = Probe(i)
+            p.value
+            p.legacy
+        del p
+        self.assertEqual(Probe.alive, base)
+
+    def test_handles_released(self):
+        ''' objects with cached properties close their handles when they die '''
+        sim = SimCore()
+        gs.intf.use(sim)
+        self.assertTrue(gs.Core().init(sim.productId, "", ""))
+        self.addCleanup(gs.Core().cleanUp)
+
+        gs.Core().entities # permanent
+        n = sim.openHandles
+        for i in range(1000):
+            v = gs.Core().getVariable("age")
+            self.assertEqual(v.name, "age")
+            req = gs.Core().createRequest()
+            act = req.addAction(gs.ActionId.ACT_CLEAN)
+            act.params
+            act.name
+        del v, req, act
+        self.assertEqual(sim.openHandles, n)